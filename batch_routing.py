@@ -0,0 +1,160 @@
+#! /usr/bin/env python3
+
+"""
+Batch routing for the graphs of route_planner: many-to-many distance
+matrices.
+
+Each row of a matrix is computed by one one-to-many Dijkstra search, which
+stops as soon as all targets are settled. The rows are distributed over a
+process pool. Every worker loads the graph through its binary file (see
+route_planner.CSRGraph.load()), which is memory-mapped, so the workers
+share the arc arrays through the page cache instead of copying them.
+"""
+
+import os
+import sys
+import time
+import random
+import concurrent.futures
+from array import array
+
+import route_planner
+
+# Graph of a worker process and the (target node ids, cost profile, queue
+# engine) of its searches, see _init_worker().
+_worker_graph = None
+_worker_targets = None
+
+
+def distance_matrix(graph, source_node_ids, target_node_ids,
+                    cost_profile=None, num_processes=None,
+                    queue_engine='heap'):
+    """
+    Compute the distances from each source node to each target node.
+
+    With more than one process, the sources are distributed over a
+    process pool in chunks. This needs a graph read from a *.graph file
+    whose arc costs were not updated (see CSRGraph.update_arc_costs());
+    otherwise the matrix is computed in this process.
+
+    :param graph: CSRGraph.
+    :param source_node_ids: sequence of N source node ids.
+    :param target_node_ids: sequence of M target node ids.
+    :param cost_profile: cost profile of the distances (see
+        CSRGraph.set_cost_profile()), e.g. 'travel_time_130' for a travel
+        time matrix. None for the current cost profile of the graph.
+    :param num_processes: number of worker processes, None for the number
+        of CPUs.
+    :param queue_engine: see CSRGraph.compute_shortest_paths().
+    :return: dense N x M array in row-major order: the distance from the
+        i-th source to the j-th target is at position i * M + j, -1 if the
+        target is unreachable.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> distance_matrix(graph, [0, 4], [3, 2, 0], num_processes=1)
+    array('q', [100, 50, 0, 20, 80, -1])
+    >>> distance_matrix(graph, [0, 4], [3, 2, 0], 'travel_time_100', 2)
+    array('q', [12, 6, 0, 2, 9, -1])
+    >>> graph.get_cost_profile()
+    'distance'
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test.graph'))
+    """
+
+    source_node_ids = list(source_node_ids)
+    target_node_ids = list(target_node_ids)
+    if cost_profile is None:
+        cost_profile = graph.get_cost_profile()
+    num_targets = len(target_node_ids)
+    matrix = array('q', bytes(8 * len(source_node_ids) * num_targets))
+
+    file_name = graph.get_source_file_name()
+    # Worker processes read the costs of the *.graph file.
+    if (num_processes == 1 or len(source_node_ids) < 2 or file_name is None
+            or graph.get_cost_version(cost_profile) != 0):
+        matrix[:] = _compute_rows(graph, source_node_ids, target_node_ids,
+                                  cost_profile, queue_engine)
+        return matrix
+
+    if num_processes is None:
+        num_processes = os.cpu_count() or 1
+    # Several chunks per process balance the load of searches of
+    # different sizes.
+    chunk_size = max(1, -(-len(source_node_ids) // (4 * num_processes)))
+    chunks = [source_node_ids[pos:pos + chunk_size]
+              for pos in range(0, len(source_node_ids), chunk_size)]
+    with concurrent.futures.ProcessPoolExecutor(
+            num_processes, initializer=_init_worker,
+            initargs=(file_name, graph.is_directed(),
+                      graph.get_node_order(), cost_profile,
+                      target_node_ids, queue_engine)) as executor:
+        pos = 0
+        for rows in executor.map(_compute_chunk, chunks):
+            matrix[pos:pos + len(rows)] = rows
+            pos += len(rows)
+
+    return matrix
+
+def _compute_rows(graph, source_node_ids, target_node_ids, cost_profile,
+                  queue_engine):
+    """
+    :return: rows of the distance matrix of some sources, concatenated in
+        one array.
+    """
+    workspace = graph.create_workspace()
+    rows = array('q')
+    for source_node_id in source_node_ids:
+        rows.extend(graph.compute_one_to_many(source_node_id, target_node_ids,
+                                              queue_engine, workspace,
+                                              cost_profile))
+
+    return rows
+
+def _init_worker(file_name, directed, node_order, cost_profile,
+                 target_node_ids, queue_engine):
+    """ Load the graph in a worker process of distance_matrix(). """
+    global _worker_graph, _worker_targets
+    _worker_graph = route_planner.CSRGraph.load(file_name, directed,
+                                                node_order)
+    _worker_targets = (target_node_ids, cost_profile, queue_engine)
+
+def _compute_chunk(source_node_ids):
+    """ Task of a worker process of distance_matrix(). """
+    return _compute_rows(_worker_graph, source_node_ids, *_worker_targets)
+
+
+def main():
+    """
+    Main function: compute a distance matrix between random nodes of a
+    *.graph file.
+    Usage: batch_routing.py [*.graph file] [sources] [targets] [cost profile]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    num_sources = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    num_targets = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    cost_profile = sys.argv[4] if len(sys.argv) > 4 else 'distance'
+
+    graph = route_planner.CSRGraph.load(file_name)
+    rng = random.Random(0)
+    source_node_ids = [rng.randrange(graph.get_num_nodes())
+                       for _ in range(num_sources)]
+    target_node_ids = [rng.randrange(graph.get_num_nodes())
+                       for _ in range(num_targets)]
+    start = time.perf_counter()
+    matrix = distance_matrix(graph, source_node_ids, target_node_ids,
+                             cost_profile)
+    seconds = time.perf_counter() - start
+    print('{0} x {1} matrix in {2:.2f} s, {3} unreachable pairs'.format(
+        num_sources, num_targets, seconds, matrix.count(-1)))
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
@@ -0,0 +1,437 @@
+#! /usr/bin/env python3
+
+"""
+Benchmark suite for the query engines of route_planner.
+
+A run answers the same seeded random queries, between nodes of the largest
+component, with every query engine and priority queue engine. It reports
+the load time of the graph, the preprocessing time of ALT, Contraction
+Hierarchies and the compressed graph, the memory of the uncompressed and
+the compressed graph, the peak RSS, the p50/p95/p99 query latency, the settled nodes
+per query and the throughput as JSON. Optionally it then applies batches of
+random arc cost updates (slowdowns as from live traffic), reports their
+latency and answers the queries again. The comparison mode flags
+regressions between two result files.
+
+Usage:
+    benchmark.py [*.graph file] [number of queries] [result *.json file]
+                 [number of cost update batches]
+    benchmark.py --compare [baseline *.json file] [result *.json file]
+"""
+
+import sys
+import json
+import time
+import random
+
+import route_planner
+import landmarks
+import compressed_graph
+import contraction_hierarchies
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak RSS is reported as None.
+    resource = None
+
+# Query engines of run_benchmark(). All but 'ch' run with every priority
+# queue engine of route_planner.QUEUE_ENGINES; 'compressed' is Dijkstra's
+# algorithm on a compressed_graph.CompressedGraph.
+QUERY_ENGINES = ('dijkstra', 'bidirectional', 'astar', 'alt', 'ch',
+                 'compressed')
+# Relative change of a metric that compare_results() flags as regression.
+REGRESSION_TOLERANCE = 0.1
+# Metrics of compare_results() for which larger values are worse.
+LATENCY_METRICS = ('p50', 'p95', 'p99', 'settled_per_query')
+# Number of arcs per batch of generate_cost_updates().
+COST_UPDATE_BATCH_SIZE = 1000
+# Largest factor by which generate_cost_updates() slows an arc down.
+MAX_SLOWDOWN = 3.0
+
+
+def generate_queries(graph, num_queries, seed=0):
+    """
+    Generate random queries between nodes of the largest (strongly, for
+    directed graphs) connected component, so every query has a path.
+
+    :param graph: CSRGraph.
+    :param num_queries: number of queries.
+    :param seed: seed of the random generator.
+    :return: list of tuples (source node id, target node id).
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> generate_queries(graph, 3)
+    [(2, 2), (1, 2), (3, 2)]
+    """
+
+    node_ids = graph.get_largest_component_node_ids(graph.is_directed())
+    rng = random.Random(seed)
+
+    return [(rng.choice(node_ids), rng.choice(node_ids))
+            for _ in range(num_queries)]
+
+def generate_cost_updates(graph, num_batches,
+                          batch_size=COST_UPDATE_BATCH_SIZE, seed=0):
+    """
+    Generate random batches of arc cost updates like a live traffic feed:
+    each update slows an arc down by a factor up to MAX_SLOWDOWN of its
+    cost in the *.graph file, so lower bounds of these costs stay valid.
+
+    :param graph: CSRGraph with the arc costs of the *.graph file.
+    :param num_batches: number of batches.
+    :param batch_size: number of arcs per batch.
+    :param seed: seed of the random generator.
+    :return: list of (arc indices, costs) tuples for
+        route_planner.CSRGraph.update_arc_costs().
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> generate_cost_updates(graph, 2, 2)
+    [([3, 5], [54, 59]), ([3, 5], [142, 53])]
+    """
+
+    costs = graph.get_costs()
+    rng = random.Random(seed)
+    batch_size = min(batch_size, len(costs))
+    batches = []
+    for _ in range(num_batches):
+        arc_indices = rng.sample(range(len(costs)), batch_size)
+        batches.append((arc_indices, [
+            round(costs[arc_idx] * rng.uniform(1.0, MAX_SLOWDOWN))
+            for arc_idx in arc_indices]))
+
+    return batches
+
+def percentile(sorted_values, fraction):
+    """
+    Percentile of some values by the nearest-rank method.
+
+    :param sorted_values: non-empty sorted sequence.
+    :param fraction: 0 < fraction <= 1, e.g. 0.95 for the 95th percentile.
+    :return: smallest value that is not smaller than the given fraction of
+        all values.
+
+    >>> percentile(range(1, 101), 0.95), percentile([3, 5], 0.5)
+    (95, 3)
+    """
+    rank = max(1, -int(-fraction * len(sorted_values) // 1))
+    return sorted_values[rank - 1]
+
+def get_peak_rss():
+    """
+    :return: peak resident set size of this process [bytes], None if it is
+        not available.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+def run_queries(query, queries):
+    """
+    Answer queries and measure them.
+
+    :param query: function (source node id, target node id) ->
+        route_planner.ShortestPath.
+    :param queries: list of tuples (source node id, target node id).
+    :return: dict with the latency percentiles p50, p95 and p99 [s], the
+        settled nodes per query, the throughput [queries/s] and the sum of
+        the distances, which must be the same for all query engines.
+    """
+
+    latencies = []
+    num_settled = 0
+    distance_sum = 0
+    timer = time.perf_counter
+    for source_node_id, target_node_id in queries:
+        start = timer()
+        result = query(source_node_id, target_node_id)
+        latencies.append(timer() - start)
+        num_settled += result.num_settled
+        distance_sum += result.distance
+    latencies.sort()
+    num_queries = max(1, len(queries))
+
+    return {'p50': percentile(latencies, 0.5) if latencies else 0.0,
+            'p95': percentile(latencies, 0.95) if latencies else 0.0,
+            'p99': percentile(latencies, 0.99) if latencies else 0.0,
+            'settled_per_query': num_settled / num_queries,
+            'throughput': len(queries) / (sum(latencies) or 1.0),
+            'distance_sum': distance_sum}
+
+def run_benchmark(file_name, num_queries=100, seed=0, cost_profile='distance',
+                  directed=True, query_engines=QUERY_ENGINES,
+                  queue_engines=None, num_landmarks=16, num_cost_updates=0,
+                  cost_update_batch_size=COST_UPDATE_BATCH_SIZE):
+    """
+    Benchmark the query engines on a *.graph file.
+
+    :param file_name: path of the *.graph file.
+    :param num_queries: number of random queries, see generate_queries().
+    :param seed: seed of the random queries.
+    :param cost_profile: see CSRGraph.set_cost_profile().
+    :param directed: see CSRGraph.load().
+    :param query_engines: names in QUERY_ENGINES.
+    :param queue_engines: names in route_planner.QUEUE_ENGINES, None for
+        all.
+    :param num_landmarks: number of landmarks of 'alt'.
+    :param num_cost_updates: number of batches of arc cost updates (see
+        generate_cost_updates()) applied after the queries, which are then
+        answered again. 'ch' falls back to a bidirectional search after
+        updates, see contraction_hierarchies. 'compressed' is read-only
+        and skipped after updates.
+    :param cost_update_batch_size: number of arcs per batch.
+    :return: JSON-serializable dict of the results, keyed
+        '<query engine>/<queue engine>' (just 'ch' for 'ch'), with the
+        latency of the cost update batches and the results after the
+        updates if there are updates, and with the size of the
+        uncompressed and the compressed graph [bytes] if 'compressed' is
+        run.
+
+    >>> results = run_benchmark('graph_13/test.graph', 5,
+    ...                         query_engines=('dijkstra', 'bidirectional'),
+    ...                         queue_engines=('heap', 'dial'))
+    >>> sorted(results['results'])
+    ['bidirectional/dial', 'bidirectional/heap', 'dijkstra/dial', 'dijkstra/heap']
+    >>> set(result['distance_sum'] for result in results['results'].values())
+    {80}
+    >>> sorted(results['results']['dijkstra/heap'])
+    ['distance_sum', 'p50', 'p95', 'p99', 'settled_per_query', 'throughput']
+    >>> results = run_benchmark('graph_13/test.graph', 5,
+    ...                         query_engines=('dijkstra', 'compressed'),
+    ...                         queue_engines=('heap',))
+    >>> set(result['distance_sum'] for result in results['results'].values())
+    {80}
+    >>> results['graph_bytes']
+    {'uncompressed': 200, 'compressed': 144}
+    >>> results = run_benchmark('graph_13/test.graph', 5,
+    ...                         query_engines=('dijkstra', 'alt'),
+    ...                         queue_engines=('heap',), num_landmarks=2,
+    ...                         num_cost_updates=2, cost_update_batch_size=3)
+    >>> sorted(results['cost_updates'])
+    ['batch_size', 'batches', 'p50', 'p95', 'p99']
+    >>> set(result['distance_sum']
+    ...     for result in results['results_after_updates'].values())
+    {126}
+    >>> import os
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test.graph'))
+    >>> os.remove(landmarks.get_landmark_file_name('graph_13/test.graph',
+    ...                                            'distance'))
+    """
+
+    if queue_engines is None:
+        queue_engines = sorted(route_planner.QUEUE_ENGINES)
+    start = time.perf_counter()
+    graph = route_planner.CSRGraph.load(file_name, directed)
+    graph.set_cost_profile(cost_profile)
+    load_seconds = time.perf_counter() - start
+    peak_rss_after_load = get_peak_rss()
+    queries = generate_queries(graph, num_queries, seed)
+    workspace = graph.create_workspace()
+
+    preprocessing_seconds = {}
+    engines = {}
+    for query_engine in query_engines:
+        start = time.perf_counter()
+        if query_engine == 'alt':
+            engine = landmarks.load_landmarks(graph, num_landmarks)
+        elif query_engine == 'ch':
+            engine = contraction_hierarchies.load_contraction_hierarchy(
+                graph)
+        elif query_engine == 'compressed':
+            engine = compressed_graph.CompressedGraph.from_graph(graph)
+        elif query_engine in QUERY_ENGINES:
+            engine = graph
+        else:
+            raise Exception('Unknown query engine: ' + str(query_engine))
+        if engine is not graph:
+            preprocessing_seconds[query_engine] = time.perf_counter() - start
+        engines[query_engine] = engine
+
+    benchmark_results = {
+        'file_name': file_name,
+        'num_nodes': graph.get_num_nodes(),
+        'num_arcs': graph.get_num_arcs(),
+        'cost_profile': cost_profile,
+        'directed': directed,
+        'num_queries': num_queries,
+        'seed': seed,
+        'load_seconds': load_seconds,
+        'preprocessing_seconds': preprocessing_seconds,
+        'peak_rss_after_load': peak_rss_after_load,
+        'results': run_engines(graph, engines, queries, queue_engines,
+                               workspace)}
+    if 'compressed' in engines:
+        benchmark_results['graph_bytes'] = {
+            'uncompressed': graph.get_num_bytes(),
+            'compressed': engines['compressed'].get_num_bytes()}
+
+    if num_cost_updates:
+        latencies = []
+        for arc_indices, costs in generate_cost_updates(
+                graph, num_cost_updates, cost_update_batch_size, seed):
+            start = time.perf_counter()
+            graph.update_arc_costs(arc_indices, costs)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        benchmark_results['cost_updates'] = {
+            'batches': num_cost_updates,
+            'batch_size': cost_update_batch_size,
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99)}
+        # The compressed graph keeps the arc costs of the *.graph file.
+        engines.pop('compressed', None)
+        benchmark_results['results_after_updates'] = run_engines(
+            graph, engines, queries, queue_engines, workspace)
+    benchmark_results['peak_rss'] = get_peak_rss()
+
+    return benchmark_results
+
+def run_engines(graph, engines, queries, queue_engines, workspace):
+    """
+    Answer queries with every query engine and queue engine, see
+    run_queries().
+
+    :param graph: CSRGraph.
+    :param engines: dict of the query engines by name (the graph, a
+        landmarks.Landmarks, a contraction_hierarchies.
+        ContractionHierarchy or a compressed_graph.CompressedGraph
+        object).
+    :param queries: list of tuples (source node id, target node id).
+    :param queue_engines: names in route_planner.QUEUE_ENGINES.
+    :param workspace: route_planner.SearchWorkspace of the queries.
+    :return: dict of the results of run_queries(), keyed '<query
+        engine>/<queue engine>' (just 'ch' for 'ch').
+    """
+
+    results = {}
+    for query_engine, engine in engines.items():
+        if query_engine == 'ch':
+            results[query_engine] = run_queries(
+                lambda source, target: engine.shortest_path(
+                    source, target, workspace=workspace), queries)
+            continue
+        for queue_engine in queue_engines:
+            if query_engine == 'alt':
+                query = (lambda source, target: engine.shortest_path(
+                    source, target, queue_engine, workspace))
+            elif query_engine == 'compressed':
+                query = (lambda source, target: engine.shortest_path(
+                    source, target, queue_engine, workspace=workspace))
+            else:
+                query = (lambda source, target: graph.shortest_path(
+                    source, target, query_engine == 'bidirectional',
+                    queue_engine, query_engine == 'astar',
+                    workspace=workspace))
+            results[query_engine + '/' + queue_engine] = run_queries(
+                query, queries)
+
+    return results
+
+def compare_results(baseline, results, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare two results of run_benchmark() of the same queries.
+
+    :param baseline: dict of the baseline run.
+    :param results: dict of the new run.
+    :param tolerance: relative change that is flagged.
+    :return: list of messages about the regressions, empty if there are
+        none.
+
+    >>> baseline = {'results': {'ch': {'p50': 1.0, 'p95': 2.0, 'p99': 3.0,
+    ...     'settled_per_query': 10.0, 'throughput': 5.0,
+    ...     'distance_sum': 7}}}
+    >>> results = {'results': {'ch': {'p50': 1.05, 'p95': 2.5, 'p99': 3.0,
+    ...     'settled_per_query': 10.0, 'throughput': 4.0,
+    ...     'distance_sum': 8}}}
+    >>> for message in compare_results(baseline, results):
+    ...     print(message)
+    ch: distance_sum changed from 7 to 8
+    ch: p95 regressed from 2 to 2.5 (+25.0%)
+    ch: throughput regressed from 5 to 4 (-20.0%)
+    >>> compare_results(baseline, baseline)
+    []
+    >>> compare_results({'results': {}, 'cost_updates': {'p50': 0.1}},
+    ...                 {'results': {}, 'cost_updates': {'p50': 0.2}})
+    ['cost_updates: p50 regressed from 0.1 to 0.2 (+100.0%)']
+    """
+
+    # Results by key; the results after cost updates are keyed
+    # 'after_updates/<key>'.
+    sections = []
+    for run in (baseline, results):
+        section = dict(run['results'])
+        section.update(('after_updates/' + key, result) for key, result
+                       in run.get('results_after_updates', {}).items())
+        if 'cost_updates' in run:
+            section['cost_updates'] = run['cost_updates']
+        sections.append(section)
+
+    messages = []
+    for key in sorted(sections[0]):
+        if key not in sections[1]:
+            continue
+        old = sections[0][key]
+        new = sections[1][key]
+        if old.get('distance_sum') != new.get('distance_sum'):
+            messages.append('{0}: distance_sum changed from {1} to {2}'.format(
+                key, old['distance_sum'], new['distance_sum']))
+        for metric in LATENCY_METRICS + ('throughput',):
+            if not old.get(metric) or metric not in new:
+                continue
+            change = new[metric] / old[metric] - 1.0
+            if metric == 'throughput':
+                change = -change
+            if change > tolerance:
+                messages.append(
+                    '{0}: {1} regressed from {2:g} to {3:g} ({4:+.1f}%)'
+                    .format(key, metric, old[metric], new[metric],
+                            100.0 * (new[metric] / old[metric] - 1.0)))
+
+    return messages
+
+
+def main():
+    """
+    Main function: run the benchmark of a *.graph file and write its
+    results as JSON, or compare two result files (exit status 1 if there
+    are regressions). See the usage in the module docstring.
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == '--compare':
+        with open(sys.argv[2]) as baseline_file:
+            baseline = json.load(baseline_file)
+        with open(sys.argv[3]) as results_file:
+            results = json.load(results_file)
+        messages = compare_results(baseline, results)
+        for message in messages:
+            print(message)
+        if not messages:
+            print('No regressions.')
+        sys.exit(1 if messages else 0)
+
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    num_cost_updates = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    results = json.dumps(run_benchmark(
+        file_name, num_queries, num_cost_updates=num_cost_updates), indent=2)
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'w') as results_file:
+            results_file.write(results + '\n')
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
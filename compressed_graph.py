@@ -0,0 +1,731 @@
+#! /usr/bin/env python3
+
+"""
+Compressed read-only storage of the graphs of route_planner.
+
+The arcs of each node are stored as a run of varints (7 bits per byte, the
+high bit marks all but the last byte of a value) in one byte array. Each
+arc takes two varints: the difference of its head and tail node id,
+zigzag-encoded so small negative differences stay short, and its distance
+times the number of max. speeds plus the index of its max. speed in the
+speed dictionary of the graph (road graphs have a few distinct max.
+speeds). Renumbering the nodes (see route_planner.CSRGraph.reorder_nodes())
+keeps most differences within one byte.
+
+A search decodes the arcs of each node it settles, so the compressed
+arcs take a fraction of the 12 bytes per arc of a CSRGraph (head,
+distance, max. speed) at the cost of slower queries; travel times are
+computed while decoding instead of being stored. main() reports this
+trade-off for a *.graph file, and benchmark.py reports it as the query
+engine 'compressed'.
+"""
+
+import os
+import sys
+import mmap
+import time
+import random
+import struct
+from array import array
+
+import route_planner
+
+# Compressed graph file format, see CompressedGraph.write_compressed_file().
+COMPRESSED_FILE_MAGIC = b'CSRZGRPH'
+COMPRESSED_FILE_VERSION = 1
+# magic, version, little endian, directed, source size, source mtime [ns],
+# number of nodes, number of arcs (header line), number of stored arcs,
+# number of max. speeds, number of bytes of the arc data, number of
+# original node ids (0 if the nodes are not renumbered).
+COMPRESSED_FILE_HEADER = '<8sI??qqqqqqqq'
+
+
+class CompressedGraph:
+    """
+    Read-only graph with varint-encoded arcs, see the module docstring.
+
+    Searches keep their state in a route_planner.SearchWorkspace like the
+    searches of a CSRGraph. The arc indices of the traceback arcs are the
+    positions of the arcs in the arc data.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> compressed_graph = CompressedGraph.from_graph(graph)
+    >>> compressed_graph
+    [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
+    >>> compressed_graph.shortest_path(0, 3)
+    ShortestPath(path=[0, 1, 2, 3], distance=100, num_settled=4, arcs=[0, 4, 6])
+    >>> compressed_graph.shortest_path(0, 3, 'dial', 'travel_time_100')
+    ShortestPath(path=[0, 1, 2, 3], distance=12, num_settled=4, arcs=[0, 4, 6])
+    >>> compressed_graph.get_num_bytes(), graph.get_num_bytes()
+    (144, 248)
+    """
+
+    def __init__(self):
+        self._num_nodes = 0
+        self._num_arcs = 0
+        # Node information.
+        self._latitudes = array('d')
+        self._longitudes = array('d')
+        # The arcs of node i are encoded at the positions
+        # _byte_offsets[i] .. _byte_offsets[i + 1] - 1 of _arc_data.
+        self._byte_offsets = array('q', [0])
+        self._arc_data = bytearray()
+        self._num_stored_arcs = 0
+        # Speed dictionary: the distinct max. speeds [km/h] of the arcs.
+        self._max_speeds = array('i')
+        self._directed = True
+        # Node id in the *.graph file of each node of a reordered graph,
+        # and its inverse, built on demand by get_node_id().
+        self._original_node_ids = None
+        self._node_ids_by_original = None
+        # Name of the current arc costs, see set_cost_profile().
+        self._cost_profile = 'distance'
+        # Speed [m/s] of each entry of the speed dictionary and max. arc
+        # cost per cost profile, computed on demand.
+        self._speeds = {}
+        self._max_arc_costs = {}
+        # Search state of queries without an own workspace.
+        self._workspace = None
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Compress a graph.
+
+        :param graph: CSRGraph or route_planner.Graph. The compressed
+            graph keeps its node ids and the distances and max. speeds of
+            its arcs, not arc cost updates.
+        :return: CompressedGraph.
+        """
+
+        if isinstance(graph, route_planner.Graph):
+            graph = route_planner.CSRGraph.from_graph(graph)
+        directed = graph.is_directed()
+        num_arcs = graph.get_num_arcs()
+        # A search decodes the outgoing arcs of a node only, so the arcs of
+        # an undirected graph are stored in both directions.
+        graph = graph.to_directed()
+        (offsets, heads) = graph.get_arc_arrays()[:2]
+        (distances, max_speeds) = graph.get_arc_attributes()
+        speed_dictionary = sorted(set(max_speeds))
+        speed_indices = {max_speed: idx for idx, max_speed
+                         in enumerate(speed_dictionary)}
+        num_speeds = len(speed_dictionary)
+
+        compressed_graph = cls()
+        num_nodes = graph.get_num_nodes()
+        byte_offsets = array('q', bytes(8 * (num_nodes + 1)))
+        arc_data = bytearray()
+        for node_id in range(num_nodes):
+            for arc_idx in range(offsets[node_id], offsets[node_id + 1]):
+                delta = heads[arc_idx] - node_id
+                encode_varint(arc_data,
+                              2 * delta if delta >= 0 else -2 * delta - 1)
+                encode_varint(arc_data, distances[arc_idx] * num_speeds +
+                              speed_indices[max_speeds[arc_idx]])
+            byte_offsets[node_id + 1] = len(arc_data)
+
+        (latitudes, longitudes) = graph.get_coordinates()
+        compressed_graph._num_nodes = num_nodes
+        compressed_graph._num_arcs = num_arcs
+        compressed_graph._latitudes = array('d', latitudes)
+        compressed_graph._longitudes = array('d', longitudes)
+        compressed_graph._byte_offsets = byte_offsets
+        compressed_graph._arc_data = arc_data
+        compressed_graph._num_stored_arcs = len(heads)
+        compressed_graph._max_speeds = array('i', speed_dictionary)
+        compressed_graph._directed = directed
+        original_node_ids = array('i', map(graph.get_original_node_id,
+                                           range(num_nodes)))
+        if original_node_ids != array('i', range(num_nodes)):
+            compressed_graph._original_node_ids = original_node_ids
+        compressed_graph._cost_profile = graph.get_cost_profile()
+
+        return compressed_graph
+
+    def write_compressed_file(self, file_name, source_stat=None):
+        """
+        Write the graph into a binary file that can be memory-mapped by
+        read_compressed_file().
+
+        File layout: a fixed-size header (see COMPRESSED_FILE_HEADER)
+        followed by the arrays latitudes, longitudes, byte offsets, speed
+        dictionary, arc data and (for renumbered nodes) original node ids,
+        see route_planner.write_aligned().
+
+        :param file_name: path of the binary file.
+        :param source_stat: os.stat() result of the *.graph file, see
+            route_planner.CSRGraph.write_binary_file().
+        :return: None
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> compressed_graph = CompressedGraph.from_graph(
+        ...     graph.reorder_nodes('bfs'))
+        >>> compressed_graph.write_compressed_file('graph_13/test2.graph.csrz')
+        >>> compressed_graph2 = CompressedGraph()
+        >>> compressed_graph2.read_compressed_file('graph_13/test2.graph.csrz')
+        >>> compressed_graph2
+        [0->1(10), 1->2(10), 2->3(10), 3->1(10), 4->1(10), 4->5(10), 5->4(10), 5->6(10)]
+        >>> compressed_graph2.get_node_id(4), compressed_graph2.get_node_id(5)
+        (5, 4)
+        >>> os.remove('graph_13/test2.graph.csrz')
+        """
+
+        if source_stat is not None:
+            source_size = source_stat.st_size
+            source_mtime = source_stat.st_mtime_ns
+        else:
+            source_size = source_mtime = -1
+
+        header = struct.pack(COMPRESSED_FILE_HEADER, COMPRESSED_FILE_MAGIC,
+                             COMPRESSED_FILE_VERSION,
+                             sys.byteorder == 'little', self._directed,
+                             source_size, source_mtime, self._num_nodes,
+                             self._num_arcs, self._num_stored_arcs,
+                             len(self._max_speeds), len(self._arc_data),
+                             len(self._original_node_ids or ()))
+        tmp_file_name = '{0}.{1}.tmp'.format(file_name, os.getpid())
+        with open(tmp_file_name, 'wb') as binary_file:
+            route_planner.write_aligned(
+                binary_file, [(header, 'B'), (self._latitudes, 'd'),
+                              (self._longitudes, 'd'),
+                              (self._byte_offsets, 'q'),
+                              (self._max_speeds, 'i'),
+                              (bytes(self._arc_data), 'B'),
+                              (self._original_node_ids or (), 'i')])
+        os.replace(tmp_file_name, file_name)
+
+        return None
+
+    def read_compressed_file(self, file_name):
+        """
+        Memory-map a binary file written by write_compressed_file(). The
+        arrays are read-only views of the mapped file.
+
+        :param file_name: path of the binary file.
+        :return: None
+        """
+
+        if self._num_nodes != 0:
+            raise Exception('Graph is already read in')
+
+        with open(file_name, 'rb') as binary_file:
+            mapped_file = mmap.mmap(binary_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        header = read_compressed_file_header(mapped_file)
+        if header is None:
+            raise Exception('Compressed graph file has an invalid header')
+        (num_nodes, num_arcs, num_stored_arcs, num_speeds, num_bytes,
+         num_original_node_ids) = header[3:9]
+        views = route_planner.map_aligned(
+            mapped_file, struct.calcsize(COMPRESSED_FILE_HEADER),
+            [(num_nodes, 'd'), (num_nodes, 'd'), (num_nodes + 1, 'q'),
+             (num_speeds, 'i'), (num_bytes, 'B'),
+             (num_original_node_ids, 'i')])[0]
+
+        self._mapped_file = mapped_file
+        self._directed = header[0]
+        self._num_nodes = num_nodes
+        self._num_arcs = num_arcs
+        self._num_stored_arcs = num_stored_arcs
+        (self._latitudes, self._longitudes, self._byte_offsets,
+         self._max_speeds, self._arc_data) = views[:5]
+        if num_original_node_ids:
+            self._original_node_ids = views[5]
+
+        return None
+
+    def get_num_nodes(self):
+        """
+        :return: number of nodes in graph.
+        """
+        return self._num_nodes
+
+    def get_num_arcs(self):
+        """
+        :return: number of arcs in graph.
+        """
+        return self._num_arcs
+
+    def get_num_bytes(self):
+        """
+        :return: size of the node arrays and the arc data [bytes], see
+            route_planner.CSRGraph.get_num_bytes().
+        """
+        return sum(len(values) * getattr(values, 'itemsize', 1)
+                   for values in (self._latitudes, self._longitudes,
+                                  self._byte_offsets, self._max_speeds,
+                                  self._arc_data,
+                                  self._original_node_ids or ()))
+
+    def get_coordinates(self):
+        """
+        :return: arrays (latitudes, longitudes) of all nodes.
+        """
+        return (self._latitudes, self._longitudes)
+
+    def is_directed(self):
+        """
+        :return: False if every arc was added in both directions.
+        """
+        return self._directed
+
+    def get_original_node_id(self, node_id):
+        """
+        :return: node id in the *.graph file of a node.
+        """
+        if self._original_node_ids is None:
+            return node_id
+        return self._original_node_ids[node_id]
+
+    def get_node_id(self, original_node_id):
+        """
+        :return: node id of the node with the given node id in the *.graph
+            file, -1 if there is no such node.
+        """
+        original_node_ids = self._original_node_ids
+        if original_node_ids is None:
+            if 0 <= original_node_id < self._num_nodes:
+                return original_node_id
+            return -1
+        if self._node_ids_by_original is None:
+            node_ids_by_original = array('i', [-1]) * (
+                max(original_node_ids, default=-1) + 1)
+            for node_id, node_original_id in enumerate(original_node_ids):
+                node_ids_by_original[node_original_id] = node_id
+            self._node_ids_by_original = node_ids_by_original
+        if 0 <= original_node_id < len(self._node_ids_by_original):
+            return self._node_ids_by_original[original_node_id]
+        return -1
+
+    def set_cost_profile(self, cost_profile):
+        """
+        Set the current arc costs by name, see
+        route_planner.CSRGraph.set_cost_profile().
+
+        :param cost_profile: name of the arc costs.
+        :return: None
+        """
+        self._get_speeds(cost_profile)
+        self._cost_profile = cost_profile
+
+        return None
+
+    def get_cost_profile(self):
+        """
+        :return: name of the current arc costs.
+        """
+        return self._cost_profile
+
+    def _get_speeds(self, cost_profile):
+        """
+        :param cost_profile: name of the arc costs, None for the current
+            arc costs.
+        :return: tuple of the speed [m/s] of each entry of the speed
+            dictionary, None for the cost profile 'distance'. Arc costs
+            are computed like route_planner.CSRGraph._compute_costs().
+        """
+
+        if cost_profile is None:
+            cost_profile = self._cost_profile
+        if cost_profile == 'distance':
+            return None
+        speeds = self._speeds.get(cost_profile)
+        if speeds is None:
+            if not cost_profile.startswith('travel_time_'):
+                raise Exception('Unknown cost profile: ' + cost_profile)
+            max_vehicle_speed = int(cost_profile[len('travel_time_'):])
+            speeds = tuple(min(max_speed, max_vehicle_speed) / 3.6
+                           for max_speed in self._max_speeds)
+            self._speeds[cost_profile] = speeds
+
+        return speeds
+
+    def iter_outgoing_arcs(self, node_id, cost_profile=None):
+        """
+        Decode the arcs of a node.
+
+        :param node_id: tail node id of the arcs.
+        :param cost_profile: name of the arc costs, None for the current
+            arc costs.
+        :return: iterator of (arc index, head node id, cost) tuples, the
+            arc index is the position of the arc in the arc data.
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> list(CompressedGraph.from_graph(graph).iter_outgoing_arcs(0))
+        [(0, 1, 30), (2, 2, 70)]
+        """
+
+        speeds = self._get_speeds(cost_profile)
+        num_speeds = len(self._max_speeds)
+        arc_data = self._arc_data
+        pos = self._byte_offsets[node_id]
+        end = self._byte_offsets[node_id + 1]
+        while pos < end:
+            arc_pos = pos
+            # Zigzag-encoded difference of head and tail node id.
+            value = arc_data[pos]
+            pos += 1
+            if value & 0x80:
+                value &= 0x7f
+                shift = 7
+                while True:
+                    byte = arc_data[pos]
+                    pos += 1
+                    value |= (byte & 0x7f) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+            head_node_id = node_id + (value >> 1 if not value & 1
+                                      else -(value + 1 >> 1))
+            # Distance and index of the max. speed.
+            value = arc_data[pos]
+            pos += 1
+            if value & 0x80:
+                value &= 0x7f
+                shift = 7
+                while True:
+                    byte = arc_data[pos]
+                    pos += 1
+                    value |= (byte & 0x7f) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+            (distance, speed_idx) = divmod(value, num_speeds)
+            if speeds is None:
+                yield (arc_pos, head_node_id, distance)
+            else:
+                yield (arc_pos, head_node_id,
+                       round(distance / speeds[speed_idx]))
+
+    def get_max_arc_cost(self, cost_profile=None):
+        """
+        :param cost_profile: name of the arc costs, None for the current
+            arc costs.
+        :return: largest arc cost (0 for a graph without arcs).
+        """
+
+        if cost_profile is None:
+            cost_profile = self._cost_profile
+        max_arc_cost = self._max_arc_costs.get(cost_profile)
+        if max_arc_cost is None:
+            max_arc_cost = max(
+                (cost for node_id in range(self._num_nodes)
+                 for _, _, cost in self.iter_outgoing_arcs(node_id,
+                                                           cost_profile)),
+                default=0)
+            self._max_arc_costs[cost_profile] = max_arc_cost
+
+        return max_arc_cost
+
+    def compute_shortest_paths(self, start_node_id, queue_engine='heap',
+                               workspace=None, cost_profile=None):
+        """
+        Compute the shortest paths from a start node by Dijkstra's
+        algorithm, see route_planner.CSRGraph.compute_shortest_paths().
+
+        :param start_node_id: identifier of start node
+        :param queue_engine: see route_planner.CSRGraph.
+            compute_shortest_paths().
+        :param workspace: SearchWorkspace that receives the search state,
+            by default the workspace of the graph.
+        :param cost_profile: name of the arc costs of this search, by
+            default the current arc costs.
+        :return: None
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> compressed_graph = CompressedGraph.from_graph(graph)
+        >>> compressed_graph.compute_shortest_paths(1)
+        >>> [compressed_graph.get_node_distance(node_id) for node_id in range(5)]
+        [-1, 0, 20, 70, -1]
+        """
+        self._dijkstra(start_node_id, (), queue_engine, workspace,
+                       cost_profile)
+
+        return None
+
+    def shortest_path(self, source_node_id, target_node_id,
+                      queue_engine='heap', cost_profile=None, workspace=None):
+        """
+        Compute the shortest path between two nodes by Dijkstra's
+        algorithm, which stops as soon as the target node is settled.
+
+        :param source_node_id: identifier of source node
+        :param target_node_id: identifier of target node
+        :param queue_engine: see compute_shortest_paths().
+        :param cost_profile: see compute_shortest_paths().
+        :param workspace: see compute_shortest_paths().
+        :return: route_planner.ShortestPath, see
+            route_planner.CSRGraph.shortest_path().
+        """
+
+        workspace = self._get_workspace(workspace)
+        num_settled = self._dijkstra(source_node_id, (target_node_id,),
+                                     queue_engine, workspace, cost_profile)
+        distance = workspace.get_distance(target_node_id)
+        if distance < 0:
+            return route_planner.ShortestPath([], -1, num_settled, [])
+        # Follow the traceback arcs from target to source.
+        path = [target_node_id]
+        arcs = []
+        arc_idx, node_id = workspace.get_traceback(target_node_id)
+        while arc_idx >= 0:
+            arcs.append(arc_idx)
+            path.append(node_id)
+            arc_idx, node_id = workspace.get_traceback(node_id)
+        path.reverse()
+        arcs.reverse()
+
+        return route_planner.ShortestPath(path, distance, num_settled, arcs)
+
+    def _dijkstra(self, start_node_id, target_node_ids, queue_engine,
+                  workspace=None, cost_profile=None):
+        """
+        Dijkstra's algorithm on the arrays of a search workspace, which
+        decodes the arcs of each settled node, see
+        route_planner.CSRGraph._dijkstra().
+
+        :return: number of settled nodes.
+        """
+
+        workspace = self._get_workspace(workspace)
+        workspace.reset()
+        iter_outgoing_arcs = self.iter_outgoing_arcs
+        version = workspace.version
+        stamps = workspace.stamps
+        settled = workspace.settled_stamps
+        node_distances = workspace.distances
+        traceback_arcs = workspace.traceback_arcs
+        traceback_nodes = workspace.traceback_nodes
+
+        # Distance from start node to itself is 0.
+        workspace.set_start(start_node_id)
+        active_nodes = route_planner.make_priority_queue(queue_engine, self,
+                                                         cost_profile)
+        push = active_nodes.push
+        pop = active_nodes.pop
+        push(0, start_node_id)
+
+        num_settled = 0
+        remaining_node_ids = set(target_node_ids)
+        while len(active_nodes):
+            distance, node_id = pop()
+            if settled[node_id] == version:
+                # Node has already been settled.
+                continue
+            # Settle active node.
+            settled[node_id] = version
+            num_settled += 1
+            if node_id in remaining_node_ids:
+                remaining_node_ids.remove(node_id)
+                if not remaining_node_ids:
+                    break
+
+            # Update all connected nodes.
+            for arc_idx, head_node_id, cost in iter_outgoing_arcs(
+                    node_id, cost_profile):
+                if settled[head_node_id] == version:
+                    continue
+                new_distance = distance + cost
+                # Ties are broken like in route_planner.CSRGraph._dijkstra().
+                if stamps[head_node_id] != version:
+                    stamps[head_node_id] = version
+                elif not (new_distance < node_distances[head_node_id] or
+                          (new_distance == node_distances[head_node_id] and
+                           node_id < traceback_nodes[head_node_id])):
+                    continue
+                node_distances[head_node_id] = new_distance
+                traceback_arcs[head_node_id] = arc_idx
+                traceback_nodes[head_node_id] = node_id
+                push(new_distance, head_node_id)
+
+        return num_settled
+
+    def get_node_distance(self, node_id, workspace=None):
+        """
+        :return: distance of a node computed by the last search, -1 if
+            the node was not reached.
+        """
+        return self._get_workspace(workspace).get_distance(node_id)
+
+    def create_workspace(self):
+        """
+        :return: new SearchWorkspace for queries on this graph.
+        """
+        return route_planner.SearchWorkspace(self._num_nodes)
+
+    def _get_workspace(self, workspace=None):
+        """
+        :return: the given workspace, or the workspace of the graph if it
+            is None.
+        """
+        if workspace is not None:
+            return workspace
+        if self._workspace is None:
+            self._workspace = self.create_workspace()
+        return self._workspace
+
+    def __repr__(self):
+        return '[{0}]'.format(', '.join(
+            '{0}->{1}({2})'.format(node_id, head_node_id, cost)
+            for node_id in range(self._num_nodes)
+            for _, head_node_id, cost in self.iter_outgoing_arcs(node_id)))
+
+
+def encode_varint(data, value):
+    """
+    Append a non-negative integer to a bytearray as varint: 7 bits per
+    byte, least significant first, the high bit set on all but the last
+    byte.
+
+    >>> data = bytearray()
+    >>> encode_varint(data, 5); encode_varint(data, 300)
+    >>> list(data), decode_varint(data, 1)
+    ([5, 172, 2], (300, 3))
+    """
+    while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+
+def decode_varint(data, pos):
+    """
+    Decode a varint written by encode_varint().
+
+    :param data: bytes-like object.
+    :param pos: position of the first byte of the varint.
+    :return: tuple (value, position after the varint).
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return (value, pos)
+        shift += 7
+
+def get_compressed_file_name(file_name, directed=True, node_order=None):
+    """
+    Returns the path of the compressed graph file of a *.graph file.
+
+    >>> get_compressed_file_name('test.graph', False, 'hilbert')
+    'test.graph.undirected.hilbert.csrz'
+    """
+    return route_planner.get_binary_file_name(file_name, directed,
+                                              node_order) + 'z'
+
+def read_compressed_file_header(binary_file):
+    """
+    Read the header of a compressed graph file.
+
+    :param binary_file: buffer with the file content (e.g. mmap object).
+    :return: tuple (directed, source size, source mtime, number of nodes,
+        number of arcs, number of stored arcs, number of max. speeds,
+        number of bytes of the arc data, number of original node ids),
+        None if the header does not match this version and byte order.
+    """
+    header_size = struct.calcsize(COMPRESSED_FILE_HEADER)
+    if len(binary_file) < header_size:
+        return None
+    header = struct.unpack_from(COMPRESSED_FILE_HEADER, binary_file)
+    if (header[0] != COMPRESSED_FILE_MAGIC or
+            header[1] != COMPRESSED_FILE_VERSION or
+            header[2] != (sys.byteorder == 'little')):
+        return None
+
+    return header[3:]
+
+def load_compressed_graph(file_name, directed=True, node_order='hilbert'):
+    """
+    Load a *.graph file through its compressed graph file, which is
+    (re)built if it does not exist or if the size or the modification time
+    of the *.graph file have changed.
+
+    :param file_name: path of the *.graph file.
+    :param directed: see route_planner.CSRGraph.read_graph_from_file().
+    :param node_order: renumber the nodes, see
+        route_planner.CSRGraph.load(). Node ids of the file are translated
+        by get_node_id().
+    :return: CompressedGraph backed by the memory-mapped file.
+
+    >>> graph = load_compressed_graph('graph_13/test2.graph')
+    >>> path = graph.shortest_path(graph.get_node_id(0), graph.get_node_id(3))
+    >>> [graph.get_original_node_id(node_id) for node_id in path.path]
+    [0, 1, 2, 3]
+    >>> os.remove(get_compressed_file_name('graph_13/test2.graph', True,
+    ...                                    'hilbert'))
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test2.graph',
+    ...                                              True, 'hilbert'))
+    """
+
+    compressed_file_name = get_compressed_file_name(file_name, directed,
+                                                    node_order)
+    source_stat = os.stat(file_name)
+    try:
+        with open(compressed_file_name, 'rb') as binary_file:
+            header = read_compressed_file_header(binary_file.read(
+                struct.calcsize(COMPRESSED_FILE_HEADER)))
+    except OSError:
+        header = None
+    if (header is None or header[1] != source_stat.st_size or
+            header[2] != source_stat.st_mtime_ns):
+        graph = route_planner.CSRGraph.load(file_name, directed, node_order)
+        CompressedGraph.from_graph(graph).write_compressed_file(
+            compressed_file_name, source_stat)
+    graph = CompressedGraph()
+    graph.read_compressed_file(compressed_file_name)
+
+    return graph
+
+
+def main():
+    """
+    Main function: compare the memory and the query time of the compressed
+    graph with the uncompressed graph, for the node ids of the *.graph
+    file and for the Hilbert node order.
+    Usage: compressed_graph.py [*.graph file] [number of queries]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    for node_order in (None, 'hilbert'):
+        graph = route_planner.CSRGraph.load(file_name, node_order=node_order)
+        compressed_graph = load_compressed_graph(file_name,
+                                                 node_order=node_order)
+        rng = random.Random(0)
+        num_nodes = graph.get_num_nodes()
+        queries = [(rng.randrange(num_nodes), rng.randrange(num_nodes))
+                   for _ in range(num_queries)]
+        print('Node order {0}:'.format(node_order))
+        distances = []
+        for name, query_graph in (('uncompressed', graph),
+                                  ('compressed', compressed_graph)):
+            start = time.perf_counter()
+            distances.append([query_graph.shortest_path(*query).distance
+                              for query in queries])
+            seconds = time.perf_counter() - start
+            print('  {0}: {1:.1f} MB ({2:.1f} bytes per arc), {3:.1f} ms '
+                  'per query'.format(
+                      name, query_graph.get_num_bytes() / 2 ** 20,
+                      query_graph.get_num_bytes() / graph.get_num_arcs(),
+                      seconds / num_queries * 1000))
+        if distances[0] != distances[1]:
+            raise Exception('Distances of the compressed graph differ')
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
@@ -0,0 +1,601 @@
+#! /usr/bin/env python3
+
+"""
+Contraction Hierarchies for the graphs of route_planner.
+
+The nodes are contracted one by one in the order of their importance. When
+a node is contracted, shortcut edges are inserted between its remaining
+neighbours wherever the node lies on the only shortest path between them
+(checked by a local witness search). A query runs Dijkstra's algorithm
+from both ends and follows only edges to more important nodes, so it
+settles a few hundred nodes instead of a large part of the graph.
+Shortcuts are unpacked into the arcs of the graph, so the search state of
+the graph describes the path afterwards (see CSRGraph.set_search_path()).
+The hierarchy is stored next to the *.graph file, keyed by the cost
+profile, and reused as long as the *.graph file does not change. Its
+shortcuts depend on all arc costs, so after arc cost updates (see
+route_planner.CSRGraph.update_arc_costs()) the queries fall back to a
+bidirectional search on the graph until the hierarchy is built again.
+"""
+
+import os
+import sys
+import mmap
+import heapq
+import struct
+import itertools
+from array import array
+
+import route_planner
+
+# Hierarchy file format, see ContractionHierarchy.write_hierarchy_file().
+HIERARCHY_FILE_MAGIC = b'CHSEARCH'
+HIERARCHY_FILE_VERSION = 1
+# magic, version, little endian, source size, source mtime [ns], number of
+# nodes, number of arcs, number of upward edges, number of downward edges,
+# number of shortcuts, cost profile.
+HIERARCHY_FILE_HEADER = '<8sI?qqqqqqq32s'
+
+# Number of settled nodes after which a witness search gives up. Giving up
+# early only adds shortcuts that are not needed, the queries stay exact.
+WITNESS_SETTLE_LIMIT = 500
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy of a CSRGraph for one cost profile.
+
+    Edges are identified by an edge id: ids below the number of arcs of
+    the graph are arcs of the graph, larger ids are shortcuts, which are
+    made of two child edges.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self._cost_profile = graph.get_cost_profile()
+        # Version of the arc costs of the hierarchy, see
+        # route_planner.CSRGraph.get_cost_version().
+        self._cost_version = graph.get_cost_version()
+        # Number of stored arcs, each arc of an undirected graph is stored
+        # once (see route_planner.CSRGraph.get_outgoing_arcs()).
+        self._num_arcs = len(graph.get_costs())
+        # Contraction order of each node (higher is more important).
+        self._ranks = array('i')
+        # Child edges of each shortcut.
+        self._shortcut_first = array('i')
+        self._shortcut_second = array('i')
+        # Upward search graph: edges from each node to more important
+        # nodes as CSR arrays (offsets, heads, costs, edge ids).
+        self._up_offsets = array('q')
+        self._up_heads = array('i')
+        self._up_costs = array('q')
+        self._up_edges = array('i')
+        # Downward search graph: edges from more important nodes into
+        # each node, stored at the node with the tail as head.
+        self._down_offsets = array('q')
+        self._down_heads = array('i')
+        self._down_costs = array('q')
+        self._down_edges = array('i')
+        self._mapped_file = None
+
+    def build(self):
+        """
+        Contract all nodes. The next node to contract is the one with the
+        smallest priority: edge difference (shortcuts added minus edges
+        removed) plus number of contracted neighbours. Priorities are kept
+        in a heap and updated lazily: a popped node whose recomputed
+        priority is larger than the top of the heap is pushed again.
+
+        :return: None
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> hierarchy = ContractionHierarchy(graph)
+        >>> hierarchy.build()
+        >>> hierarchy.get_num_shortcuts()
+        2
+        >>> hierarchy._ranks
+        array('i', [0, 4, 3, 1, 2])
+        """
+
+        graph = self._graph
+        num_nodes = graph.get_num_nodes()
+        self._cost_version = graph.get_cost_version(self._cost_profile)
+        # Remaining graph: head -> (cost, edge id) and tail -> (cost, edge
+        # id) of each node; of parallel arcs only the cheapest is kept.
+        out_edges = [{} for _ in range(num_nodes)]
+        in_edges = [{} for _ in range(num_nodes)]
+        for tail_node_id in range(num_nodes):
+            edges = out_edges[tail_node_id]
+            for arc_idx, head_node_id, cost in graph.get_outgoing_arcs(
+                    tail_node_id):
+                if head_node_id == tail_node_id:
+                    continue
+                if head_node_id not in edges or cost < edges[head_node_id][0]:
+                    edges[head_node_id] = (cost, arc_idx)
+                    in_edges[head_node_id][tail_node_id] = (cost, arc_idx)
+        self._out_edges = out_edges
+        self._in_edges = in_edges
+
+        shortcut_first = array('i')
+        shortcut_second = array('i')
+        num_contracted_neighbours = array('i', bytes(4 * num_nodes))
+        ranks = array('i', [-1]) * num_nodes
+        up_lists = [None] * num_nodes
+        down_lists = [None] * num_nodes
+
+        def get_priority(node_id, shortcuts):
+            return (len(shortcuts) - len(out_edges[node_id]) -
+                    len(in_edges[node_id]) +
+                    num_contracted_neighbours[node_id])
+
+        queue = [(get_priority(node_id, self._find_shortcuts(node_id)),
+                  node_id) for node_id in range(num_nodes)]
+        heapq.heapify(queue)
+        rank = 0
+        while queue:
+            _, node_id = heapq.heappop(queue)
+            shortcuts = self._find_shortcuts(node_id)
+            priority = get_priority(node_id, shortcuts)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, node_id))
+                continue
+
+            ranks[node_id] = rank
+            rank += 1
+            node_out_edges = out_edges[node_id]
+            node_in_edges = in_edges[node_id]
+            up_lists[node_id] = [(head_node_id, cost, edge_id)
+                                 for head_node_id, (cost, edge_id)
+                                 in node_out_edges.items()]
+            down_lists[node_id] = [(tail_node_id, cost, edge_id)
+                                   for tail_node_id, (cost, edge_id)
+                                   in node_in_edges.items()]
+            # Remove the node from the remaining graph.
+            for head_node_id in node_out_edges:
+                del in_edges[head_node_id][node_id]
+                num_contracted_neighbours[head_node_id] += 1
+            for tail_node_id in node_in_edges:
+                del out_edges[tail_node_id][node_id]
+                num_contracted_neighbours[tail_node_id] += 1
+            out_edges[node_id] = {}
+            in_edges[node_id] = {}
+
+            for tail_node_id, head_node_id, cost, first, second in shortcuts:
+                edges = out_edges[tail_node_id]
+                if head_node_id in edges and edges[head_node_id][0] <= cost:
+                    continue
+                edge_id = self._num_arcs + len(shortcut_first)
+                shortcut_first.append(first)
+                shortcut_second.append(second)
+                edges[head_node_id] = (cost, edge_id)
+                in_edges[head_node_id][tail_node_id] = (cost, edge_id)
+
+        del self._out_edges, self._in_edges
+        self._ranks = ranks
+        self._shortcut_first = shortcut_first
+        self._shortcut_second = shortcut_second
+        (self._up_offsets, self._up_heads, self._up_costs,
+         self._up_edges) = _build_search_graph(up_lists)
+        (self._down_offsets, self._down_heads, self._down_costs,
+         self._down_edges) = _build_search_graph(down_lists)
+
+        return None
+
+    def _find_shortcuts(self, node_id):
+        """
+        Find the shortcuts needed to contract a node: for each pair of
+        neighbours u -> node -> w the shortcut u -> w is needed if the
+        witness search from u finds no path to w of the same or smaller
+        cost that avoids the node.
+
+        :return: list of (tail, head, cost, first edge id, second edge id)
+            tuples.
+        """
+
+        out_edges = self._out_edges[node_id]
+        shortcuts = []
+        if not out_edges:
+            return shortcuts
+        max_out_cost = max(cost for cost, _ in out_edges.values())
+        for tail_node_id, (in_cost, in_edge_id) in \
+                self._in_edges[node_id].items():
+            distances = self._witness_search(tail_node_id, node_id,
+                                             in_cost + max_out_cost)
+            for head_node_id, (out_cost, out_edge_id) in out_edges.items():
+                if head_node_id == tail_node_id:
+                    continue
+                cost = in_cost + out_cost
+                witness_cost = distances.get(head_node_id)
+                if witness_cost is None or witness_cost > cost:
+                    shortcuts.append((tail_node_id, head_node_id, cost,
+                                      in_edge_id, out_edge_id))
+
+        return shortcuts
+
+    def _witness_search(self, start_node_id, excluded_node_id, max_cost):
+        """
+        Dijkstra's algorithm on the remaining graph without the excluded
+        node, stopped at max_cost or after WITNESS_SETTLE_LIMIT settled
+        nodes.
+
+        :return: dict node id -> tentative distance.
+        """
+
+        out_edges = self._out_edges
+        distances = {start_node_id: 0}
+        queue = [(0, start_node_id)]
+        num_settled = 0
+        while queue and num_settled < WITNESS_SETTLE_LIMIT:
+            distance, node_id = heapq.heappop(queue)
+            if distance > max_cost:
+                break
+            if distance > distances[node_id]:
+                continue
+            num_settled += 1
+            for head_node_id, (cost, _) in out_edges[node_id].items():
+                if head_node_id == excluded_node_id:
+                    continue
+                new_distance = distance + cost
+                old_distance = distances.get(head_node_id)
+                if old_distance is None or new_distance < old_distance:
+                    distances[head_node_id] = new_distance
+                    heapq.heappush(queue, (new_distance, head_node_id))
+
+        return distances
+
+    def shortest_path(self, source_node_id, target_node_id, workspace=None):
+        """
+        Compute the shortest path between two nodes by a bidirectional
+        search on the upward (from the source) and downward (from the
+        target) search graph. A search direction stops when its smallest
+        key is not shorter than the best path found so far. Afterwards the
+        search state of the graph describes the unpacked path, so
+        route_planner.travel_to() can be used for the target node.
+
+        :param workspace: route_planner.SearchWorkspace that receives the
+            unpacked path, by default the workspace of the graph.
+        :return: route_planner.ShortestPath, see
+            CSRGraph.shortest_path().
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> hierarchy = ContractionHierarchy(graph)
+        >>> hierarchy.build()
+        >>> hierarchy.shortest_path(0, 3)
+        ShortestPath(path=[0, 1, 2, 3], distance=100, num_settled=7, arcs=[0, 2, 3])
+        >>> route_planner.travel_to(graph, 3, 100)[0]
+        0.1
+        >>> hierarchy.shortest_path(4, 2).distance
+        80
+        >>> hierarchy.shortest_path(0, 4)
+        ShortestPath(path=[], distance=-1, num_settled=4, arcs=[])
+        >>> graph.update_arc_costs([graph.find_arc(1, 2)], [200])
+        >>> hierarchy.is_stale(), hierarchy.shortest_path(0, 3).path
+        (True, [0, 2, 3])
+        """
+
+        if self.is_stale():
+            return self._graph.shortest_path(
+                source_node_id, target_node_id, bidirectional=True,
+                workspace=workspace, cost_profile=self._cost_profile)
+        adjacency = ((self._up_offsets, self._up_heads, self._up_costs,
+                      self._up_edges),
+                     (self._down_offsets, self._down_heads,
+                      self._down_costs, self._down_edges))
+        # Search state of the forward (0) and backward (1) search.
+        distances = ({source_node_id: 0}, {target_node_id: 0})
+        parents = ({source_node_id: (-1, -1)}, {target_node_id: (-1, -1)})
+        queues = ([(0, source_node_id)], [(0, target_node_id)])
+        best_distance = -1
+        meeting_node_id = -1
+        num_settled = 0
+        direction = 1
+
+        while queues[0] or queues[1]:
+            # Alternate between the directions while both are active.
+            if queues[1 - direction]:
+                direction = 1 - direction
+            queue = queues[direction]
+            distance, node_id = heapq.heappop(queue)
+            node_distances = distances[direction]
+            if distance > node_distances[node_id]:
+                continue
+            if best_distance >= 0 and distance >= best_distance:
+                # No shorter path through this search direction.
+                del queue[:]
+                continue
+            num_settled += 1
+            other_distance = distances[1 - direction].get(node_id)
+            if other_distance is not None and (
+                    best_distance < 0 or
+                    distance + other_distance < best_distance):
+                best_distance = distance + other_distance
+                meeting_node_id = node_id
+
+            (offsets, heads, costs, edges) = adjacency[direction]
+            node_parents = parents[direction]
+            for idx in range(offsets[node_id], offsets[node_id + 1]):
+                head_node_id = heads[idx]
+                new_distance = distance + costs[idx]
+                old_distance = node_distances.get(head_node_id)
+                if old_distance is None or new_distance < old_distance:
+                    node_distances[head_node_id] = new_distance
+                    node_parents[head_node_id] = (node_id, edges[idx])
+                    heapq.heappush(queue, (new_distance, head_node_id))
+
+        if meeting_node_id < 0:
+            return route_planner.ShortestPath([], -1, num_settled, [])
+
+        # Edges from the source to the meeting node and from there to the
+        # target.
+        forward_edges = []
+        node_id = meeting_node_id
+        while node_id != source_node_id:
+            node_id, edge_id = parents[0][node_id]
+            forward_edges.append(edge_id)
+        forward_edges.reverse()
+        node_id = meeting_node_id
+        while node_id != target_node_id:
+            node_id, edge_id = parents[1][node_id]
+            forward_edges.append(edge_id)
+        arcs = self.unpack_edges(forward_edges)
+        path = self._graph.set_search_path(source_node_id, arcs, workspace)
+
+        return route_planner.ShortestPath(path, best_distance, num_settled,
+                                          arcs)
+
+    def unpack_edges(self, edge_ids):
+        """
+        Replace shortcuts by the arcs they are made of.
+
+        :param edge_ids: edge ids of a path.
+        :return: list of arc indices of the path.
+        """
+
+        num_arcs = self._num_arcs
+        shortcut_first = self._shortcut_first
+        shortcut_second = self._shortcut_second
+        arcs = []
+        stack = list(reversed(edge_ids))
+        while stack:
+            edge_id = stack.pop()
+            if edge_id < num_arcs:
+                arcs.append(edge_id)
+            else:
+                stack.append(shortcut_second[edge_id - num_arcs])
+                stack.append(shortcut_first[edge_id - num_arcs])
+
+        return arcs
+
+    def is_stale(self):
+        """
+        :return: True if the arc costs of the graph have changed since the
+            hierarchy was built.
+        """
+        return (self._graph.get_cost_version(self._cost_profile) !=
+                self._cost_version)
+
+    def get_num_shortcuts(self):
+        """
+        :return: number of shortcuts.
+        """
+        return len(self._shortcut_first)
+
+    def write_hierarchy_file(self, file_name):
+        """
+        Write the hierarchy into a binary file, which can be memory-mapped
+        by read_hierarchy_file(). The file is written to a temporary file
+        first and then renamed, so concurrent readers never see a partial
+        file.
+
+        File layout: a fixed-size header (see HIERARCHY_FILE_HEADER)
+        followed by the ranks, the child edges of the shortcuts and the
+        arrays of the upward and the downward search graph, see
+        route_planner.write_aligned().
+
+        :param file_name: path of the hierarchy file.
+        :return: None
+        """
+
+        source_file_name = self._graph.get_source_file_name()
+        if source_file_name is None:
+            raise Exception('Graph was not read from a *.graph file')
+        source_stat = os.stat(source_file_name)
+        header = struct.pack(HIERARCHY_FILE_HEADER, HIERARCHY_FILE_MAGIC,
+                             HIERARCHY_FILE_VERSION,
+                             sys.byteorder == 'little',
+                             source_stat.st_size, source_stat.st_mtime_ns,
+                             len(self._ranks), self._num_arcs,
+                             len(self._up_heads), len(self._down_heads),
+                             len(self._shortcut_first),
+                             self._cost_profile.encode())
+        tmp_file_name = '{0}.{1}.tmp'.format(file_name, os.getpid())
+        with open(tmp_file_name, 'wb') as hierarchy_file:
+            route_planner.write_aligned(hierarchy_file, [
+                (header, 'B'), (self._ranks, 'i'),
+                (self._shortcut_first, 'i'), (self._shortcut_second, 'i'),
+                (self._up_offsets, 'q'), (self._up_heads, 'i'),
+                (self._up_costs, 'q'), (self._up_edges, 'i'),
+                (self._down_offsets, 'q'), (self._down_heads, 'i'),
+                (self._down_costs, 'q'), (self._down_edges, 'i')])
+        os.replace(tmp_file_name, file_name)
+
+        return None
+
+    def read_hierarchy_file(self, file_name):
+        """
+        Memory-map a hierarchy file written by write_hierarchy_file(). The
+        arrays are read-only views of the mapped file.
+
+        :param file_name: path of the hierarchy file.
+        :return: None
+        """
+
+        with open(file_name, 'rb') as hierarchy_file:
+            mapped_file = mmap.mmap(hierarchy_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        header = read_hierarchy_file_header(mapped_file)
+        if header is None:
+            raise Exception('Hierarchy file has an invalid header')
+        (num_nodes, num_arcs, num_up_edges, num_down_edges, num_shortcuts,
+         cost_profile) = header[2:8]
+        if (num_nodes != self._graph.get_num_nodes() or
+                num_arcs != self._num_arcs):
+            raise Exception('Hierarchy file belongs to another graph')
+
+        views = route_planner.map_aligned(
+            mapped_file, struct.calcsize(HIERARCHY_FILE_HEADER),
+            [(num_nodes, 'i'), (num_shortcuts, 'i'), (num_shortcuts, 'i'),
+             (num_nodes + 1, 'q'), (num_up_edges, 'i'), (num_up_edges, 'q'),
+             (num_up_edges, 'i'), (num_nodes + 1, 'q'),
+             (num_down_edges, 'i'), (num_down_edges, 'q'),
+             (num_down_edges, 'i')])[0]
+        (self._ranks, self._shortcut_first, self._shortcut_second,
+         self._up_offsets, self._up_heads, self._up_costs, self._up_edges,
+         self._down_offsets, self._down_heads, self._down_costs,
+         self._down_edges) = views
+        self._mapped_file = mapped_file
+        self._cost_profile = cost_profile
+        # The file holds the hierarchy of the costs of the *.graph file.
+        self._cost_version = 0
+
+        return None
+
+
+def _build_search_graph(edge_lists):
+    """
+    Build the CSR arrays of a search graph.
+
+    :param edge_lists: list of (head, cost, edge id) tuples of each node.
+    :return: tuple of arrays (offsets, heads, costs, edge ids).
+    """
+    offsets = array('q', itertools.accumulate(map(len, edge_lists),
+                                              initial=0))
+    heads = array('i')
+    costs = array('q')
+    edges = array('i')
+    for edge_list in edge_lists:
+        for head_node_id, cost, edge_id in edge_list:
+            heads.append(head_node_id)
+            costs.append(cost)
+            edges.append(edge_id)
+
+    return (offsets, heads, costs, edges)
+
+def get_hierarchy_file_name(file_name, cost_profile, directed=True,
+                            node_order=None):
+    """
+    Returns the path of the hierarchy file of a *.graph file.
+
+    >>> get_hierarchy_file_name('test.graph', 'travel_time_130')
+    'test.graph.travel_time_130.ch'
+    >>> get_hierarchy_file_name('test.graph', 'distance', False, 'bfs')
+    'test.graph.undirected.bfs.distance.ch'
+    """
+    if not directed:
+        file_name += '.undirected'
+    if node_order is not None:
+        file_name += '.' + node_order
+    return '{0}.{1}.ch'.format(file_name, cost_profile)
+
+def read_hierarchy_file_header(hierarchy_file):
+    """
+    Read the header of a hierarchy file.
+
+    :param hierarchy_file: buffer with the file content (e.g. mmap
+        object).
+    :return: tuple (source size, source mtime, number of nodes, number of
+        arcs, number of upward edges, number of downward edges, number of
+        shortcuts, cost profile), None if the header does not match this
+        version and byte order.
+    """
+    header_size = struct.calcsize(HIERARCHY_FILE_HEADER)
+    if len(hierarchy_file) < header_size:
+        return None
+    header = struct.unpack_from(HIERARCHY_FILE_HEADER, hierarchy_file)
+    if (header[0] != HIERARCHY_FILE_MAGIC or
+            header[1] != HIERARCHY_FILE_VERSION or
+            header[2] != (sys.byteorder == 'little')):
+        return None
+
+    return header[3:10] + (header[10].rstrip(b'\0').decode(),)
+
+def load_contraction_hierarchy(graph):
+    """
+    Load the contraction hierarchy of a graph and its current cost profile
+    from the hierarchy file, or build it and write the hierarchy file. The
+    hierarchy is rebuilt if the *.graph file has changed (size or mtime).
+    After arc cost updates the hierarchy is built for the current costs
+    and not written, the file keeps the costs of the *.graph file.
+
+    :param graph: CSRGraph read from a *.graph file.
+    :return: ContractionHierarchy object.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> load_contraction_hierarchy(graph).get_num_shortcuts()
+    2
+    >>> hierarchy = load_contraction_hierarchy(graph)
+    >>> hierarchy._up_heads  # doctest: +ELLIPSIS
+    <memory at 0x...>
+    >>> hierarchy.shortest_path(0, 3).path
+    [0, 1, 2, 3]
+    >>> os.remove('graph_13/test.graph.distance.ch')
+    """
+
+    file_name = get_hierarchy_file_name(graph.get_source_file_name(),
+                                        graph.get_cost_profile(),
+                                        graph.is_directed(),
+                                        graph.get_node_order())
+    hierarchy = ContractionHierarchy(graph)
+    source_stat = os.stat(graph.get_source_file_name())
+    try:
+        with open(file_name, 'rb') as hierarchy_file:
+            header = read_hierarchy_file_header(hierarchy_file.read(
+                struct.calcsize(HIERARCHY_FILE_HEADER)))
+    except OSError:
+        header = None
+    if graph.get_cost_version() != 0:
+        hierarchy.build()
+        return hierarchy
+    if (header is not None and header[0] == source_stat.st_size and
+            header[1] == source_stat.st_mtime_ns):
+        hierarchy.read_hierarchy_file(file_name)
+        return hierarchy
+
+    hierarchy.build()
+    hierarchy.write_hierarchy_file(file_name)
+
+    return hierarchy
+
+
+def main():
+    """
+    Main function: build the contraction hierarchy of a *.graph file and
+    run a query.
+    Usage: contraction_hierarchies.py [*.graph file] [cost profile]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    cost_profile = sys.argv[2] if len(sys.argv) > 2 else 'distance'
+
+    graph = route_planner.CSRGraph.load(file_name)
+    graph.set_cost_profile(cost_profile)
+    hierarchy = load_contraction_hierarchy(graph)
+    print('Shortcuts: {0}'.format(hierarchy.get_num_shortcuts()))
+    result = hierarchy.shortest_path(5508637, 4435496)
+    print('Settled nodes: {0}'.format(result.num_settled))
+    distance, time = route_planner.travel_to(graph, 4435496, sys.maxsize)
+    print("Distance: {0:.3f} km\tTime: {1}".format(distance, time))
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
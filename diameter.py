@@ -0,0 +1,388 @@
+#! /usr/bin/env python3
+
+"""
+Eccentricities and diameter bounds for the graphs of route_planner.
+
+The eccentricity of a node is the largest distance from it to another node
+(or, backward, from another node to it), computed by one search that
+tracks the furthest settled node (see CSRGraph.compute_eccentricity()).
+The diameter is the largest eccentricity, restricted to the largest
+(strongly) connected component, where all distances are finite.
+
+Computing every eccentricity costs one search per node. Two methods bound
+the diameter with a few searches ("sweeps") instead:
+
+'double sweep': a sweep from a random node finds a far node a, a second
+    sweep from a finds the node b furthest from a; d(a, b) is a lower
+    bound. A node u in the middle of the path from a to b gives the upper
+    bound ecc_backward(u) + ecc_forward(u) (2 ecc(u) if undirected).
+    Several independent double sweeps from random nodes improve the lower
+    bound.
+'ifub': iFUB (iterative fringe upper bound, extended to weighted and
+    directed graphs) starts at such a node u. Every path x -> y satisfies
+    d(x, y) <= d(x, u) + d(u, y). The nodes are swept in order of
+    decreasing d(x, u) resp. d(u, y); once every remaining pair is bounded
+    by the eccentricities found so far, the lower bound is the diameter.
+
+The sweeps of a round are independent and run on a process pool. Each
+worker loads the graph through its binary file (see
+route_planner.CSRGraph.load()), like the workers of landmarks and
+batch_routing.
+"""
+
+import os
+import sys
+import time
+import random
+import collections
+import concurrent.futures
+
+import route_planner
+
+# Number of double sweeps of iterative_double_sweep().
+NUM_DOUBLE_SWEEPS = 4
+
+# Graph, node mask of the largest component and cost profile of a worker
+# process, see _init_worker().
+_worker_graph = None
+_worker_sweeps = None
+
+# Result of a diameter computation: lower and upper bound of the diameter,
+# a pair of nodes at the distance of the lower bound and the number of
+# sweeps (searches).
+DiameterBounds = collections.namedtuple(
+    'DiameterBounds', ['lower', 'upper', 'source_node_id', 'target_node_id',
+                       'num_sweeps'])
+
+
+class SweepPool:
+    """
+    Runs sweeps (eccentricity searches) of a graph restricted to its
+    largest component, on a process pool or in this process.
+
+    With more than one process, this needs a graph read from a *.graph
+    file whose arc costs were not updated (see
+    CSRGraph.update_arc_costs()); otherwise the sweeps run in this
+    process.
+    """
+
+    def __init__(self, graph, cost_profile=None, num_processes=None):
+        """
+        :param graph: CSRGraph.
+        :param cost_profile: see CSRGraph.compute_shortest_paths(), None
+            for the current cost profile of the graph.
+        :param num_processes: number of worker processes, None for the
+            number of CPUs.
+        """
+        self._graph = graph
+        self._cost_profile = cost_profile or graph.get_cost_profile()
+        self.node_mask = bytearray(graph.get_num_nodes())
+        for node_id in graph.get_largest_component_node_ids(
+                graph.is_directed()):
+            self.node_mask[node_id] = 1
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self.num_sweeps = 0
+        self._workspace = graph.create_workspace()
+        self._executor = None
+        file_name = graph.get_source_file_name()
+        # Worker processes read the costs of the *.graph file.
+        if (self.num_processes > 1 and file_name is not None and
+                graph.get_cost_version(self._cost_profile) == 0):
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                self.num_processes, initializer=_init_worker,
+                initargs=(file_name, graph.is_directed(),
+                          graph.get_node_order(), self._cost_profile,
+                          self.node_mask))
+
+    def sweep(self, node_id, backward=False):
+        """
+        Sweep from one node in this process. Afterwards the workspace of
+        the graph holds all distances from (backward: to) the node.
+
+        :return: tuple (eccentricity, furthest node id) within the largest
+            component.
+        """
+        self.num_sweeps += 1
+        return self._graph.compute_eccentricity(
+            node_id, backward=backward, cost_profile=self._cost_profile,
+            node_mask=self.node_mask)
+
+    def get_distances(self):
+        """
+        :return: array with the distances of the last sweep().
+        """
+        return self._graph.get_node_distances()
+
+    def map(self, sweeps):
+        """
+        Run independent sweeps.
+
+        :param sweeps: list of tuples (node id, backward).
+        :return: list of tuples (eccentricity, furthest node id), see
+            CSRGraph.compute_eccentricity().
+        """
+        self.num_sweeps += len(sweeps)
+        if self._executor is None or len(sweeps) < 2:
+            return [_sweep(self._graph, node_id, backward, self._workspace,
+                           self._cost_profile, self.node_mask)
+                    for node_id, backward in sweeps]
+        return list(self._executor.map(_worker_sweep, sweeps))
+
+    def close(self):
+        """ Shut the worker processes down. """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def compute_eccentricities(graph, node_ids, backward=False, cost_profile=None,
+                           num_processes=None):
+    """
+    Compute the eccentricities of many nodes within the largest component.
+
+    :param graph: CSRGraph.
+    :param node_ids: sequence of node ids.
+    :param backward: largest distance to the nodes instead.
+    :param cost_profile: see SweepPool.
+    :param num_processes: see SweepPool.
+    :return: list of tuples (eccentricity, furthest node id), (-1, -1) for
+        nodes that reach no node of the largest component.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> compute_eccentricities(graph, [0, 1, 2], num_processes=1)
+    [(100, 3), (70, 3), (90, 1)]
+    >>> compute_eccentricities(graph, [0, 1], True, 'travel_time_100', 2)
+    [(-1, -1), (11, 2)]
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test.graph'))
+    """
+    with SweepPool(graph, cost_profile, num_processes) as pool:
+        return pool.map([(node_id, backward) for node_id in node_ids])
+
+
+def iterative_double_sweep(graph, num_double_sweeps=NUM_DOUBLE_SWEEPS,
+                           cost_profile=None, num_processes=None, seed=0):
+    """
+    Bound the diameter by independent double sweeps from random nodes of
+    the largest component, see the module docstring.
+
+    :param graph: CSRGraph.
+    :param num_double_sweeps: number of double sweeps.
+    :param cost_profile: see SweepPool.
+    :param num_processes: see SweepPool.
+    :param seed: seed of the random start nodes.
+    :return: DiameterBounds.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> iterative_double_sweep(graph, 2, num_processes=1)
+    DiameterBounds(lower=60, upper=160, source_node_id=3, target_node_id=2, num_sweeps=7)
+    """
+    with SweepPool(graph, cost_profile, num_processes) as pool:
+        bounds = _double_sweeps(graph, pool, num_double_sweeps, seed)[0]
+
+    return bounds
+
+
+def ifub(graph, cost_profile=None, num_processes=None, max_sweeps=None,
+         seed=0):
+    """
+    Compute the diameter by iFUB, see the module docstring. Each round
+    sweeps as many nodes as there are processes.
+
+    :param graph: CSRGraph.
+    :param cost_profile: see SweepPool.
+    :param num_processes: see SweepPool.
+    :param max_sweeps: stop after about this many sweeps with the bounds
+        found so far, None to compute the exact diameter.
+    :param seed: seed of the random start nodes of the double sweeps.
+    :return: DiameterBounds, lower == upper if the diameter is exact.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> ifub(graph, num_processes=1)
+    DiameterBounds(lower=90, upper=90, source_node_id=2, target_node_id=1, num_sweeps=9)
+    >>> undirected_graph = route_planner.CSRGraph()
+    >>> undirected_graph.read_graph_from_file('graph_13/test2.graph', False)
+    >>> ifub(undirected_graph, num_processes=1).lower
+    40
+    >>> max(eccentricity for eccentricity, _ in compute_eccentricities(
+    ...     undirected_graph, range(7), num_processes=1))
+    40
+    """
+
+    directed = graph.is_directed()
+    with SweepPool(graph, cost_profile, num_processes) as pool:
+        (bounds, center_node_id) = _double_sweeps(graph, pool, 1, seed)
+        if center_node_id < 0:
+            return bounds
+        (lower, _, source_node_id, target_node_id, _) = bounds
+
+        # Distances from all nodes to the center and from the center.
+        node_ids = [node_id for node_id in range(graph.get_num_nodes())
+                    if pool.node_mask[node_id]]
+        pool.sweep(center_node_id, backward=directed)
+        to_center = pool.get_distances()
+        if directed:
+            pool.sweep(center_node_id)
+            from_center = pool.get_distances()
+        else:
+            from_center = to_center
+        # Sources and targets in order of decreasing distance to resp.
+        # from the center; the eccentricities of the swept ones are known.
+        sources = sorted(node_ids, key=to_center.__getitem__, reverse=True)
+        targets = sorted(node_ids, key=from_center.__getitem__,
+                         reverse=True)
+        num_sources = num_targets = 0
+
+        while True:
+            if num_sources == len(sources) or num_targets == len(targets):
+                # Every pair has a swept end.
+                upper = lower
+                break
+            # Bound of the pairs of a remaining source and target.
+            source_bound = to_center[sources[num_sources]]
+            target_bound = from_center[targets[num_targets]]
+            upper = max(lower, source_bound + target_bound)
+            if lower >= source_bound + target_bound or (
+                    max_sweeps is not None and
+                    pool.num_sweeps >= max_sweeps):
+                break
+            if source_bound >= target_bound:
+                batch = sources[num_sources:num_sources + pool.num_processes]
+                num_sources += len(batch)
+                if not directed:
+                    num_targets = num_sources
+                backward = False
+            else:
+                batch = targets[num_targets:num_targets + pool.num_processes]
+                num_targets += len(batch)
+                backward = True
+            for node_id, (eccentricity, furthest_node_id) in zip(
+                    batch, pool.map([(node_id, backward)
+                                     for node_id in batch])):
+                if eccentricity > lower:
+                    lower = eccentricity
+                    (source_node_id, target_node_id) = (
+                        (furthest_node_id, node_id) if backward
+                        else (node_id, furthest_node_id))
+
+        return DiameterBounds(lower, min(upper, bounds.upper),
+                              source_node_id, target_node_id,
+                              pool.num_sweeps)
+
+
+def _double_sweeps(graph, pool, num_double_sweeps, seed):
+    """
+    Run independent double sweeps.
+
+    :return: tuple (DiameterBounds, center node id) with the center of the
+        path of the best double sweep, see the module docstring.
+    """
+
+    directed = graph.is_directed()
+    node_ids = [node_id for node_id in range(graph.get_num_nodes())
+                if pool.node_mask[node_id]]
+    if not node_ids:
+        return (DiameterBounds(-1, -1, -1, -1, 0), -1)
+    rng = random.Random(seed)
+    starts = [rng.choice(node_ids) for _ in range(num_double_sweeps)]
+    # First sweeps backward: far nodes a that reach the start nodes, then
+    # forward from a to the node b furthest from a.
+    far_node_ids = [furthest_node_id for _, furthest_node_id
+                    in pool.map([(node_id, directed) for node_id in starts])]
+    results = pool.map([(node_id, False) for node_id in far_node_ids])
+    (lower, source_node_id, target_node_id) = max(
+        (eccentricity, node_id, furthest_node_id)
+        for node_id, (eccentricity, furthest_node_id)
+        in zip(far_node_ids, results))
+
+    # Center of the path from a to b.
+    pool.sweep(source_node_id)
+    node_id = target_node_id
+    distance = pool.get_distances()
+    center_node_id = node_id
+    while 2 * distance[node_id] >= lower:
+        center_node_id = node_id
+        arc = graph.get_traceback_arc(node_id)
+        if arc is None:
+            break
+        # The other end of the arc (arcs of an undirected graph may have
+        # been traversed from head to tail).
+        node_id = (arc.tail_node_id if arc.head_node_id == node_id
+                   else arc.head_node_id)
+    eccentricities = pool.map([(center_node_id, directed)] +
+                              ([(center_node_id, False)] if directed
+                               else []))
+    upper = eccentricities[0][0] + eccentricities[-1][0]
+
+    return (DiameterBounds(lower, max(lower, upper), source_node_id,
+                           target_node_id, pool.num_sweeps), center_node_id)
+
+
+def _sweep(graph, node_id, backward, workspace, cost_profile, node_mask):
+    """ Sweep from one node, see CSRGraph.compute_eccentricity(). """
+    return graph.compute_eccentricity(node_id, backward=backward,
+                                      workspace=workspace,
+                                      cost_profile=cost_profile,
+                                      node_mask=node_mask)
+
+
+def _init_worker(file_name, directed, node_order, cost_profile, node_mask):
+    """ Load the graph in a worker process of SweepPool. """
+    global _worker_graph, _worker_sweeps
+    _worker_graph = route_planner.CSRGraph.load(file_name, directed,
+                                                node_order)
+    _worker_sweeps = (_worker_graph.create_workspace(), cost_profile,
+                      node_mask)
+
+
+def _worker_sweep(sweep):
+    """ Task of a worker process of SweepPool: one sweep. """
+    return _sweep(_worker_graph, sweep[0], sweep[1], *_worker_sweeps)
+
+
+def main():
+    """
+    Main function: bound the diameter of a *.graph file by double sweeps
+    and compute it by iFUB.
+    Usage: diameter.py [*.graph file] [cost profile] [max. number of sweeps]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    cost_profile = sys.argv[2] if len(sys.argv) > 2 else 'distance'
+    max_sweeps = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    graph = route_planner.CSRGraph.load(file_name)
+    for name, method in (('double sweep', iterative_double_sweep),
+                         ('iFUB', ifub)):
+        start = time.perf_counter()
+        if method is ifub:
+            bounds = ifub(graph, cost_profile, max_sweeps=max_sweeps)
+        else:
+            bounds = method(graph, cost_profile=cost_profile)
+        print('{0}: {1} <= diameter <= {2} ({3} -> {4}), {5} sweeps in '
+              '{6:.2f} s'.format(name, bounds.lower, bounds.upper,
+                                 graph.get_original_node_id(
+                                     bounds.source_node_id),
+                                 graph.get_original_node_id(
+                                     bounds.target_node_id),
+                                 bounds.num_sweeps,
+                                 time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
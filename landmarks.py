@@ -0,0 +1,620 @@
+#! /usr/bin/env python3
+
+"""
+ALT (A*, landmarks and triangle inequality) preprocessing for the graphs of
+route_planner.
+
+For k landmarks the distances from and to every node are computed once.
+By the triangle inequality they give lower bounds of the distance between
+any two nodes, which guide the A* search of CSRGraph.shortest_path().
+The distance tables are stored next to the *.graph file, keyed by the cost
+profile, and reused as long as the *.graph file does not change. Tables of
+the costs of the *.graph file stay valid lower bounds while arc cost updates
+(see route_planner.CSRGraph.update_arc_costs()) only make arcs more
+expensive, e.g. live traffic.
+"""
+
+import os
+import sys
+import mmap
+import random
+import itertools
+import struct
+import concurrent.futures
+from array import array
+
+import route_planner
+
+# Landmark file format, see Landmarks.write_landmark_file().
+LANDMARK_FILE_MAGIC = b'ALTTABLE'
+LANDMARK_FILE_VERSION = 1
+# magic, version, little endian, source size, source mtime [ns], number of
+# nodes, number of landmarks, type code of the tables, cost profile.
+LANDMARK_FILE_HEADER = '<8sI?qqqqc32s'
+
+# Graph of a worker process, see _init_worker().
+_worker_graph = None
+
+
+class Landmarks:
+    """
+    Landmarks of a CSRGraph with their distance tables for one cost
+    profile.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self._cost_profile = graph.get_cost_profile()
+        # Version of the arc costs of the distance tables, see
+        # route_planner.CSRGraph.get_cost_version().
+        self._cost_version = graph.get_cost_version()
+        self._landmark_ids = []
+        # Distances from each landmark to all nodes (forward) and from all
+        # nodes to each landmark (backward), -1 for unreachable nodes.
+        self._forward_tables = []
+        self._backward_tables = []
+
+    def select_landmarks(self, num_landmarks, method='farthest', seed=0):
+        """
+        Select landmarks.
+
+        'farthest': each landmark is the node with the largest distance to
+            the landmarks selected so far.
+        'avoid': each landmark is a leaf of a shortest path tree from a
+            random node, in the subtree whose distances are covered worst
+            by the lower bounds of the landmarks selected so far. The
+            distance tables are computed during the selection.
+
+        :param num_landmarks: number of landmarks.
+        :param method: 'farthest' or 'avoid'.
+        :param seed: seed of the random start nodes.
+        :return: list of landmark node ids.
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> Landmarks(graph).select_landmarks(2)
+        [2, 1]
+        >>> Landmarks(graph).select_landmarks(2, 'avoid')
+        [2, 3]
+        """
+
+        graph = self._graph
+        num_nodes = graph.get_num_nodes()
+        rng = random.Random(seed)
+        if method == 'farthest':
+            # Smallest distance of each node to the selected landmarks.
+            graph.compute_shortest_paths(rng.randrange(num_nodes),
+                                         cost_profile=self._cost_profile)
+            min_distances = graph.get_node_distances()
+            for _ in range(num_landmarks):
+                landmark_id = _find_max_node(min_distances,
+                                             self._landmark_ids)
+                if landmark_id < 0:
+                    break
+                self._landmark_ids.append(landmark_id)
+                graph.compute_shortest_paths(landmark_id,
+                                             cost_profile=self._cost_profile)
+                distances = graph.get_node_distances()
+                for node_id in range(num_nodes):
+                    distance = distances[node_id]
+                    if distance >= 0 and (min_distances[node_id] < 0 or
+                                          distance < min_distances[node_id]):
+                        min_distances[node_id] = distance
+        elif method == 'avoid':
+            num_attempts = 0
+            while (len(self._landmark_ids) < num_landmarks and
+                   num_attempts < 4 * num_landmarks):
+                num_attempts += 1
+                landmark_id = self._select_avoid_landmark(
+                    rng.randrange(num_nodes))
+                if landmark_id < 0:
+                    # No uncovered subtree from this root, try another one.
+                    continue
+                self._landmark_ids.append(landmark_id)
+                self._forward_tables.append(None)
+                self._backward_tables.append(None)
+                self._compute_table(len(self._landmark_ids) - 1)
+        else:
+            raise Exception('Unknown landmark selection method: ' + method)
+
+        return self._landmark_ids
+
+    def _select_avoid_landmark(self, root_node_id):
+        """
+        Select one landmark by the 'avoid' method.
+
+        :param root_node_id: root of the shortest path tree.
+        :return: landmark node id, -1 if no node can be selected.
+        """
+
+        graph = self._graph
+        num_nodes = graph.get_num_nodes()
+        workspace = graph.create_workspace()
+        graph.compute_shortest_paths(root_node_id, workspace=workspace,
+                                     cost_profile=self._cost_profile)
+        distances = workspace.get_distances()
+        parents = workspace.get_traceback_nodes()
+        reached_nodes = [node_id for node_id in range(num_nodes)
+                         if distances[node_id] >= 0]
+        # Weight: difference of distance and lower bound from the root.
+        sizes = array('q', bytes(8 * num_nodes))
+        for node_id in reached_nodes:
+            sizes[node_id] = distances[node_id]
+        for forward, backward in zip(self._forward_tables,
+                                     self._backward_tables):
+            forward_root = forward[root_node_id]
+            backward_root = backward[root_node_id]
+            for node_id in reached_nodes:
+                bound = 0
+                if forward_root >= 0 and forward[node_id] >= 0:
+                    bound = forward[node_id] - forward_root
+                if (backward[node_id] >= 0 and
+                        backward_root - backward[node_id] > bound):
+                    bound = backward_root - backward[node_id]
+                if distances[node_id] - bound < sizes[node_id]:
+                    sizes[node_id] = distances[node_id] - bound
+        # Subtree sizes, children before their parents.
+        has_landmark = bytearray(num_nodes)
+        for landmark_id in self._landmark_ids:
+            has_landmark[landmark_id] = 1
+        reached_nodes.sort(key=distances.__getitem__, reverse=True)
+        children = {}
+        for node_id in reached_nodes:
+            parent_id = parents[node_id]
+            if parent_id >= 0:
+                sizes[parent_id] += sizes[node_id]
+                has_landmark[parent_id] |= has_landmark[node_id]
+                children.setdefault(parent_id, []).append(node_id)
+        for node_id in reached_nodes:
+            if has_landmark[node_id]:
+                sizes[node_id] = 0
+
+        node_id = _find_max_node(sizes, self._landmark_ids)
+        if node_id < 0 or sizes[node_id] <= 0:
+            return -1
+        # Go down to a leaf along the largest subtrees.
+        while node_id in children:
+            node_id = max(children[node_id], key=sizes.__getitem__)
+
+        return node_id
+
+    def compute_tables(self, num_processes=None):
+        """
+        Compute the missing distance tables of the selected landmarks,
+        each by a forward and a backward Dijkstra search.
+
+        With more than one process, the landmarks are distributed over a
+        process pool. Each worker loads the graph through its binary file
+        (see route_planner.CSRGraph.load()), so this needs a graph read
+        from a *.graph file. Otherwise the tables are computed in this
+        process.
+
+        :param num_processes: number of worker processes, None for the
+            number of CPUs.
+        :return: None
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> landmarks = Landmarks(graph)
+        >>> landmarks.select_landmarks(2)
+        [2, 1]
+        >>> landmarks.compute_tables(1)
+        >>> landmarks._forward_tables[0]
+        array('i', [-1, 90, 0, 50, -1])
+
+        The tables are of the cost profile of the graph at construction.
+        >>> graph.set_cost_profile('travel_time_130')
+        >>> landmarks = Landmarks(graph)
+        >>> graph.set_cost_profile('distance')
+        >>> landmarks.select_landmarks(2)
+        [2, 1]
+        >>> landmarks.compute_tables(1)
+        >>> landmarks._forward_tables[0]
+        array('i', [-1, 11, 0, 6, -1])
+        """
+
+        missing = [idx for idx in range(len(self._landmark_ids))
+                   if idx >= len(self._forward_tables) or
+                   self._forward_tables[idx] is None]
+        self._forward_tables.extend(
+            [None] * (len(self._landmark_ids) - len(self._forward_tables)))
+        self._backward_tables.extend(
+            [None] * (len(self._landmark_ids) - len(self._backward_tables)))
+
+        file_name = self._graph.get_source_file_name()
+        # Worker processes read the costs of the *.graph file.
+        if (num_processes == 1 or len(missing) < 2 or file_name is None or
+                self._cost_version != 0):
+            for idx in missing:
+                self._compute_table(idx)
+            return None
+
+        with concurrent.futures.ProcessPoolExecutor(
+                num_processes, initializer=_init_worker,
+                initargs=(file_name, self._graph.is_directed(),
+                          self._graph.get_node_order(),
+                          self._cost_profile)) as executor:
+            results = executor.map(
+                _compute_tables, [self._landmark_ids[idx] for idx in missing],
+                itertools.repeat(self._cost_profile))
+            for idx, (forward, backward) in zip(missing, results):
+                self._forward_tables[idx] = forward
+                self._backward_tables[idx] = backward
+
+        return None
+
+    def update_tables(self, num_processes=None):
+        """
+        Recompute the distance tables of the selected landmarks for the
+        current arc costs of the graph, e.g. after is_valid() turned False.
+        The landmarks are not selected again.
+
+        :param num_processes: see compute_tables().
+        :return: None
+        """
+
+        self._cost_version = self._graph.get_cost_version(self._cost_profile)
+        self._forward_tables = []
+        self._backward_tables = []
+        self._mapped_file = None
+        self.compute_tables(num_processes)
+
+        return None
+
+    def is_valid(self):
+        """
+        :return: False if arc cost updates of the graph may have made the
+            lower bounds too large: the tables are of other costs, and
+            unless they are of the costs of the *.graph file, which are
+            still lower bounds if no arc became cheaper.
+        """
+        graph = self._graph
+        return (graph.get_cost_version(self._cost_profile) ==
+                self._cost_version or
+                (self._cost_version == 0 and
+                 not graph.has_lowered_costs(self._cost_profile)))
+
+    def _compute_table(self, idx):
+        """ Compute the distance tables of the idx-th landmark here. """
+        (self._forward_tables[idx], self._backward_tables[idx]) = \
+            compute_landmark_tables(self._graph, self._landmark_ids[idx],
+                                    self._cost_profile)
+
+    def lower_bound(self, node_id, target_node_id):
+        """
+        Lower bound of the distance from a node to a target node:
+        d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L).
+
+        :return: lower bound, -1 if the target is unreachable from the node.
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> landmarks = Landmarks(graph)
+        >>> landmarks.select_landmarks(2)
+        [2, 1]
+        >>> landmarks.compute_tables(1)
+        >>> landmarks.lower_bound(0, 2), landmarks.lower_bound(0, 3)
+        (50, 0)
+        """
+        return self.get_lower_bound_function(target_node_id)(node_id)
+
+    def get_lower_bound_function(self, target_node_id):
+        """
+        :return: function of a node id that returns the lower bound of the
+            distance to the target node, see lower_bound(). It can be
+            passed to CSRGraph.shortest_path().
+        """
+
+        entries = [(forward, backward, forward[target_node_id],
+                    backward[target_node_id])
+                   for forward, backward in zip(self._forward_tables,
+                                                self._backward_tables)]
+
+        def lower_bound(node_id):
+            bound = 0
+            for forward, backward, forward_target, backward_target in entries:
+                backward_node = backward[node_id]
+                if backward_target >= 0:
+                    if backward_node < 0:
+                        # The node cannot reach the landmark, so it cannot
+                        # reach the target either.
+                        return -1
+                    if backward_node - backward_target > bound:
+                        bound = backward_node - backward_target
+                forward_node = forward[node_id]
+                if (forward_node >= 0 and forward_target >= 0 and
+                        forward_target - forward_node > bound):
+                    bound = forward_target - forward_node
+            return bound
+
+        return lower_bound
+
+    def shortest_path(self, source_node_id, target_node_id,
+                      queue_engine='heap', workspace=None):
+        """
+        Compute the shortest path between two nodes by A* search with the
+        landmark lower bounds, on the cost profile of the distance tables
+        (whatever the current cost profile of the graph is). While the
+        tables are not valid (see is_valid()) the A* search uses the
+        great-circle lower bound instead.
+
+        :param workspace: route_planner.SearchWorkspace for the search
+            state, by default the workspace of the graph.
+        :return: route_planner.ShortestPath, see
+            CSRGraph.shortest_path().
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> landmarks = Landmarks(graph)
+        >>> landmarks.select_landmarks(2)
+        [2, 1]
+        >>> landmarks.compute_tables(1)
+        >>> landmarks.shortest_path(0, 3)
+        ShortestPath(path=[0, 1, 2, 3], distance=100, num_settled=4, arcs=[0, 2, 3])
+        >>> landmarks.shortest_path(3, 0).distance
+        -1
+        >>> graph.update_arc_costs([graph.find_arc(1, 2)], [200])
+        >>> landmarks.is_valid(), landmarks.shortest_path(0, 3).distance
+        (True, 120)
+        >>> graph.update_arc_costs([graph.find_arc(0, 2)], [60])
+        >>> landmarks.is_valid(), landmarks.shortest_path(0, 3).distance
+        (False, 110)
+        >>> landmarks.update_tables(1)
+        >>> landmarks.is_valid(), landmarks.lower_bound(0, 2)
+        (True, 60)
+        """
+        lower_bound = None
+        if self.is_valid():
+            lower_bound = self.get_lower_bound_function(target_node_id)
+        return self._graph.shortest_path(
+            source_node_id, target_node_id, queue_engine=queue_engine,
+            astar=True, lower_bound=lower_bound, workspace=workspace,
+            cost_profile=self._cost_profile)
+
+    def get_landmark_ids(self):
+        """
+        :return: list of landmark node ids.
+        """
+        return self._landmark_ids
+
+    def write_landmark_file(self, file_name):
+        """
+        Write landmarks and distance tables into a binary file.
+
+        File layout: header (see LANDMARK_FILE_HEADER), landmark ids, the
+        forward tables and the backward tables. The tables are stored with
+        4-byte integers if the distances allow it, else with 8-byte ones.
+
+        :param file_name: path of the landmark file.
+        :return: None
+        """
+
+        source_file_name = self._graph.get_source_file_name()
+        if source_file_name is None:
+            raise Exception('Graph was not read from a *.graph file')
+        source_stat = os.stat(source_file_name)
+        tables = self._forward_tables + self._backward_tables
+        type_code = 'i'
+        if any(max(table, default=0) >= 2 ** 31 for table in tables):
+            type_code = 'q'
+
+        header = struct.pack(LANDMARK_FILE_HEADER, LANDMARK_FILE_MAGIC,
+                             LANDMARK_FILE_VERSION, sys.byteorder == 'little',
+                             source_stat.st_size, source_stat.st_mtime_ns,
+                             self._graph.get_num_nodes(),
+                             len(self._landmark_ids), type_code.encode(),
+                             self._cost_profile.encode())
+        tmp_file_name = '{0}.{1}.tmp'.format(file_name, os.getpid())
+        with open(tmp_file_name, 'wb') as landmark_file:
+            route_planner.write_aligned(
+                landmark_file,
+                [(header, 'B'), (self._landmark_ids, 'q')]
+                + [(table, type_code) for table in tables])
+        os.replace(tmp_file_name, file_name)
+
+        return None
+
+    def read_landmark_file(self, file_name):
+        """
+        Memory-map a landmark file written by write_landmark_file(). The
+        distance tables are read-only views of the mapped file.
+
+        :param file_name: path of the landmark file.
+        :return: None
+        """
+
+        with open(file_name, 'rb') as landmark_file:
+            mapped_file = mmap.mmap(landmark_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        header = read_landmark_file_header(mapped_file)
+        if header is None:
+            raise Exception('Landmark file has an invalid header')
+        (num_nodes, num_landmarks, type_code, cost_profile) = header[2:6]
+        if num_nodes != self._graph.get_num_nodes():
+            raise Exception('Landmark file belongs to another graph')
+
+        views = route_planner.map_aligned(
+            mapped_file, struct.calcsize(LANDMARK_FILE_HEADER),
+            [(num_landmarks, 'q')]
+            + [(num_nodes, type_code)] * (2 * num_landmarks))[0]
+        self._landmark_ids = list(views[0])
+        tables = views[1:]
+
+        self._mapped_file = mapped_file
+        self._cost_profile = cost_profile
+        # The file holds tables of the costs of the *.graph file.
+        self._cost_version = 0
+        self._forward_tables = tables[:num_landmarks]
+        self._backward_tables = tables[num_landmarks:]
+
+        return None
+
+
+def compute_landmark_tables(graph, landmark_id, cost_profile=None):
+    """
+    Compute the distances from and to a landmark.
+
+    :param cost_profile: see route_planner.CSRGraph.set_cost_profile(),
+        None for the current arc costs.
+    :return: (forward, backward) tuple of compact integer arrays.
+    """
+    graph.compute_shortest_paths(landmark_id, cost_profile=cost_profile)
+    forward = graph.get_node_distances()
+    graph.compute_shortest_paths(landmark_id, backward=True,
+                                 cost_profile=cost_profile)
+    backward = graph.get_node_distances()
+
+    return (compact_array(forward), compact_array(backward))
+
+def compact_array(values):
+    """
+    :return: array with 4-byte integers if all values fit, else with
+        8-byte integers.
+
+    >>> compact_array(array('q', [1, -1]))
+    array('i', [1, -1])
+    >>> compact_array(array('q', [2 ** 40]))
+    array('q', [1099511627776])
+    """
+    try:
+        return array('i', values)
+    except OverflowError:
+        return array('q', values)
+
+def _find_max_node(values, excluded_node_ids):
+    """
+    :return: id of the node with the largest value (values < 0 and the
+        excluded nodes are skipped), -1 if there is none.
+    """
+    excluded_node_ids = set(excluded_node_ids)
+    max_value = (-1, -1)
+    for node_id, value in enumerate(values):
+        if value > max_value[0] and node_id not in excluded_node_ids:
+            max_value = (value, node_id)
+
+    return max_value[1]
+
+def _init_worker(file_name, directed, node_order, cost_profile):
+    """ Load the graph in a worker process of compute_tables(). """
+    global _worker_graph
+    _worker_graph = route_planner.CSRGraph.load(file_name, directed,
+                                                node_order)
+    _worker_graph.set_cost_profile(cost_profile)
+
+def _compute_tables(landmark_id, cost_profile):
+    """ Task of a worker process of compute_tables(). """
+    return compute_landmark_tables(_worker_graph, landmark_id, cost_profile)
+
+def get_landmark_file_name(file_name, cost_profile, directed=True,
+                           node_order=None):
+    """
+    Returns the path of the landmark file of a *.graph file.
+
+    >>> get_landmark_file_name('test.graph', 'travel_time_130')
+    'test.graph.travel_time_130.landmarks'
+    >>> get_landmark_file_name('test.graph', 'distance', False, 'hilbert')
+    'test.graph.undirected.hilbert.distance.landmarks'
+    """
+    if not directed:
+        file_name += '.undirected'
+    if node_order is not None:
+        file_name += '.' + node_order
+    return '{0}.{1}.landmarks'.format(file_name, cost_profile)
+
+def read_landmark_file_header(landmark_file):
+    """
+    Read the header of a landmark file.
+
+    :param landmark_file: buffer with the file content (e.g. mmap object).
+    :return: tuple (source size, source mtime, number of nodes, number of
+        landmarks, type code, cost profile), None if the header does not
+        match this version and byte order.
+    """
+    header_size = struct.calcsize(LANDMARK_FILE_HEADER)
+    if len(landmark_file) < header_size:
+        return None
+    header = struct.unpack_from(LANDMARK_FILE_HEADER, landmark_file)
+    if (header[0] != LANDMARK_FILE_MAGIC or
+            header[1] != LANDMARK_FILE_VERSION or
+            header[2] != (sys.byteorder == 'little')):
+        return None
+
+    return header[3:7] + (header[7].decode(),
+                          header[8].rstrip(b'\0').decode())
+
+def load_landmarks(graph, num_landmarks=16, method='farthest',
+                   num_processes=None):
+    """
+    Load the landmarks of a graph and its current cost profile from the
+    landmark file, or select and compute them and write the landmark file.
+    The file is recomputed if the *.graph file has changed (size or mtime)
+    or if it holds another number of landmarks. Landmarks computed after
+    arc cost updates are not written, the file keeps the tables of the
+    costs of the *.graph file.
+
+    :param graph: CSRGraph read from a *.graph file.
+    :param num_landmarks: number of landmarks.
+    :param method: landmark selection method, see select_landmarks().
+    :param num_processes: see compute_tables().
+    :return: Landmarks object.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> load_landmarks(graph, 2, num_processes=1).get_landmark_ids()
+    [2, 1]
+    >>> load_landmarks(graph, 2)._forward_tables[0]  # doctest: +ELLIPSIS
+    <memory at 0x...>
+    >>> os.remove('graph_13/test.graph.distance.landmarks')
+    """
+
+    file_name = get_landmark_file_name(graph.get_source_file_name(),
+                                       graph.get_cost_profile(),
+                                       graph.is_directed(),
+                                       graph.get_node_order())
+    landmarks = Landmarks(graph)
+    source_stat = os.stat(graph.get_source_file_name())
+    try:
+        with open(file_name, 'rb') as landmark_file:
+            header = read_landmark_file_header(landmark_file.read(
+                struct.calcsize(LANDMARK_FILE_HEADER)))
+    except OSError:
+        header = None
+    if (header is not None and header[0] == source_stat.st_size and
+            header[1] == source_stat.st_mtime_ns and
+            header[3] == num_landmarks):
+        landmarks.read_landmark_file(file_name)
+        return landmarks
+
+    landmarks.select_landmarks(num_landmarks, method)
+    landmarks.compute_tables(num_processes)
+    if graph.get_cost_version() == 0:
+        landmarks.write_landmark_file(file_name)
+
+    return landmarks
+
+
+def main():
+    """
+    Main function: compute the landmarks of a *.graph file.
+    Usage: landmarks.py [*.graph file] [number of landmarks] [cost profile]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    num_landmarks = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    cost_profile = sys.argv[3] if len(sys.argv) > 3 else 'distance'
+
+    graph = route_planner.CSRGraph.load(file_name)
+    graph.set_cost_profile(cost_profile)
+    landmarks = load_landmarks(graph, num_landmarks)
+    print('Landmarks: {0}'.format(landmarks.get_landmark_ids()))
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
@@ -6,9 +6,46 @@ Exercise #13: Implementation of Dijkstra's algorithm.
 
 import re
 import queue
+import heapq
+import itertools
+import collections
+import operator
+import math
 import sys
 import os
-import timeit
+import time
+import mmap
+import struct
+import random
+import bisect
+import json
+from array import array
+
+# Binary graph file format, see CSRGraph.write_binary_file().
+GRAPH_FILE_MAGIC = b'CSRGRAPH'
+GRAPH_FILE_VERSION = 4
+# magic, version, little endian, directed, source size, source mtime [ns],
+# number of nodes, number of arcs (header line), number of stored arcs,
+# number of original node ids (0 if the nodes are not renumbered).
+GRAPH_FILE_HEADER = '<8sI??qqqqqq'
+# Number of characters parsed at once by CSRGraph.read_graph_from_file_bulk().
+GRAPH_FILE_CHUNK_SIZE = 1 << 24
+# Mean radius of the earth [m].
+EARTH_RADIUS = 6371000.0
+# Number of cost arrays cached by CSRGraph.get_costs().
+COST_PROFILE_CACHE_SIZE = 4
+# Memory budget [bytes] of the trees of a ShortestPathTreeCache.
+SHORTEST_PATH_TREE_CACHE_BYTES = 1 << 30
+# Node orders of CSRGraph.compute_node_order().
+NODE_ORDERS = ('hilbert', 'bfs')
+# Number of bits per coordinate of the Hilbert curve.
+HILBERT_ORDER = 16
+# Comment line (incl. line break) of a *.graph file.
+COMMENT_LINE_PATTERN = re.compile(r'^[ \t\r\f\v]*#.*\n', re.MULTILINE)
+
+# Sink of the instrumentation records, None if instrumentation is
+# disabled, see set_stats_sink().
+_stats_sink = None
 
 
 class Graph:
@@ -19,6 +56,15 @@ class Graph:
         self._nodes = []
         # Edge objects are stored for each node in a list.
         self._adjacency_lists = []
+        # Arcs of undirected graphs are stored once, see
+        # _get_incident_arc_lists().
+        self._directed = True
+        # Arcs with head v for each node v: the same Arc objects as in
+        # the adjacency lists, built on demand by
+        # _build_reverse_adjacency_lists().
+        self._reverse_adjacency_lists = None
+        # Search state of queries without an own workspace.
+        self._workspace = None
 
     def read_graph_from_file(self, file_name, directed=True):
         """
@@ -34,6 +80,10 @@ class Graph:
         Comment lines (^#) are ignored.
 
         :param file_name:
+        :param directed: if False every arc can be traversed in both
+            directions. Each arc is still stored once, the searches use
+            it in the opposite direction through the reverse adjacency
+            lists.
         :return: None
 
         # Test
@@ -41,6 +91,10 @@ class Graph:
         >>> graph.read_graph_from_file('graph_13/test.graph')
         >>> graph
         [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
+        >>> undirected_graph = Graph()
+        >>> undirected_graph.read_graph_from_file('graph_13/test.graph', False)
+        >>> undirected_graph.compute_reachable_nodes(4)[0]
+        5
         """
 
         column_lines = 0
@@ -77,20 +131,58 @@ class Graph:
                     arc = Arc(tail_node_id, int(columns[1]), int(columns[2]),
                               int(columns[3]))
 
-                    # Create undirected graph.
-                    if not directed:
-                        self._adjacency_lists[arc.head_node_id].append(Arc(arc.head_node_id,
-                                                                            arc.tail_node_id,
-                                                                            arc.distance,
-                                                                            arc.max_speed))
                     # Append arc to tail node's adjacency list.
                     self._adjacency_lists[tail_node_id].append(arc)
         # graph_file.close()
         if not graph_file.closed:
             raise Exception('File *.graph was not closed')
+        self._directed = directed
+
+        return None
+
+    def is_directed(self):
+        """
+        :return: False if the arcs can be traversed in both directions.
+        """
+        return self._directed
+
+    def _build_reverse_adjacency_lists(self):
+        """
+        Build the lists of incoming arcs of all nodes (once). The lists
+        hold the Arc objects of the adjacency lists, no arc is copied.
+
+        :return: None
+        """
+
+        if self._reverse_adjacency_lists is not None:
+            return None
+        reverse_adjacency_lists = [[] for _ in range(self._num_nodes)]
+        for arcs in self._adjacency_lists:
+            for arc in arcs:
+                reverse_adjacency_lists[arc.head_node_id].append(arc)
+        self._reverse_adjacency_lists = reverse_adjacency_lists
 
         return None
 
+    def _get_incident_arc_lists(self, backward=False):
+        """
+        Arc lists a search traverses: the adjacency lists (forward) and/or
+        the reverse adjacency lists (backward and undirected).
+
+        :param backward: traverse the arcs from head to tail.
+        :return: list of (lists of arcs per node, reverse) tuples; for
+            reverse lists the tail of an arc is the neighbour.
+        """
+
+        arc_lists = []
+        if not backward or not self._directed:
+            arc_lists.append((self._adjacency_lists, False))
+        if backward or not self._directed:
+            self._build_reverse_adjacency_lists()
+            arc_lists.append((self._reverse_adjacency_lists, True))
+
+        return arc_lists
+
     def get_num_nodes(self):
         """
         :return: number of nodes in graph.
@@ -121,6 +213,7 @@ class Graph:
         1
         """
 
+        arc_lists = self._get_incident_arc_lists()
         # List of nodes to visit currently.
         current_level = [node_id]
         # Create a list of marked nodes. Reachable nodes are marked with 1.
@@ -136,13 +229,16 @@ class Graph:
             # Go through all nodes of current_level.
             for curr_node_id in current_level:
                 # Go through arcs of current node:
-                for arc in self._adjacency_lists[curr_node_id]:
-                    # If had_id has not been marked yet.
-                    if not marked_nodes[arc.head_node_id]:
-                        marked_nodes[arc.head_node_id] = 1
-                        num_marked_nodes += 1
-                        # Add head_id to the new current level nodes.
-                        next_level.append(arc.head_node_id)
+                for adjacency_lists, reverse in arc_lists:
+                    for arc in adjacency_lists[curr_node_id]:
+                        neighbour_id = (arc.tail_node_id if reverse
+                                        else arc.head_node_id)
+                        # If the neighbour has not been marked yet.
+                        if not marked_nodes[neighbour_id]:
+                            marked_nodes[neighbour_id] = 1
+                            num_marked_nodes += 1
+                            # Add it to the new current level nodes.
+                            next_level.append(neighbour_id)
             current_level = next_level
         # return num_marked_nodes
         # TODO
@@ -170,10 +266,8 @@ class Graph:
             for arc in self._adjacency_lists[i]:
                 # Compute max. possible speed for this arc.
                 max_speed = min(arc.max_speed, int(max_vehicle_speed))
-                # Compute travel time in whole seconds.
-                travel_time_sec = '{0:.0f}'.format(arc.distance / (max_speed / 3.6))
                 # Set costs to travel time in whole seconds.
-                arc.costs = int(travel_time_sec)
+                arc.costs = round(arc.distance / (max_speed / 3.6))
 
         return None
 
@@ -201,11 +295,12 @@ class Graph:
         return None
 
     def compute_lcc(self):
-        """ TODO
-        Mark all nodes in the largest connected component.
+        """
+        Mark all nodes in the largest connected component, i.e. the
+        largest component of compute_connected_components().
 
-        :param marked_nodes:
-        :return: longest connected component.
+        :return: (number of nodes, ascending list of the node ids) tuple of
+            the largest connected component.
 
         # Doctest(s):
         >>> graph = Graph()
@@ -213,46 +308,73 @@ class Graph:
         >>> graph
         [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
         >>> graph.compute_lcc()
-        (4, [4, 1, 2, 3])
+        (5, [0, 1, 2, 3, 4])
         >>> graph2 = Graph()
         >>> graph2.read_graph_from_file('graph_13/test2.graph')
         >>> graph2.compute_lcc()
-        (6, [5, 1, 2, 3, 4])
+        (7, [0, 1, 2, 3, 4, 5, 6])
         """
-        # Shallow copy of all nodes.
-        unvisited_nodes = self._nodes[:]
-        lcc = (0, None)
 
-        # Visit all nodes which are in no connected component.
-        # while len(unvisited_nodes) > 0:
-        while unvisited_nodes:
-            # Remove one node in each iteration.
-            node = unvisited_nodes.pop()
-            # node = unvisited_nodes[0]
+        node_ids = get_largest_component(*self.compute_connected_components())
+
+        return (len(node_ids), node_ids)
+
+    def compute_connected_components(self):
+        """
+        Label the (weakly) connected components, i.e. the components of
+        the graph with all arcs taken as undirected. Each node is visited
+        once by a BFS along its arcs and reverse arcs.
 
-            (num_marked_nodes, marked_nodes) = self.compute_reachable_nodes(node_id=node._id)
+        :return: (number of components, array with the component label of
+            each node) tuple.
 
-            # Create a list with all visited nodes in this lcc.
-            marked_indices = [node._id]
-            # marked_indices = []
-            for marked_node, marked in enumerate(marked_nodes):
-                if marked == 1 and self._nodes[marked_node] in unvisited_nodes:
-                    marked_indices.append(marked_node)
-                    # Remove from unvisited list.
-                    unvisited_nodes.remove(self._nodes[marked_node])
+        >>> graph = Graph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compute_connected_components()
+        (1, array('i', [0, 0, 0, 0, 0]))
+        """
 
-            # Have we already found a larger component?
-            if num_marked_nodes > lcc[0]:
-                lcc = (num_marked_nodes, marked_indices)
+        self._build_reverse_adjacency_lists()
+        arc_lists = ((self._adjacency_lists, False),
+                     (self._reverse_adjacency_lists, True))
+        labels = array('i', [-1]) * self._num_nodes
+        num_components = 0
+        for root_node_id in range(self._num_nodes):
+            if labels[root_node_id] >= 0:
+                continue
+            labels[root_node_id] = num_components
+            current_level = [root_node_id]
+            while current_level:
+                next_level = []
+                for node_id in current_level:
+                    for adjacency_lists, reverse in arc_lists:
+                        for arc in adjacency_lists[node_id]:
+                            neighbour_id = (arc.tail_node_id if reverse
+                                            else arc.head_node_id)
+                            if labels[neighbour_id] < 0:
+                                labels[neighbour_id] = num_components
+                                next_level.append(neighbour_id)
+                current_level = next_level
+            num_components += 1
 
-        return lcc
+        return (num_components, labels)
 
 
-    def compute_shortest_paths(self, start_node_id):
+    def compute_shortest_paths(self, start_node_id, queue_engine='heap',
+                               workspace=None, backward=False):
         """ TODO
         Compute the shortest paths for a given start node.
         To solve this problem the Dijkstra's algorithm is used.
         :param start_node_id: identifier of start node
+        :param queue_engine: name of a priority queue engine (see
+            QUEUE_ENGINES) or an empty priority queue object.
+        :param workspace: SearchWorkspace that receives the search state,
+            by default the workspace of the graph. Arc indices of the
+            workspace are positions in the adjacency list of the
+            predecessor, followed by the positions in its reverse
+            adjacency list.
+        :param backward: compute the shortest paths from all nodes to the
+            start node instead (on the reverse adjacency lists).
         :return: None
 
         # Doctest(s):
@@ -262,41 +384,137 @@ class Graph:
         [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
         >>> start_id = 1
         >>> graph.compute_shortest_paths(start_id)
-        >>> ['{0}->{1}({2})'.format(start_id, node._id, node._distance) for node in graph._nodes]
+        >>> ['{0}->{1}({2})'.format(start_id, node._id, graph.get_node_distance(node._id)) for node in graph._nodes]
+        ['1->0(-1)', '1->1(0)', '1->2(20)', '1->3(70)', '1->4(-1)']
+        >>> reset_graph(graph)
+        >>> graph.compute_shortest_paths(start_id, 'priority_queue')
+        >>> ['{0}->{1}({2})'.format(start_id, node._id, graph.get_node_distance(node._id)) for node in graph._nodes]
         ['1->0(-1)', '1->1(0)', '1->2(20)', '1->3(70)', '1->4(-1)']
+        >>> workspace = graph.create_workspace()
+        >>> graph.compute_shortest_paths(0, workspace=workspace)
+        >>> workspace.get_distance(3), graph.get_node_distance(3)
+        (100, 70)
+        >>> graph.get_traceback_arc(3, workspace)
+        2->3(50)
+        >>> graph.compute_shortest_paths(3, backward=True)
+        >>> [graph.get_node_distance(node_id) for node_id in range(5)]
+        [100, 70, 50, 0, 20]
+        >>> graph.get_traceback_arc(0)
+        0->1(30)
         """
+        arc_lists = self._get_incident_arc_lists(backward)
+        adjacency_lists = self._adjacency_lists
+        workspace = self._get_workspace(workspace)
+        workspace.reset()
+        version = workspace.version
+        stamps = workspace.stamps
+        settled = workspace.settled_stamps
+        node_distances = workspace.distances
+        traceback_arcs = workspace.traceback_arcs
+        traceback_nodes = workspace.traceback_nodes
+
         # Distance from start node to itself is 0.
-        self._nodes[start_node_id]._distance = 0
+        stamps[start_node_id] = version
+        node_distances[start_node_id] = 0
+        traceback_arcs[start_node_id] = -1
+        traceback_nodes[start_node_id] = -1
 
         # Priority queue for shortest path storage.
-        active_nodes = queue.PriorityQueue()
+        active_nodes = make_priority_queue(queue_engine, self)
         # Put start node into priority queue as first element.
-        active_nodes.put(self._nodes[start_node_id])
+        active_nodes.push(0, start_node_id)
 
-        while not active_nodes.empty():
-        # while active_nodes.qsize():
-            node = active_nodes.get()
-            if node._settled:
+        while len(active_nodes):
+            distance, node_id = active_nodes.pop()
+            if settled[node_id] == version:
                 # Node has already been settled.
                 continue
             # Settle active node.
-            node._settled = True
+            settled[node_id] = version
 
             # Update all connected nodes.
-            for arc in self._adjacency_lists[node._id]:
-                new_node = self._nodes[arc.head_node_id]
-                new_distance = node._distance + arc.costs
-
-                # Update tentative distance if a new distance is smaller.
-                if not new_node._settled and (
-                        new_node._distance < 0 or
-                        new_distance < new_node._distance):
-                    new_node._distance = new_distance
-                    new_node._traceback_arc = arc
-                    active_nodes.put(new_node)
+            for arc_lists_of_nodes, reverse in arc_lists:
+                # Positions in the reverse adjacency list follow the
+                # positions in the adjacency list.
+                first_pos = (len(adjacency_lists[node_id]) if reverse
+                             else 0)
+                for pos, arc in enumerate(arc_lists_of_nodes[node_id],
+                                          first_pos):
+                    head_node_id = (arc.tail_node_id if reverse
+                                    else arc.head_node_id)
+                    if settled[head_node_id] == version:
+                        continue
+                    new_distance = distance + arc.costs
+
+                    # Update tentative distance if a new distance is
+                    # smaller. Ties are broken by the smaller predecessor
+                    # id, so all queue engines compute the same shortest
+                    # path tree.
+                    if stamps[head_node_id] != version:
+                        stamps[head_node_id] = version
+                    elif not (new_distance < node_distances[head_node_id] or
+                              (new_distance == node_distances[head_node_id]
+                               and node_id < traceback_nodes[head_node_id])):
+                        continue
+                    node_distances[head_node_id] = new_distance
+                    traceback_arcs[head_node_id] = pos
+                    traceback_nodes[head_node_id] = node_id
+                    active_nodes.push(new_distance, head_node_id)
 
         return None
 
+    def create_workspace(self):
+        """
+        :return: new SearchWorkspace for queries on this graph.
+        """
+        return SearchWorkspace(self._num_nodes)
+
+    def _get_workspace(self, workspace=None):
+        """
+        :return: the given workspace, or the workspace of the graph if it
+            is None.
+        """
+        if workspace is not None:
+            return workspace
+        if (self._workspace is None or
+                self._workspace.get_num_nodes() != self._num_nodes):
+            self._workspace = self.create_workspace()
+        return self._workspace
+
+    def get_max_arc_cost(self):
+        """
+        :return: largest arc cost, needed by bucket based priority queues.
+        """
+        return max((arc.costs for arcs in self._adjacency_lists
+                    for arc in arcs), default=0)
+
+    def get_node_distance(self, node_id, workspace=None):
+        """
+        :return: distance of a node computed by the last search, -1 if
+            the node was not reached.
+        """
+        return self._get_workspace(workspace).get_distance(node_id)
+
+    def get_traceback_arc(self, node_id, workspace=None):
+        """
+        :return: arc on which a node was reached by the last search, None
+            for the start node and for unreached nodes. Arcs traversed
+            from head to tail (backward searches, undirected graphs) are
+            returned as stored.
+        """
+        pos, tail_node_id = self._get_workspace(workspace).get_traceback(
+            node_id)
+        if pos < 0:
+            return None
+        arcs = self._adjacency_lists[tail_node_id]
+        if pos < len(arcs):
+            return arcs[pos]
+        return self._reverse_adjacency_lists[tail_node_id][pos - len(arcs)]
+
+    def reset_search_state(self):
+        """ Reset the search state of the graph's workspace. """
+        self._get_workspace().reset()
+
     def __repr__(self):
         """
         Define object's string representation.
@@ -321,22 +539,16 @@ class Graph:
 
 class Node:
 
-    def __init__(self, node_id, latitude, longitude, traceback_arc=None):
+    def __init__(self, node_id, latitude, longitude):
         self._id = node_id
         self._latitude = latitude
         self._longitude = longitude
-        # Especially needed for Dijkstra's algorithm.
-        self._traceback_arc = traceback_arc
-        self._settled = False
-        self._distance = -1
+        # The search state of Dijkstra's algorithm is kept in a
+        # SearchWorkspace, so queries never modify Node objects.
 
     def __repr__(self):
         return '{0}'.format(self._id)
 
-    def __lt__(self, other):
-        """ Defines the operator '<' (less than) for priority queue. """
-        return self._distance < other._distance
-
 
 class Arc:
 
@@ -352,50 +564,3601 @@ class Arc:
         return '{0}->{1}({2})'.format(self.tail_node_id, self.head_node_id,
                                       self.costs)
 
-def travel_to(graph, end_node, max_speed):
-    """ Compute distance and travel time of the selected path. """
-    node = graph._nodes[end_node]
-    # Time in hours [h].
-    time = 0
-    # Distance in kilometers [km]
-    distance = 0
 
-    while True:
-        arc = node._traceback_arc
-        if not arc:
-            break
+class CSRGraph:
+    """
+    Graph stored in compressed sparse row (CSR) format.
 
-        distance += arc.distance / 1000.0
+    Instead of one Node object per node and one Arc object per arc, all
+    data is held in typed arrays. The arcs of node i are stored at the
+    positions _offsets[i] to _offsets[i + 1] - 1 of the arc arrays.
+    The search state of a query is held in a SearchWorkspace, so many
+    workspaces can share one graph, which the searches only read.
+    """
 
-        # v = s / t => t = s / v
-        time += arc.distance / 1000.0 / min(arc.max_speed, max_speed)
+    def __init__(self):
+        self._num_nodes = 0
+        self._num_arcs = 0
+        # Node information.
+        self._latitudes = array('d')
+        self._longitudes = array('d')
+        # Arc information in CSR format.
+        self._offsets = array('q', [0])
+        self._heads = array('i')
+        self._distances = array('i')
+        self._max_speeds = array('i')
+        self._costs = array('q')
+        # Search state of queries without an own workspace.
+        self._workspace = None
+        # Statistics of the last read in *.graph file.
+        self._load_stats = None
+        # *.graph file the graph was read from and its direction mode.
+        self._source_file_name = None
+        self._directed = True
+        # Name of the current arc costs, see set_cost_profile().
+        self._cost_profile = 'distance'
+        # Cost arrays of the recently used cost profiles (LRU order), see
+        # get_costs(), and the results of get_max_arc_cost() and
+        # get_heuristic_factor() per cost profile.
+        self._cost_profiles = collections.OrderedDict()
+        self._max_arc_costs = {}
+        self._heuristic_factors = {}
+        # Cost arrays changed by update_arc_costs(), which are never
+        # evicted, the number of update batches per cost profile and the
+        # number of arcs per cost profile that cost less than in the
+        # *.graph file.
+        self._updated_costs = {}
+        self._cost_versions = {}
+        self._num_lowered_costs = {}
+        # Great-circle length of each arc, computed on demand by
+        # get_heuristic_factor().
+        self._arc_lengths = None
+        # Reverse arcs, built on demand by _build_reverse_index().
+        self._reverse_offsets = None
+        self._reverse_arcs = None
+        self._reverse_tails = None
+        # Node id translation of subgraphs and reordered graphs: node id
+        # in the *.graph file of each node, and its inverse, built on
+        # demand by get_node_id().
+        self._original_node_ids = None
+        self._node_ids_by_original = None
+        # Node order of a reordered graph, see reorder_nodes().
+        self._node_order = None
 
-        # Follow to previous node.
-        node = graph._nodes[arc.tail_node_id]
+    def read_graph_from_file(self, file_name, directed=True):
+        """
+        Read in graph from *.graph file.
+        See Graph.read_graph_from_file() for the file format.
 
-    return (distance, time_to_string(time))
+        :param file_name:
+        :param directed: if False every arc can be traversed in both
+            directions. Each arc is still stored once, the searches use
+            it in the opposite direction through the reverse arcs (see
+            _get_adjacency()).
+        :return: None
 
-def time_to_string(time):
-    """ Convert time [h] to string format. """
-    hh = int(time)
-    mm = int((time - hh) * 60)
+        # Test
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph
+        [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
+        >>> undirected_graph = CSRGraph()
+        >>> undirected_graph.read_graph_from_file('graph_13/test.graph', False)
+        >>> undirected_graph.compute_reachable_nodes(4)[0]
+        5
+        """
 
-    return '{0} hour(s) and {1} minute(s)'.format(hh, mm)
+        if self._num_nodes != 0:
+            raise Exception('Graph is already read in')
 
-def reset_graph(graph):
-    """ Resets the graph and it's fields. """
-    for node in graph._nodes:
-        node._traceback_arc = None
-        node._settled = False
-        node._distance = -1
+        start_time = time.perf_counter()
+        num_lines = 0
+        num_nodes = 0
+        latitudes = array('d')
+        longitudes = array('d')
+        tails = array('i')
+        heads = array('i')
+        distances = array('i')
+        max_speeds = array('i')
 
-def get_furthest_node(graph):
-    """ Returns the id fo the furthest node. """
+        column_lines = 0
+        with open(file_name, 'rt') as graph_file:
+            for line in graph_file:
+                num_lines += 1
+                columns = line.strip().split(' ')
+                # Skip comment lines.
+                if columns[0].startswith('#'):
+                    continue
+                column_lines += 1
+                if column_lines == 1:
+                    # Number of nodes.
+                    num_nodes = int(columns[0])
+                elif column_lines == 2:
+                    # Number of arcs.
+                    self._num_arcs = int(columns[0])
+                elif column_lines <= num_nodes + 2:
+                    # All node info lines.
+                    if not len(columns) == 3:
+                        raise Exception('Node info line with != 3 columns')
+                    latitudes.append(float(columns[1]))
+                    longitudes.append(float(columns[2]))
+                else:
+                    # All arc info lines.
+                    if not len(columns) == 4:
+                        raise Exception('Arc info line with != 4 columns')
+                    tails.append(int(columns[0]))
+                    heads.append(int(columns[1]))
+                    distances.append(int(columns[2]))
+                    max_speeds.append(int(columns[3]))
+
+        parse_time = time.perf_counter()
+        self._num_nodes = len(latitudes)
+        self._latitudes = latitudes
+        self._longitudes = longitudes
+        self._build_csr(tails, heads, distances, max_speeds)
+        self._source_file_name = file_name
+        self._directed = directed
+        self._set_load_stats('read_graph_from_file', num_lines, start_time,
+                             parse_time)
+
+        return None
+
+    def read_graph_from_file_bulk(self, file_name, directed=True,
+                                  chunk_size=GRAPH_FILE_CHUNK_SIZE):
+        """
+        Read in graph from *.graph file like read_graph_from_file(), but
+        in large chunks: each chunk is split into lines and tokens by
+        single str methods and whole columns are converted with map().
+        The column checks are done per chunk as well, only a chunk that
+        fails the fast check is split line by line.
+
+        :param file_name:
+        :param directed: see read_graph_from_file().
+        :param chunk_size: number of characters read per chunk.
+        :return: None
+
+        # Test
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file_bulk('graph_13/test.graph', chunk_size=16)
+        >>> graph
+        [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
+        >>> graph.get_load_stats()['lines']
+        14
+        >>> undirected_graph = CSRGraph()
+        >>> undirected_graph.read_graph_from_file_bulk('graph_13/test.graph', False)
+        >>> undirected_graph.compute_reachable_nodes(4)[0]
+        5
+        """
+
+        if self._num_nodes != 0:
+            raise Exception('Graph is already read in')
+
+        start_time = time.perf_counter()
+        num_lines = 0
+        # Number of nodes and arcs from the first two lines.
+        header = []
+        num_node_lines = 0
+        latitudes = array('d')
+        longitudes = array('d')
+        tails = array('i')
+        heads = array('i')
+        distances = array('i')
+        max_speeds = array('i')
+
+        with open(file_name, 'rt') as graph_file:
+            # Incomplete last line of the previous chunk.
+            rest = ''
+            while True:
+                data = graph_file.read(chunk_size)
+                chunk = rest + data
+                if not chunk:
+                    break
+                if data:
+                    end = chunk.rfind('\n') + 1
+                    if end == 0:
+                        rest = chunk
+                        continue
+                    text, rest = chunk[:end], chunk[end:]
+                else:
+                    # Last line without line break.
+                    text, rest = chunk + '\n', ''
+                num_lines += text.count('\n')
+                # Skip comment lines.
+                if '#' in text:
+                    text = COMMENT_LINE_PATTERN.sub('', text)
+                lines = text[:-1].split('\n') if text else []
+
+                pos = 0
+                while len(header) < 2 and pos < len(lines):
+                    # Number of nodes resp. number of arcs.
+                    header.append(int(lines[pos].strip().split(' ')[0]))
+                    pos += 1
+                if not header:
+                    continue
+
+                # All node info lines.
+                node_lines = lines[pos:pos + header[0] - num_node_lines]
+                if node_lines:
+                    tokens = split_columns(node_lines, 3)
+                    if tokens is None:
+                        raise Exception('Node info line with != 3 columns')
+                    latitudes.extend(map(float, tokens[1::3]))
+                    longitudes.extend(map(float, tokens[2::3]))
+                    num_node_lines += len(node_lines)
+                    pos += len(node_lines)
+
+                # All arc info lines.
+                arc_lines = lines[pos:]
+                if arc_lines:
+                    tokens = split_columns(arc_lines, 4)
+                    if tokens is None:
+                        raise Exception('Arc info line with != 4 columns')
+                    tails.extend(map(int, tokens[0::4]))
+                    heads.extend(map(int, tokens[1::4]))
+                    distances.extend(map(int, tokens[2::4]))
+                    max_speeds.extend(map(int, tokens[3::4]))
+
+        parse_time = time.perf_counter()
+        if len(header) > 1:
+            self._num_arcs = header[1]
+        self._num_nodes = len(latitudes)
+        self._latitudes = latitudes
+        self._longitudes = longitudes
+        self._build_csr(tails, heads, distances, max_speeds)
+        self._source_file_name = file_name
+        self._directed = directed
+        self._set_load_stats('read_graph_from_file_bulk', num_lines,
+                             start_time, parse_time)
+
+        return None
+
+    def _set_load_stats(self, operation, num_lines, start_time, parse_time):
+        """
+        Store number of lines and time [s] of the last file read in, and
+        pass them to the stats sink (see set_stats_sink()).
+
+        :param operation: name of the read in method.
+        :param num_lines: number of lines of the file.
+        :param start_time: time.perf_counter() at the start of the read in.
+        :param parse_time: time.perf_counter() after parsing the file,
+            before building the CSR arrays.
+        """
+        end_time = time.perf_counter()
+        seconds = end_time - start_time
+        self._load_stats = {
+            'lines': num_lines,
+            'seconds': seconds,
+            'lines_per_second': num_lines / seconds if seconds > 0 else 0.0,
+        }
+        if _stats_sink is not None:
+            record_stats({'operation': operation,
+                          'file_name': self._source_file_name,
+                          'nodes': self._num_nodes,
+                          'arcs': self._num_arcs,
+                          'lines': num_lines,
+                          'phases': {'parse': parse_time - start_time,
+                                     'build_csr': end_time - parse_time}})
+
+    def get_load_stats(self):
+        """
+        :return: dict with number of lines, time [s] and throughput
+            [lines/s] of the last read in *.graph file, None if the graph
+            was not read from a *.graph file.
+        """
+        return self._load_stats
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Convert a Graph into a CSRGraph.
+
+        :param graph: Graph object.
+        :return: CSRGraph with the same nodes, arcs and arc costs.
+
+        >>> graph = Graph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.set_arc_costs_to_travel_time(100)
+        >>> CSRGraph.from_graph(graph)
+        [0->1(4), 0->2(8), 1->2(2), 2->3(6), 3->1(5), 4->3(2)]
+        >>> undirected_graph = Graph()
+        >>> undirected_graph.read_graph_from_file('graph_13/test.graph', False)
+        >>> CSRGraph.from_graph(undirected_graph).compute_reachable_nodes(4)[0]
+        5
+        """
+
+        csr_graph = cls()
+        csr_graph._num_nodes = graph._num_nodes
+        csr_graph._num_arcs = graph._num_arcs
+        csr_graph._directed = graph.is_directed()
+        csr_graph._latitudes = array('d', (node._latitude
+                                           for node in graph._nodes))
+        csr_graph._longitudes = array('d', (node._longitude
+                                            for node in graph._nodes))
+        for arcs in graph._adjacency_lists:
+            for arc in arcs:
+                csr_graph._heads.append(arc.head_node_id)
+                csr_graph._distances.append(arc.distance)
+                csr_graph._max_speeds.append(arc.max_speed)
+                csr_graph._costs.append(arc.costs)
+            csr_graph._offsets.append(len(csr_graph._heads))
+        csr_graph.reset_search_state()
+
+        return csr_graph
+
+    def _build_csr(self, tails, heads, distances, max_speeds):
+        """
+        Sort arcs by tail node (stable counting sort) into CSR format.
+
+        :param tails: tail node id of each arc.
+        :param heads: head node id of each arc.
+        :param distances: distance [m] of each arc.
+        :param max_speeds: max. speed [km/h] of each arc.
+        :return: None
+        """
+
+        num_nodes = self._num_nodes
+        num_entries = len(tails)
+        if num_entries and not (0 <= min(tails) and max(tails) < num_nodes):
+            raise Exception('Arc with unknown tail node')
+        if all(map(operator.le, tails, itertools.islice(tails, 1, None))):
+            # Arcs are already sorted by tail node, only the offsets have
+            # to be computed.
+            counts = collections.Counter(tails)
+            self._offsets = array('q', itertools.accumulate(
+                map(counts.get, range(num_nodes), itertools.repeat(0)),
+                initial=0))
+            self._heads = array('i', heads)
+            self._distances = array('i', distances)
+            self._max_speeds = array('i', max_speeds)
+            self._costs = array('q', self._distances)
+            self.reset_search_state()
+            return None
+
+        # Count arcs per tail node.
+        offsets = array('q', bytes(8 * (num_nodes + 1)))
+        for tail_node_id in tails:
+            offsets[tail_node_id + 1] += 1
+        # Prefix sums give the first position of each node's arcs.
+        for node_id in range(num_nodes):
+            offsets[node_id + 1] += offsets[node_id]
+
+        positions = array('q', offsets[:-1])
+        self._heads = array('i', bytes(4 * num_entries))
+        self._distances = array('i', bytes(4 * num_entries))
+        self._max_speeds = array('i', bytes(4 * num_entries))
+        for idx in range(num_entries):
+            tail_node_id = tails[idx]
+            pos = positions[tail_node_id]
+            positions[tail_node_id] = pos + 1
+            self._heads[pos] = heads[idx]
+            self._distances[pos] = distances[idx]
+            self._max_speeds[pos] = max_speeds[idx]
+
+        self._offsets = offsets
+        # Set default costs to distance.
+        self._costs = array('q', self._distances)
+        self.reset_search_state()
+
+        return None
+
+    @classmethod
+    def load(cls, file_name, directed=True, node_order=None):
+        """
+        Load a *.graph file through its binary cache file.
+
+        The cache file is (re)compiled if it does not exist or if the size
+        or the modification time of the *.graph file have changed.
+
+        :param file_name: path of the *.graph file.
+        :param directed: see read_graph_from_file().
+        :param node_order: renumber the nodes for cache locality (see
+            reorder_nodes()), None to keep the node ids of the file. Node
+            ids of the file are translated by get_node_id().
+        :return: CSRGraph backed by the memory-mapped cache file.
+
+        >>> graph = CSRGraph.load('graph_13/test.graph', node_order='bfs')
+        >>> graph.get_node_id(4), graph.get_original_node_id(0)
+        (4, 0)
+        >>> os.remove(get_binary_file_name('graph_13/test.graph', True, 'bfs'))
+        """
+
+        start_time = time.perf_counter()
+        binary_file_name = get_binary_file_name(file_name, directed,
+                                                node_order)
+        compiled = not is_binary_file_valid(binary_file_name, file_name)
+        if compiled:
+            compile_graph_file(file_name, binary_file_name, directed,
+                               node_order)
+        compile_time = time.perf_counter()
+        graph = cls()
+        graph.read_binary_file(binary_file_name)
+        graph._source_file_name = file_name
+        graph._directed = directed
+        graph._node_order = node_order
+        if _stats_sink is not None:
+            record_stats({'operation': 'load',
+                          'file_name': file_name,
+                          'nodes': graph._num_nodes,
+                          'arcs': graph._num_arcs,
+                          'compiled': compiled,
+                          'phases': {'compile': compile_time - start_time,
+                                     'map': (time.perf_counter() -
+                                             compile_time)}})
+
+        return graph
+
+    def write_binary_file(self, file_name, source_stat=None, directed=True,
+                          first_node_id=0, last_node_id=None):
+        """
+        Write the graph into a binary file that can be memory-mapped by
+        read_binary_file().
+
+        File layout: a fixed-size header (see GRAPH_FILE_HEADER) followed
+        by the arrays latitudes, longitudes, offsets, heads, distances,
+        max_speeds and (for renumbered nodes) original node ids, see
+        write_aligned().
+
+        :param file_name: path of the binary file.
+        :param source_stat: os.stat() result of the *.graph file the
+            binary file is built from. Its size and mtime are stored to
+            detect stale binary files.
+        :param directed: stored in the header, see get_binary_file_name().
+        :param first_node_id: write only the nodes first_node_id ..
+            last_node_id - 1 with their arcs, e.g. a tile of a graph
+            whose nodes are ordered by tile (see tiles.py). The head node
+            ids of the arcs stay the node ids of this graph.
+        :param last_node_id: see first_node_id, None for all nodes from
+            first_node_id on.
+        :return: None
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.write_binary_file('graph_13/test.graph.csr', None, True, 2, 4)
+        >>> graph2 = CSRGraph()
+        >>> graph2.read_binary_file('graph_13/test.graph.csr')
+        >>> [values.tolist() for values in graph2.get_arc_arrays()]
+        [[0, 1, 2], [3, 1], [50, 40]]
+        >>> graph2.get_original_node_id(0), graph2.get_original_node_id(1)
+        (2, 3)
+        >>> os.remove('graph_13/test.graph.csr')
+        """
+
+        if source_stat is not None:
+            source_size = source_stat.st_size
+            source_mtime = source_stat.st_mtime_ns
+        else:
+            source_size = source_mtime = -1
+        if last_node_id is None:
+            last_node_id = self._num_nodes
+
+        latitudes = self._latitudes
+        longitudes = self._longitudes
+        offsets = self._offsets
+        heads = self._heads
+        distances = self._distances
+        max_speeds = self._max_speeds
+        original_node_ids = self._original_node_ids or ()
+        num_nodes = self._num_nodes
+        num_arcs = self._num_arcs
+        if first_node_id != 0 or last_node_id != num_nodes:
+            first_arc_idx = offsets[first_node_id]
+            last_arc_idx = offsets[last_node_id]
+            latitudes = latitudes[first_node_id:last_node_id]
+            longitudes = longitudes[first_node_id:last_node_id]
+            offsets = [offset - first_arc_idx for offset
+                       in offsets[first_node_id:last_node_id + 1]]
+            heads = heads[first_arc_idx:last_arc_idx]
+            distances = distances[first_arc_idx:last_arc_idx]
+            max_speeds = max_speeds[first_arc_idx:last_arc_idx]
+            # The nodes are renumbered, keep their node ids.
+            original_node_ids = (
+                original_node_ids[first_node_id:last_node_id]
+                if original_node_ids else range(first_node_id, last_node_id))
+            num_nodes = last_node_id - first_node_id
+            num_arcs = last_arc_idx - first_arc_idx
+
+        header = struct.pack(GRAPH_FILE_HEADER, GRAPH_FILE_MAGIC,
+                             GRAPH_FILE_VERSION, sys.byteorder == 'little',
+                             directed, source_size, source_mtime,
+                             num_nodes, num_arcs, len(heads),
+                             len(original_node_ids))
+        # Write into a temporary file first, so readers never see a
+        # partially written file.
+        tmp_file_name = '{0}.{1}.tmp'.format(file_name, os.getpid())
+        with open(tmp_file_name, 'wb') as binary_file:
+            write_aligned(binary_file, [(header, 'B'),
+                                        (latitudes, 'd'),
+                                        (longitudes, 'd'),
+                                        (offsets, 'q'),
+                                        (heads, 'i'),
+                                        (distances, 'i'),
+                                        (max_speeds, 'i'),
+                                        (original_node_ids, 'i')])
+        os.replace(tmp_file_name, file_name)
+
+        return None
+
+    def read_binary_file(self, file_name):
+        """
+        Memory-map a binary file written by write_binary_file().
+        The arc and node arrays are read-only views of the mapped file,
+        nothing is copied.
+
+        :param file_name: path of the binary file.
+        :return: None
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.write_binary_file('graph_13/test.graph.csr')
+        >>> graph2 = CSRGraph()
+        >>> graph2.read_binary_file('graph_13/test.graph.csr')
+        >>> graph2
+        [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
+        >>> os.remove('graph_13/test.graph.csr')
+        """
+
+        if self._num_nodes != 0:
+            raise Exception('Graph is already read in')
+
+        with open(file_name, 'rb') as binary_file:
+            mapped_file = mmap.mmap(binary_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        self.read_binary_buffer(mapped_file)
+
+        return None
+
+    def read_binary_buffer(self, buffer):
+        """
+        Read the content of a binary file written by write_binary_file()
+        from a buffer, e.g. a memory-mapped file or the buffer of a
+        multiprocessing.shared_memory block. The arc and node arrays are
+        read-only views of the buffer, nothing is copied.
+
+        :param buffer: object supporting the buffer protocol.
+        :return: None
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph', False)
+        >>> graph.write_binary_file('graph_13/test.graph.csr', directed=False)
+        >>> with open('graph_13/test.graph.csr', 'rb') as binary_file:
+        ...     content = binary_file.read()
+        >>> os.remove('graph_13/test.graph.csr')
+        >>> graph2 = CSRGraph()
+        >>> graph2.read_binary_buffer(content)
+        >>> graph2.get_num_arcs(), graph2.is_directed()
+        (6, False)
+        """
+
+        if self._num_nodes != 0:
+            raise Exception('Graph is already read in')
+
+        header = read_binary_file_header(buffer)
+        if header is None:
+            raise Exception('Binary graph file has an invalid header')
+        (num_nodes, num_arcs, num_entries, num_original_node_ids) = \
+            header[5:9]
+
+        views = map_aligned(buffer, struct.calcsize(GRAPH_FILE_HEADER),
+                            [(num_nodes, 'd'), (num_nodes, 'd'),
+                             (num_nodes + 1, 'q'), (num_entries, 'i'),
+                             (num_entries, 'i'), (num_entries, 'i'),
+                             (num_original_node_ids, 'i')])[0]
+
+        self._mapped_file = buffer
+        self._directed = header[2]
+        self._num_nodes = num_nodes
+        self._num_arcs = num_arcs
+        (self._latitudes, self._longitudes, self._offsets, self._heads,
+         self._distances, self._max_speeds) = views[:6]
+        if num_original_node_ids:
+            self._original_node_ids = views[6]
+        # Costs default to distance, set_arc_costs_* replace the array.
+        self._costs = self._distances
+        self.reset_search_state()
+
+        return None
+
+    def get_num_nodes(self):
+        """
+        :return: number of nodes in graph.
+        """
+        return self._num_nodes
+
+    def get_num_arcs(self):
+        """
+        :return: number of arcs in graph.
+        """
+        return self._num_arcs
+
+    def get_num_bytes(self):
+        """
+        :return: size of the node and arc arrays with the current arc
+            costs [bytes], without the search state and the cached cost
+            profiles.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.get_num_bytes()
+        248
+        """
+        arrays = [self._latitudes, self._longitudes, self._offsets,
+                  self._heads, self._distances, self._max_speeds,
+                  self._original_node_ids or ()]
+        if self._costs is not self._distances:
+            arrays.append(self._costs)
+
+        return sum(len(values) * getattr(values, 'itemsize', 0)
+                   for values in arrays)
+
+    def get_coordinates(self):
+        """
+        :return: arrays (latitudes, longitudes) of all nodes.
+        """
+        return (self._latitudes, self._longitudes)
+
+    def get_arc_attributes(self):
+        """
+        :return: arrays (distances [m], max. speeds [km/h]) of all arcs,
+            as in the *.graph file.
+        """
+        return (self._distances, self._max_speeds)
+
+    def get_arc(self, arc_idx):
+        """
+        Create an Arc object for an arc of the CSR arrays.
+
+        :param arc_idx: position of the arc in the arc arrays.
+        :return: Arc object (a copy, changing it does not alter the graph).
+        """
+        arc = Arc(self.get_arc_tail(arc_idx), self._heads[arc_idx],
+                  self._distances[arc_idx], self._max_speeds[arc_idx])
+        arc.costs = self._costs[arc_idx]
+
+        return arc
+
+    def get_arc_tail(self, arc_idx):
+        """
+        :param arc_idx: position of the arc in the arc arrays.
+        :return: tail node id of the arc.
+        """
+        # Binary search for the node whose arc range contains arc_idx.
+        low, high = 0, self._num_nodes
+        while high - low > 1:
+            mid = (low + high) // 2
+            if self._offsets[mid] <= arc_idx:
+                low = mid
+            else:
+                high = mid
+
+        return low
+
+    def get_arc_head(self, arc_idx):
+        """
+        :param arc_idx: position of the arc in the arc arrays.
+        :return: head node id of the arc.
+        """
+        return self._heads[arc_idx]
+
+    def find_arc(self, tail_node_id, head_node_id):
+        """
+        :return: position of the cheapest arc from a node to another node
+            (in either direction for an undirected graph) in the arc
+            arrays, -1 if there is no such arc.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.find_arc(2, 3), graph.find_arc(3, 2)
+        (3, -1)
+        >>> undirected_graph = CSRGraph()
+        >>> undirected_graph.read_graph_from_file('graph_13/test.graph', False)
+        >>> undirected_graph.find_arc(3, 2)
+        3
+        """
+        costs = self._costs
+        arc_indices = [arcs[idx] for offsets, arcs, heads
+                       in self._get_adjacency()
+                       for idx in range(offsets[tail_node_id],
+                                        offsets[tail_node_id + 1])
+                       if heads[idx] == head_node_id]
+
+        return min(arc_indices, key=costs.__getitem__, default=-1)
+
+    def get_outgoing_arcs(self, node_id):
+        """
+        :return: list of (arc index, head node id, cost) tuples of the arcs
+            a search traverses from a node. For an undirected graph these
+            include the arcs with the node as head, with their tail as
+            head node id.
+        """
+        costs = self._costs
+        return [(arcs[idx], heads[idx], costs[arcs[idx]])
+                for offsets, arcs, heads in self._get_adjacency()
+                for idx in range(offsets[node_id], offsets[node_id + 1])]
+
+    def compute_reachable_nodes(self, node_id):
+        """
+        Mark all reachable nodes from a given node.
+        Implemented as breadth first search (BFS).
+
+        :param node_id: identifier of a given node.
+        :return: number of reachable start nodes (incl. start node).
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> graph.compute_reachable_nodes(0)[0]
+        4
+        >>> graph.compute_reachable_nodes(4)[0]
+        6
+        >>> graph.compute_reachable_nodes(6)[0]
+        1
+        """
+
+        if _stats_sink is not None:
+            start_time = time.perf_counter()
+        adjacency = self._get_adjacency()
+        # Reachable nodes are marked with 1.
+        marked_nodes = bytearray(self._num_nodes)
+        marked_nodes[node_id] = 1
+        num_marked_nodes = 1
+        current_level = [node_id]
+        while current_level:
+            next_level = []
+            for curr_node_id in current_level:
+                for offsets, _, heads in adjacency:
+                    for idx in range(offsets[curr_node_id],
+                                     offsets[curr_node_id + 1]):
+                        head_node_id = heads[idx]
+                        if not marked_nodes[head_node_id]:
+                            marked_nodes[head_node_id] = 1
+                            num_marked_nodes += 1
+                            next_level.append(head_node_id)
+            current_level = next_level
+
+        if _stats_sink is not None:
+            search_time = time.perf_counter()
+            # Every arc of a marked node has been scanned once.
+            num_relaxed_arcs = sum(
+                offsets[marked_node_id + 1] - offsets[marked_node_id]
+                for offsets, _, _ in adjacency
+                for marked_node_id in itertools.compress(
+                    range(self._num_nodes), marked_nodes))
+            record_stats({'operation': 'compute_reachable_nodes',
+                          'start_node_id': node_id,
+                          'settled_nodes': num_marked_nodes,
+                          'relaxed_arcs': num_relaxed_arcs,
+                          'phases': {'search': search_time - start_time}})
+
+        return (num_marked_nodes, list(marked_nodes))
+
+    def set_arc_costs_to_travel_time(self, max_vehicle_speed):
+        """
+        Set arc costs to travel time in whole seconds.
+
+        :param max_vehicle_speed: [km/h]
+        :return: None
+
+        # Doctest(s):
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.set_arc_costs_to_travel_time(100)
+        >>> graph
+        [0->1(4), 0->2(8), 1->2(2), 2->3(6), 3->1(5), 4->3(2)]
+        """
+
+        self.set_cost_profile(
+            'travel_time_{0}'.format(int(max_vehicle_speed)))
+
+        return None
+
+    def set_arc_costs_to_distance(self):
+        """
+        Set arc costs to distance.
+
+        :return: None
+
+        # Doctest(s):
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.set_arc_costs_to_travel_time(100)
+        >>> graph.set_arc_costs_to_distance()
+        >>> graph
+        [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
+        """
+
+        self.set_cost_profile('distance')
+
+        return None
+
+    def set_cost_profile(self, cost_profile):
+        """
+        Set the current arc costs by name: 'distance' or 'travel_time_<max.
+        vehicle speed [km/h]>', e.g. 'travel_time_130'. The current arc
+        costs are used by searches without an own cost profile.
+
+        :param cost_profile: name of the arc costs.
+        :return: None
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.set_cost_profile('travel_time_100')
+        >>> graph.get_cost_profile()
+        'travel_time_100'
+        >>> graph
+        [0->1(4), 0->2(8), 1->2(2), 2->3(6), 3->1(5), 4->3(2)]
+        """
+
+        self._costs = self.get_costs(cost_profile)
+        self._cost_profile = cost_profile
+
+        return None
+
+    def get_costs(self, cost_profile=None):
+        """
+        Arc costs of a cost profile, see set_cost_profile(). The cost
+        arrays of the last COST_PROFILE_CACHE_SIZE cost profiles are cached,
+        so searches can select a cost profile per query without changing
+        the graph.
+
+        :param cost_profile: name of the arc costs, None for the current
+            arc costs.
+        :return: array with the costs of each arc (must not be changed).
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.get_costs('travel_time_100')
+        array('q', [4, 8, 2, 6, 5, 2])
+        >>> graph.get_costs('travel_time_100') is graph.get_costs('travel_time_100')
+        True
+        >>> graph.get_cost_profile(), graph.get_costs()
+        ('distance', array('q', [30, 70, 20, 50, 40, 20]))
+        """
+
+        if cost_profile is None or cost_profile == self._cost_profile:
+            return self._costs
+        if cost_profile in self._updated_costs:
+            return self._updated_costs[cost_profile]
+        cost_profiles = self._cost_profiles
+        costs = cost_profiles.get(cost_profile)
+        if costs is not None:
+            cost_profiles.move_to_end(cost_profile)
+            return costs
+
+        costs = self._compute_costs(cost_profile)
+        cost_profiles[cost_profile] = costs
+        if len(cost_profiles) > COST_PROFILE_CACHE_SIZE:
+            evicted_cost_profile = cost_profiles.popitem(last=False)[0]
+            self._max_arc_costs.pop(evicted_cost_profile, None)
+            self._heuristic_factors.pop(evicted_cost_profile, None)
+
+        return costs
+
+    def _compute_costs(self, cost_profile, arc_indices=None):
+        """
+        Compute the arc costs of a cost profile. The travel time of an arc
+        is rounded to whole seconds, its speed is the smaller one of the
+        max. speed of the arc and the max. vehicle speed.
+
+        :param arc_indices: compute the costs of these arcs only, None for
+            all arcs.
+        :return: new array with the costs of each arc.
+        """
+
+        distances = self._distances
+        max_speeds = self._max_speeds
+        if arc_indices is not None:
+            distances = [distances[arc_idx] for arc_idx in arc_indices]
+            max_speeds = [max_speeds[arc_idx] for arc_idx in arc_indices]
+        if cost_profile == 'distance':
+            return array('q', distances)
+        if not cost_profile.startswith('travel_time_'):
+            raise Exception('Unknown cost profile: ' + cost_profile)
+        max_vehicle_speed = int(cost_profile[len('travel_time_'):])
+        # Speed [m/s] of each arc, then travel time = distance / speed.
+        speeds = map(operator.truediv,
+                     map(min, max_speeds,
+                         itertools.repeat(max_vehicle_speed)),
+                     itertools.repeat(3.6))
+
+        return array('q', map(round, map(operator.truediv, distances,
+                                         speeds)))
+
+    def update_arc_costs(self, arc_indices, costs):
+        """
+        Change the costs of some arcs of the current cost profile in place,
+        e.g. travel times from a live traffic feed. The changes stay with
+        the cost profile until the graph is read in again.
+
+        Derived values are repaired from the changed arcs only: the max.
+        arc cost and the heuristic factor of the A* search. Results that
+        depend on all arcs (shortest path trees, landmarks, contraction
+        hierarchies) compare their cost version with get_cost_version().
+
+        :param arc_indices: positions of the arcs in the arc arrays, e.g.
+            from ShortestPath.arcs or find_arc(). An arc of an undirected
+            graph has one cost for both directions.
+        :param costs: new non-negative cost of each arc.
+        :return: None
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.update_arc_costs([graph.find_arc(1, 2)], [200])
+        >>> graph.shortest_path(0, 3)
+        ShortestPath(path=[0, 2, 3], distance=120, num_settled=4, arcs=[1, 3])
+        >>> graph.get_cost_version(), graph.has_lowered_costs()
+        (1, False)
+        >>> graph.update_arc_costs([2, 5], [10, 10])
+        >>> graph.set_cost_profile('travel_time_100')
+        >>> graph.set_cost_profile('distance')
+        >>> graph
+        [0->1(30), 0->2(70), 1->2(10), 2->3(50), 3->1(40), 4->3(10)]
+        >>> graph.get_cost_version(), graph.has_lowered_costs()
+        (2, True)
+        >>> graph.get_cost_version('travel_time_100')
+        0
+        >>> graph.update_arc_costs([graph.find_arc(0, 3)], [1])
+        Traceback (most recent call last):
+            ...
+        Exception: Arc index out of range
+        >>> graph.get_cost_version()
+        2
+        """
+
+        start_time = time.perf_counter()
+        arc_indices = list(arc_indices)
+        num_arcs = len(self._heads)
+        if any(not 0 <= arc_idx < num_arcs for arc_idx in arc_indices):
+            raise Exception('Arc index out of range')
+        costs = array('q', costs)
+        if len(arc_indices) != len(costs):
+            raise Exception('Number of arcs and costs differ')
+        if any(cost < 0 for cost in costs):
+            raise Exception('Arc costs must not be negative')
+        cost_profile = self._cost_profile
+        if cost_profile not in self._updated_costs:
+            # Copy the costs of the profile once: the distances of a
+            # mapped binary file are read-only, and the cost array must not
+            # be evicted with its changes.
+            self._costs = array('q', self._costs)
+            self._updated_costs[cost_profile] = self._costs
+            self._cost_profiles.pop(cost_profile, None)
+        current_costs = self._costs
+
+        # Count the arcs that cost less than in the *.graph file, see
+        # has_lowered_costs().
+        num_lowered_costs = self._num_lowered_costs.get(cost_profile, 0)
+        for arc_idx, base_cost, cost in zip(
+                arc_indices, self._compute_costs(cost_profile, arc_indices),
+                costs):
+            num_lowered_costs += ((cost < base_cost) -
+                                  (current_costs[arc_idx] < base_cost))
+            current_costs[arc_idx] = cost
+        self._num_lowered_costs[cost_profile] = num_lowered_costs
+        self._cost_versions[cost_profile] = \
+            self._cost_versions.get(cost_profile, 0) + 1
+
+        # A larger max. arc cost is still valid for the bucket queues, and
+        # a smaller heuristic factor for the A* search.
+        if costs and cost_profile in self._max_arc_costs:
+            self._max_arc_costs[cost_profile] = max(
+                self._max_arc_costs[cost_profile], max(costs))
+        if (cost_profile in self._heuristic_factors and
+                self._arc_lengths is not None):
+            arc_lengths = self._arc_lengths
+            self._heuristic_factors[cost_profile] = min(
+                itertools.chain(
+                    (self._heuristic_factors[cost_profile],),
+                    (cost / arc_lengths[arc_idx]
+                     for arc_idx, cost in zip(arc_indices, costs)
+                     if arc_lengths[arc_idx] > 0)))
+
+        if _stats_sink is not None:
+            record_stats({'operation': 'update_arc_costs',
+                          'cost_profile': cost_profile,
+                          'arcs': len(arc_indices),
+                          'cost_version': self._cost_versions[cost_profile],
+                          'phases': {
+                              'update': time.perf_counter() - start_time}})
+
+        return None
+
+    def get_cost_version(self, cost_profile=None):
+        """
+        :param cost_profile: see get_costs().
+        :return: number of update_arc_costs() calls on a cost profile, 0
+            for the costs of the *.graph file.
+        """
+        if cost_profile is None:
+            cost_profile = self._cost_profile
+        return self._cost_versions.get(cost_profile, 0)
+
+    def has_lowered_costs(self, cost_profile=None):
+        """
+        Lower bounds computed from the costs of the *.graph file (e.g. the
+        distance tables of landmarks) stay valid as long as no arc costs
+        less, e.g. while traffic only slows arcs down.
+
+        :param cost_profile: see get_costs().
+        :return: True if update_arc_costs() made any arc cheaper than in
+            the *.graph file.
+        """
+        if cost_profile is None:
+            cost_profile = self._cost_profile
+        return self._num_lowered_costs.get(cost_profile, 0) > 0
+
+    def get_cost_profile(self):
+        """
+        :return: name of the current arc costs, see set_cost_profile().
+        """
+        return self._cost_profile
+
+    def get_source_file_name(self):
+        """
+        :return: *.graph file the graph was read from, None if unknown.
+        """
+        return self._source_file_name
+
+    def is_directed(self):
+        """
+        :return: False if every arc can be traversed in both directions.
+        """
+        return self._directed
+
+    def compute_lcc(self):
+        """
+        Mark all nodes in the largest connected component.
+        Same result as Graph.compute_lcc(), from the labels of
+        compute_connected_components().
+
+        :return: (number of nodes, ascending list of the node ids) tuple of
+            the largest connected component.
+
+        # Doctest(s):
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compute_lcc()
+        (5, [0, 1, 2, 3, 4])
+        >>> graph2 = CSRGraph()
+        >>> graph2.read_graph_from_file('graph_13/test2.graph')
+        >>> graph2.compute_lcc()
+        (7, [0, 1, 2, 3, 4, 5, 6])
+        """
+
+        node_ids = self.get_largest_component_node_ids(strong=False)
+
+        return (len(node_ids), node_ids)
+
+    def compute_connected_components(self):
+        """
+        Label the (weakly) connected components, i.e. the components of
+        the graph with all arcs taken as undirected. Each node is visited
+        once by an iterative BFS along its arcs and reverse arcs.
+
+        :return: (number of components, array with the component label of
+            each node) tuple.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> graph.compute_connected_components()
+        (1, array('i', [0, 0, 0, 0, 0, 0, 0]))
+        """
+
+        self._build_reverse_index()
+        num_nodes = self._num_nodes
+        adjacency = ((self._offsets, self._heads),
+                     (self._reverse_offsets, self._reverse_tails))
+        labels = array('i', [-1]) * num_nodes
+        num_components = 0
+        for root_node_id in range(num_nodes):
+            if labels[root_node_id] >= 0:
+                continue
+            labels[root_node_id] = num_components
+            current_level = [root_node_id]
+            while current_level:
+                next_level = []
+                for node_id in current_level:
+                    for offsets, heads in adjacency:
+                        for idx in range(offsets[node_id],
+                                         offsets[node_id + 1]):
+                            head_node_id = heads[idx]
+                            if labels[head_node_id] < 0:
+                                labels[head_node_id] = num_components
+                                next_level.append(head_node_id)
+                current_level = next_level
+            num_components += 1
+
+        return (num_components, labels)
+
+    def compute_strongly_connected_components(self):
+        """
+        Label the strongly connected components by Tarjan's algorithm. The
+        depth-first search is iterative (an explicit stack of nodes with
+        the position of their next arc), so long paths of a road graph
+        cannot exceed the recursion limit. The components are numbered
+        in reverse topological order.
+
+        :return: (number of components, array with the component label of
+            each node) tuple.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compute_strongly_connected_components()
+        (3, array('i', [1, 0, 0, 0, 2]))
+        >>> graph2 = CSRGraph()
+        >>> graph2.read_graph_from_file('graph_13/test2.graph')
+        >>> graph2.compute_strongly_connected_components()
+        (4, array('i', [1, 0, 0, 0, 3, 3, 2]))
+        """
+
+        if not self._directed:
+            # Every arc can be traversed in both directions.
+            return self.compute_connected_components()
+        num_nodes = self._num_nodes
+        offsets = self._offsets
+        heads = self._heads
+        # DFS number and lowest reachable DFS number on the stack.
+        indices = array('i', [-1]) * num_nodes
+        low_links = array('i', [-1]) * num_nodes
+        # Position of the next arc to visit of each node.
+        next_arcs = array('q', offsets[:num_nodes])
+        on_stack = bytearray(num_nodes)
+        labels = array('i', [-1]) * num_nodes
+        stack = []
+        num_components = 0
+        counter = 0
+
+        for root_node_id in range(num_nodes):
+            if indices[root_node_id] >= 0:
+                continue
+            indices[root_node_id] = low_links[root_node_id] = counter
+            counter += 1
+            stack.append(root_node_id)
+            on_stack[root_node_id] = 1
+            # Nodes of the current DFS path.
+            path = [root_node_id]
+            while path:
+                node_id = path[-1]
+                arc_idx = next_arcs[node_id]
+                end = offsets[node_id + 1]
+                while arc_idx < end:
+                    head_node_id = heads[arc_idx]
+                    arc_idx += 1
+                    if indices[head_node_id] < 0:
+                        # Descend into the head node.
+                        next_arcs[node_id] = arc_idx
+                        indices[head_node_id] = counter
+                        low_links[head_node_id] = counter
+                        counter += 1
+                        stack.append(head_node_id)
+                        on_stack[head_node_id] = 1
+                        path.append(head_node_id)
+                        break
+                    if (on_stack[head_node_id] and
+                            indices[head_node_id] < low_links[node_id]):
+                        low_links[node_id] = indices[head_node_id]
+                else:
+                    # All arcs visited, the node is finished.
+                    next_arcs[node_id] = arc_idx
+                    path.pop()
+                    if low_links[node_id] == indices[node_id]:
+                        # The node is the root of a component.
+                        while True:
+                            member_node_id = stack.pop()
+                            on_stack[member_node_id] = 0
+                            labels[member_node_id] = num_components
+                            if member_node_id == node_id:
+                                break
+                        num_components += 1
+                    if path and low_links[node_id] < low_links[path[-1]]:
+                        low_links[path[-1]] = low_links[node_id]
+
+        return (num_components, labels)
+
+    def extract_largest_component(self, strong=True):
+        """
+        Extract the largest strongly connected (resp. connected) component
+        as a compact subgraph, so every node of it can reach every other
+        node (see extract_subgraph()).
+
+        :param strong: use strongly connected components, else (weakly)
+            connected components.
+        :return: CSRGraph of the largest component.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> lcc = graph.extract_largest_component()
+        >>> lcc
+        [0->1(20), 1->2(50), 2->0(40)]
+        >>> [lcc.get_original_node_id(node_id) for node_id in range(3)]
+        [1, 2, 3]
+        """
+
+        return self.extract_subgraph(
+            self.get_largest_component_node_ids(strong))
+
+    def get_largest_component_node_ids(self, strong=True):
+        """
+        :param strong: use strongly connected components, else (weakly)
+            connected components.
+        :return: ascending list of the node ids of the largest component.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.get_largest_component_node_ids()
+        [1, 2, 3]
+        >>> graph.get_largest_component_node_ids(strong=False)
+        [0, 1, 2, 3, 4]
+        """
+
+        if strong:
+            return get_largest_component(
+                *self.compute_strongly_connected_components())
+
+        return get_largest_component(*self.compute_connected_components())
+
+    def get_arc_arrays(self, cost_profile=None):
+        """
+        Arrays of the CSR format for searches outside this class: the arcs
+        of node i are at the positions offsets[i] .. offsets[i + 1] - 1 of
+        heads and costs. An arc of an undirected graph is stored at its
+        tail only, see to_directed() for the arcs in both directions.
+
+        :param cost_profile: see get_costs().
+        :return: tuple (offsets, heads, costs) of arrays, which must not
+            be changed.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> [values.tolist() for values in graph.get_arc_arrays()]
+        [[0, 2, 3, 4, 5, 6], [1, 2, 2, 3, 1, 3], [30, 70, 20, 50, 40, 20]]
+        """
+        return (self._offsets, self._heads, self.get_costs(cost_profile))
+
+    def to_directed(self):
+        """
+        Create a directed copy of the graph that stores every arc of an
+        undirected graph in both directions, for formats that keep the
+        outgoing arcs of each node only (e.g. the tiles of tiles.py).
+
+        :return: directed CSRGraph with the current arc costs of this
+            graph, this graph if it is directed.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph', False)
+        >>> graph.extract_subgraph([0, 1, 2]).to_directed()
+        [0->1(30), 0->2(70), 1->2(20), 1->0(30), 2->0(70), 2->1(20)]
+        """
+
+        if self._directed:
+            return self
+        graph = CSRGraph()
+        graph._num_nodes = self._num_nodes
+        graph._latitudes = self._latitudes
+        graph._longitudes = self._longitudes
+        for node_id in range(self._num_nodes):
+            for offsets, arcs, heads in self._get_adjacency():
+                for idx in range(offsets[node_id], offsets[node_id + 1]):
+                    arc_idx = arcs[idx]
+                    graph._heads.append(heads[idx])
+                    graph._distances.append(self._distances[arc_idx])
+                    graph._max_speeds.append(self._max_speeds[arc_idx])
+                    graph._costs.append(self._costs[arc_idx])
+            graph._offsets.append(len(graph._heads))
+        graph._num_arcs = len(graph._heads)
+        graph._cost_profile = self._cost_profile
+        graph._original_node_ids = self._original_node_ids
+        graph.reset_search_state()
+
+        return graph
+
+    def extract_subgraph(self, node_ids):
+        """
+        Create a compact subgraph of some nodes with all arcs between them.
+        The nodes are renumbered 0, 1, ... in the given order; the
+        subgraph translates between its node ids and the node ids of the
+        *.graph file, see get_original_node_id() and get_node_id().
+
+        :param node_ids: node ids of the subgraph (without duplicates).
+        :return: CSRGraph with the current arc costs of this graph.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> subgraph = graph.extract_subgraph([5, 4, 6])
+        >>> subgraph
+        [0->1(10), 1->0(10), 1->2(10)]
+        >>> subgraph.get_node_id(6), subgraph.get_node_id(0)
+        (2, -1)
+        >>> subgraph.shortest_path(0, 2).path
+        [0, 1, 2]
+        """
+
+        node_map = array('i', [-1]) * self._num_nodes
+        for new_node_id, node_id in enumerate(node_ids):
+            node_map[node_id] = new_node_id
+        offsets = self._offsets
+        heads = self._heads
+        costs = self._costs
+
+        subgraph = CSRGraph()
+        subgraph._num_nodes = len(node_ids)
+        subgraph._latitudes = array('d', map(self._latitudes.__getitem__,
+                                             node_ids))
+        subgraph._longitudes = array('d', map(self._longitudes.__getitem__,
+                                              node_ids))
+        for node_id in node_ids:
+            for arc_idx in range(offsets[node_id], offsets[node_id + 1]):
+                new_head_node_id = node_map[heads[arc_idx]]
+                if new_head_node_id >= 0:
+                    subgraph._heads.append(new_head_node_id)
+                    subgraph._distances.append(self._distances[arc_idx])
+                    subgraph._max_speeds.append(self._max_speeds[arc_idx])
+                    subgraph._costs.append(costs[arc_idx])
+            subgraph._offsets.append(len(subgraph._heads))
+        subgraph._num_arcs = len(subgraph._heads)
+        subgraph._directed = self._directed
+        subgraph._cost_profile = self._cost_profile
+        subgraph._original_node_ids = array(
+            'i', map(self.get_original_node_id, node_ids))
+        subgraph.reset_search_state()
+
+        return subgraph
+
+    def get_original_node_id(self, node_id):
+        """
+        :return: node id in the *.graph file of a node.
+        """
+        if self._original_node_ids is None:
+            return node_id
+        return self._original_node_ids[node_id]
+
+    def get_node_id(self, original_node_id):
+        """
+        :return: node id of the node with the given node id in the *.graph
+            file, -1 if this (sub)graph does not contain the node.
+        """
+        original_node_ids = self._original_node_ids
+        if original_node_ids is None:
+            if 0 <= original_node_id < self._num_nodes:
+                return original_node_id
+            return -1
+        if self._node_ids_by_original is None:
+            node_ids_by_original = array('i', [-1]) * (
+                max(original_node_ids, default=-1) + 1)
+            for node_id, node_original_id in enumerate(original_node_ids):
+                node_ids_by_original[node_original_id] = node_id
+            self._node_ids_by_original = node_ids_by_original
+        if 0 <= original_node_id < len(self._node_ids_by_original):
+            return self._node_ids_by_original[original_node_id]
+        return -1
+
+    def get_node_order(self):
+        """
+        :return: node order of a reordered graph, see reorder_nodes(),
+            None if the node ids are the ones of the *.graph file.
+        """
+        return self._node_order
+
+    def compute_node_order(self, node_order='hilbert'):
+        """
+        Order the nodes so nodes close to each other in the graph get
+        close node ids, and their arcs and search state are close to each
+        other in memory.
+
+        'hilbert': order along a Hilbert curve over the coordinates.
+        'bfs': order of a BFS along the arcs and reverse arcs, starting
+            from node 0 (and the next unvisited node for each further
+            component).
+
+        :param node_order: 'hilbert' or 'bfs'.
+        :return: list of all node ids in the new order.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> graph.compute_node_order('bfs')
+        [0, 1, 2, 3, 5, 4, 6]
+        >>> graph.compute_node_order('hilbert')
+        [0, 1, 2, 3, 4, 5, 6]
+        """
+
+        num_nodes = self._num_nodes
+        if node_order == 'hilbert':
+            if not num_nodes:
+                return []
+            max_coordinate = (1 << HILBERT_ORDER) - 1
+            coordinates = []
+            for values in (self._longitudes, self._latitudes):
+                min_value = min(values)
+                scale = max_coordinate / ((max(values) - min_value) or 1.0)
+                coordinates.append([int((value - min_value) * scale)
+                                    for value in values])
+            indices = list(map(hilbert_index, coordinates[0], coordinates[1],
+                               itertools.repeat(HILBERT_ORDER)))
+            return sorted(range(num_nodes), key=indices.__getitem__)
+        if node_order == 'bfs':
+            self._build_reverse_index()
+            adjacency = ((self._offsets, self._heads),
+                         (self._reverse_offsets, self._reverse_tails))
+            visited_nodes = bytearray(num_nodes)
+            order = []
+            for root_node_id in range(num_nodes):
+                if visited_nodes[root_node_id]:
+                    continue
+                visited_nodes[root_node_id] = 1
+                pos = len(order)
+                order.append(root_node_id)
+                # The order list is the BFS queue.
+                while pos < len(order):
+                    node_id = order[pos]
+                    pos += 1
+                    for offsets, heads in adjacency:
+                        for idx in range(offsets[node_id],
+                                         offsets[node_id + 1]):
+                            head_node_id = heads[idx]
+                            if not visited_nodes[head_node_id]:
+                                visited_nodes[head_node_id] = 1
+                                order.append(head_node_id)
+            return order
+        raise Exception('Unknown node order: ' + str(node_order))
+
+    def reorder_nodes(self, node_order='hilbert'):
+        """
+        Create a copy of the graph with the nodes renumbered by
+        compute_node_order(). The copy translates the node ids of the
+        *.graph file, see get_node_id() and get_original_node_id().
+        CSRGraph.load() stores reordered graphs in their own binary file.
+
+        :param node_order: see compute_node_order().
+        :return: reordered CSRGraph.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> reordered_graph = graph.reorder_nodes('bfs')
+        >>> reordered_graph.get_node_id(5), reordered_graph.get_node_id(4)
+        (4, 5)
+        >>> path = reordered_graph.shortest_path(reordered_graph.get_node_id(0),
+        ...                                      reordered_graph.get_node_id(4))
+        >>> path.distance == graph.shortest_path(0, 4).distance
+        True
+        >>> [reordered_graph.get_original_node_id(node_id)
+        ...  for node_id in path.path] == graph.shortest_path(0, 4).path
+        True
+        """
+
+        graph = self.extract_subgraph(self.compute_node_order(node_order))
+        graph._num_arcs = self._num_arcs
+        if self._original_node_ids is None:
+            # Worker processes load the same order from the *.graph file.
+            graph._source_file_name = self._source_file_name
+            graph._node_order = node_order
+
+        return graph
+
+    def compute_shortest_paths(self, start_node_id, queue_engine='heap',
+                               backward=False, workspace=None,
+                               cost_profile=None):
+        """
+        Compute the shortest paths for a given start node.
+        To solve this problem the Dijkstra's algorithm is used.
+
+        :param start_node_id: identifier of start node
+        :param queue_engine: name of a priority queue engine (see
+            QUEUE_ENGINES) or an empty priority queue object, e.g. to read
+            its push/pop counters afterwards.
+        :param backward: compute the shortest paths from all nodes to the
+            start node instead (on the reverse arcs). The traceback arcs
+            then lead towards the start node.
+        :param workspace: SearchWorkspace that receives the search state,
+            by default the workspace of the graph.
+        :param cost_profile: name of the arc costs of this search (see
+            get_costs()), by default the current arc costs.
+        :return: None
+
+        # Doctest(s):
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> start_id = 1
+        >>> graph.compute_shortest_paths(start_id)
+        >>> ['{0}->{1}({2})'.format(start_id, node_id, graph.get_node_distance(node_id))
+        ...  for node_id in range(graph.get_num_nodes())]
+        ['1->0(-1)', '1->1(0)', '1->2(20)', '1->3(70)', '1->4(-1)']
+        >>> for engine in sorted(QUEUE_ENGINES):
+        ...     active_nodes = make_priority_queue(engine, graph)
+        ...     graph.compute_shortest_paths(0, active_nodes)
+        ...     print(engine, [graph.get_node_distance(node_id) for node_id in range(5)],
+        ...           active_nodes.num_pushes, active_nodes.num_pops)
+        dial [0, 30, 50, 100, -1] 5 5
+        heap [0, 30, 50, 100, -1] 5 5
+        indexed_heap [0, 30, 50, 100, -1] 5 4
+        priority_queue [0, 30, 50, 100, -1] 5 5
+        radix_heap [0, 30, 50, 100, -1] 5 5
+        >>> graph.compute_shortest_paths(3, backward=True)
+        >>> graph.get_node_distances()
+        array('q', [100, 70, 50, 0, 20])
+        >>> graph.compute_shortest_paths(0, cost_profile='travel_time_100')
+        >>> graph.get_node_distances(), graph.get_cost_profile()
+        (array('q', [0, 4, 6, 12, -1]), 'distance')
+        """
+
+        if _stats_sink is not None:
+            self._dijkstra_with_stats('compute_shortest_paths', start_node_id,
+                                      queue_engine, backward, workspace,
+                                      cost_profile)
+            return None
+        self._dijkstra(start_node_id, (), queue_engine, backward, workspace,
+                       cost_profile)
+
+        return None
+
+    def _dijkstra_with_stats(self, operation, start_node_id, queue_engine,
+                             backward=False, workspace=None,
+                             cost_profile=None, other_start_node_ids=(),
+                             settled_node_ids=None):
+        """
+        Run _dijkstra() to settle all reachable nodes and pass its counters
+        and phase times to the stats sink (see set_stats_sink()).
+
+        :param operation: name of the calling method.
+        :param other_start_node_ids: see _dijkstra().
+        :param settled_node_ids: see _dijkstra().
+        :return: number of settled nodes.
+        """
+
+        workspace = self._get_workspace(workspace)
+        queue_engine_name = (queue_engine if isinstance(queue_engine, str)
+                             else type(queue_engine).__name__)
+        active_nodes = make_priority_queue(queue_engine, self, cost_profile)
+        num_pushes = active_nodes.num_pushes
+        num_pops = active_nodes.num_pops
+        if settled_node_ids is None:
+            settled_node_ids = array('i')
+        phases = {}
+
+        start_time = time.perf_counter()
+        if backward or not self._directed:
+            self._build_reverse_index()
+            reverse_index_time = time.perf_counter()
+            phases['reverse_index'] = reverse_index_time - start_time
+            start_time = reverse_index_time
+        adjacency = self._get_adjacency(backward)
+        self.get_costs(cost_profile)
+        costs_time = time.perf_counter()
+        phases['costs'] = costs_time - start_time
+        workspace.reset()
+        reset_time = time.perf_counter()
+        phases['reset'] = reset_time - costs_time
+        num_settled = self._dijkstra(start_node_id, (), active_nodes,
+                                     backward, workspace, cost_profile,
+                                     settled_node_ids=settled_node_ids,
+                                     other_start_node_ids=other_start_node_ids)
+        phases['search'] = time.perf_counter() - reset_time
+
+        num_pushes = active_nodes.num_pushes - num_pushes
+        num_pops = active_nodes.num_pops - num_pops
+        record_stats({'operation': operation,
+                      'start_node_id': start_node_id,
+                      'queue_engine': queue_engine_name,
+                      'cost_profile': cost_profile or self._cost_profile,
+                      'backward': backward,
+                      'settled_nodes': num_settled,
+                      'relaxed_arcs': sum(offsets[node_id + 1] -
+                                          offsets[node_id]
+                                          for offsets, _, _ in adjacency
+                                          for node_id in settled_node_ids),
+                      'pushes': num_pushes,
+                      'pops': num_pops,
+                      'stale_pops': num_pops - num_settled,
+                      'phases': phases})
+
+        return num_settled
+
+    def compute_one_to_many(self, start_node_id, target_node_ids,
+                            queue_engine='heap', workspace=None,
+                            cost_profile=None):
+        """
+        Compute the distances from a start node to some target nodes. The
+        search stops as soon as all target nodes are settled.
+
+        :param start_node_id: identifier of start node
+        :param target_node_ids: sequence of target node ids.
+        :param queue_engine: see compute_shortest_paths().
+        :param workspace: see compute_shortest_paths().
+        :param cost_profile: see compute_shortest_paths().
+        :return: array with the distance of each target node, -1 for
+            unreachable target nodes.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compute_one_to_many(0, [2, 1])
+        array('q', [50, 30])
+        >>> graph.get_node_distance(3)
+        -1
+        >>> graph.compute_one_to_many(0, [4, 3])
+        array('q', [-1, 100])
+        """
+
+        workspace = self._get_workspace(workspace)
+        self._dijkstra(start_node_id, target_node_ids, queue_engine,
+                       workspace=workspace, cost_profile=cost_profile)
+
+        return array('q', map(workspace.get_distance, target_node_ids))
+
+    def compute_isochrones(self, start_node_id, budgets, queue_engine='heap',
+                           backward=False, workspace=None, cost_profile=None):
+        """
+        Compute the nodes reachable from a start node within some cost
+        budgets, e.g. [300, 600, 900] seconds for the cost profile
+        'travel_time_130'. One search up to the largest budget answers all
+        budgets; it never reaches nodes beyond that budget, so its cost
+        depends on the size of the reachable area only.
+
+        :param start_node_id: identifier of start node
+        :param budgets: sequence of max. costs.
+        :param queue_engine: see compute_shortest_paths().
+        :param backward: nodes that can reach the start node instead.
+        :param workspace: see compute_shortest_paths().
+        :param cost_profile: see compute_shortest_paths().
+        :return: list with an Isochrone for each budget, in the order of
+            budgets.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> for isochrone in graph.compute_isochrones(0, [50, 30]):
+        ...     isochrone
+        Isochrone(budget=50, node_ids=array('i', [0, 1, 2]), costs=array('q', [0, 30, 50]))
+        Isochrone(budget=30, node_ids=array('i', [0, 1]), costs=array('q', [0, 30]))
+        >>> [isochrone.costs[-1]
+        ...  for isochrone in graph.compute_isochrones(0, iter([50, 30]))]
+        [50, 30]
+        >>> graph.compute_isochrones(3, [6], backward=True,
+        ...                          cost_profile='travel_time_100')[0].node_ids
+        array('i', [3, 4, 2])
+        >>> graph.get_node_distance(1)
+        -1
+        """
+
+        budgets = list(budgets)
+        max_budget = max(budgets, default=-1)
+        workspace = self._get_workspace(workspace)
+        settled_node_ids = array('i')
+        if max_budget >= 0:
+            self._dijkstra(start_node_id, (), queue_engine, backward,
+                           workspace, cost_profile, max_budget,
+                           settled_node_ids)
+        # Nodes are settled in order of increasing cost, so every
+        # isochrone is a prefix of the settled nodes.
+        costs = array('q', map(workspace.get_distance, settled_node_ids))
+        isochrones = []
+        for budget in budgets:
+            num_nodes = bisect.bisect_right(costs, budget)
+            isochrones.append(Isochrone(budget, settled_node_ids[:num_nodes],
+                                        costs[:num_nodes]))
+
+        return isochrones
+
+    def compute_eccentricity(self, start_node_id, queue_engine='heap',
+                             backward=False, workspace=None,
+                             cost_profile=None, node_mask=None):
+        """
+        Compute the eccentricity of a node: the largest distance to a node
+        it reaches. Nodes are settled in order of increasing distance, so
+        the search tracks the furthest node as the last settled one instead
+        of scanning all distances afterwards. Afterwards the workspace
+        holds all shortest paths from the node, like after
+        compute_shortest_paths().
+
+        :param start_node_id: identifier of start node
+        :param queue_engine: see compute_shortest_paths().
+        :param backward: largest distance of a node that reaches the start
+            node instead.
+        :param workspace: see compute_shortest_paths().
+        :param cost_profile: see compute_shortest_paths().
+        :param node_mask: sequence with a true entry for each node that
+            counts (e.g. the nodes of the largest component), None for all
+            nodes.
+        :return: tuple (eccentricity, furthest node id), (-1, -1) if no
+            node of the mask is reached. Of equally far nodes the last
+            settled one is returned.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compute_eccentricity(0), graph.compute_eccentricity(4)
+        ((100, 3), (80, 2))
+        >>> graph.compute_eccentricity(3, backward=True)
+        (100, 0)
+        >>> graph.compute_eccentricity(0, node_mask=[0, 1, 1, 0, 0])
+        (50, 2)
+        """
+
+        workspace = self._get_workspace(workspace)
+        if node_mask is None and _stats_sink is None:
+            # Keeps the last settled node only.
+            settled_node_ids = collections.deque(maxlen=1)
+        else:
+            settled_node_ids = array('i')
+        if _stats_sink is not None:
+            self._dijkstra_with_stats(
+                'compute_eccentricity', start_node_id, queue_engine,
+                backward, workspace, cost_profile,
+                settled_node_ids=settled_node_ids)
+        else:
+            self._dijkstra(start_node_id, (), queue_engine, backward,
+                           workspace, cost_profile,
+                           settled_node_ids=settled_node_ids)
+
+        for node_id in reversed(settled_node_ids):
+            if node_mask is None or node_mask[node_id]:
+                return (workspace.get_distance(node_id), node_id)
+
+        return (-1, -1)
+
+    def compute_nearest_facilities(self, facility_node_ids,
+                                   queue_engine='heap', backward=False,
+                                   workspace=None, cost_profile=None):
+        """
+        Assign every node to its nearest facility (e.g. depot) by one
+        multi-source Dijkstra search: all facilities start at distance 0
+        and each node inherits the facility of its predecessor. This costs
+        one search instead of one search per facility.
+
+        :param facility_node_ids: sequence of facility node ids.
+        :param queue_engine: see compute_shortest_paths().
+        :param backward: assign every node to the facility it reaches
+            fastest instead (on the reverse arcs).
+        :param workspace: see compute_shortest_paths(); afterwards the
+            traceback arcs lead to the nearest facility.
+        :param cost_profile: see compute_shortest_paths().
+        :return: NearestFacilities with the facility node id and the
+            distance of each node, -1 for nodes no facility reaches.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compute_nearest_facilities([0, 3])
+        NearestFacilities(facility_node_ids=array('i', [0, 0, 0, 3, -1]), distances=array('q', [0, 30, 50, 0, -1]))
+        >>> graph.compute_nearest_facilities([0, 3], backward=True,
+        ...                                  cost_profile='travel_time_100')
+        NearestFacilities(facility_node_ids=array('i', [0, 3, 3, 3, 3]), distances=array('q', [0, 8, 6, 0, 2]))
+        >>> graph.get_traceback_arc(1), graph.get_traceback_arc(4)
+        (1->2(20), 4->3(20))
+        >>> graph.compute_nearest_facilities([])
+        NearestFacilities(facility_node_ids=array('i', [-1, -1, -1, -1, -1]), distances=array('q', [-1, -1, -1, -1, -1]))
+        """
+
+        workspace = self._get_workspace(workspace)
+        facility_of_nodes = array('i', [-1]) * self._num_nodes
+        if not facility_node_ids:
+            workspace.reset()
+            return NearestFacilities(facility_of_nodes,
+                                     workspace.get_distances())
+        settled_node_ids = array('i')
+        if _stats_sink is not None:
+            self._dijkstra_with_stats(
+                'compute_nearest_facilities', facility_node_ids[0],
+                queue_engine, backward, workspace, cost_profile,
+                facility_node_ids[1:], settled_node_ids)
+        else:
+            self._dijkstra(facility_node_ids[0], (), queue_engine, backward,
+                           workspace, cost_profile,
+                           settled_node_ids=settled_node_ids,
+                           other_start_node_ids=facility_node_ids[1:])
+
+        # Predecessors are settled before their successors.
+        traceback_nodes = workspace.traceback_nodes
+        for node_id in settled_node_ids:
+            if workspace.traceback_arcs[node_id] < 0:
+                facility_of_nodes[node_id] = node_id
+            else:
+                facility_of_nodes[node_id] = \
+                    facility_of_nodes[traceback_nodes[node_id]]
+
+        return NearestFacilities(facility_of_nodes, workspace.get_distances())
+
+    def _dijkstra(self, start_node_id, target_node_ids, queue_engine,
+                  backward=False, workspace=None, cost_profile=None,
+                  max_distance=None, settled_node_ids=None,
+                  other_start_node_ids=()):
+        """
+        Dijkstra's algorithm on the arrays of a search workspace.
+
+        :param start_node_id: identifier of start node
+        :param target_node_ids: the search stops when all these nodes are
+            settled, empty to settle all reachable nodes.
+        :param queue_engine: see compute_shortest_paths().
+        :param backward: search on the reverse arcs.
+        :param workspace: see compute_shortest_paths().
+        :param cost_profile: see compute_shortest_paths().
+        :param max_distance: nodes with a larger distance are not reached,
+            None for no limit.
+        :param settled_node_ids: array or list to append the settled nodes
+            to, in the order of settling.
+        :param other_start_node_ids: further start nodes at distance 0 of
+            a multi-source search.
+        :return: number of settled nodes.
+        """
+
+        workspace = self._get_workspace(workspace)
+        workspace.reset()
+        adjacency = self._get_adjacency(backward)
+        costs = self.get_costs(cost_profile)
+        version = workspace.version
+        stamps = workspace.stamps
+        settled = workspace.settled_stamps
+        node_distances = workspace.distances
+        traceback_arcs = workspace.traceback_arcs
+        traceback_nodes = workspace.traceback_nodes
+
+        # Distance from start node to itself is 0.
+        workspace.set_start(start_node_id)
+        active_nodes = make_priority_queue(queue_engine, self, cost_profile)
+        push = active_nodes.push
+        pop = active_nodes.pop
+        push(0, start_node_id)
+        for other_start_node_id in other_start_node_ids:
+            workspace.set_start(other_start_node_id)
+            push(0, other_start_node_id)
+
+        num_settled = 0
+        remaining_node_ids = set(target_node_ids)
+        if max_distance is None:
+            max_distance = sys.maxsize
+
+        while len(active_nodes):
+            distance, node_id = pop()
+            if settled[node_id] == version:
+                # Node has already been settled.
+                continue
+            # Settle active node.
+            settled[node_id] = version
+            num_settled += 1
+            if settled_node_ids is not None:
+                settled_node_ids.append(node_id)
+            if node_id in remaining_node_ids:
+                remaining_node_ids.remove(node_id)
+                if not remaining_node_ids:
+                    break
+
+            # Update all connected nodes.
+            for offsets, arcs, heads in adjacency:
+                for idx in range(offsets[node_id], offsets[node_id + 1]):
+                    head_node_id = heads[idx]
+                    if settled[head_node_id] == version:
+                        continue
+                    arc_idx = arcs[idx]
+                    new_distance = distance + costs[arc_idx]
+                    if new_distance > max_distance:
+                        continue
+                    # Update tentative distance if the node is reached for
+                    # the first time or a new distance is smaller. Ties are
+                    # broken by the smaller predecessor id, so all queue
+                    # engines compute the same shortest path tree.
+                    if stamps[head_node_id] != version:
+                        stamps[head_node_id] = version
+                    elif not (new_distance < node_distances[head_node_id] or
+                              (new_distance == node_distances[head_node_id]
+                               and node_id < traceback_nodes[head_node_id])):
+                        continue
+                    node_distances[head_node_id] = new_distance
+                    traceback_arcs[head_node_id] = arc_idx
+                    traceback_nodes[head_node_id] = node_id
+                    push(new_distance, head_node_id)
+
+        return num_settled
+
+    def shortest_path(self, source_node_id, target_node_id,
+                      bidirectional=False, queue_engine='heap', astar=False,
+                      lower_bound=None, workspace=None, cost_profile=None):
+        """
+        Compute the shortest path between two nodes.
+        The search stops as soon as the target node is settled. The
+        bidirectional search runs Dijkstra's algorithm from the source
+        node and backwards (on the reverse arcs) from the target node and
+        stops when the two searches meet on a shortest path. The A* search
+        is goal-directed by a great-circle lower bound, see
+        get_heuristic_factor().
+
+        Afterwards the search state of the workspace describes the path,
+        so travel_to() and get_node_distance() can be used for the target
+        node.
+
+        :param source_node_id: identifier of source node
+        :param target_node_id: identifier of target node
+        :param bidirectional: search from both ends.
+        :param queue_engine: see compute_shortest_paths().
+        :param astar: use A* search instead of Dijkstra's algorithm.
+        :param lower_bound: function returning a lower bound of the costs
+            from a node to the target for the A* search, e.g. from
+            landmarks.Landmarks. The bound must be consistent, a negative
+            value marks a node from which the target is unreachable. By
+            default the great-circle lower bound is used.
+        :param workspace: SearchWorkspace for the search state, by default
+            the workspace of the graph.
+        :param cost_profile: name of the arc costs of this search (see
+            get_costs()), by default the current arc costs.
+        :return: ShortestPath with node ids, distance (-1 if the target is
+            unreachable), number of settled nodes and arc indices.
+
+        # Doctest(s):
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.shortest_path(0, 3)
+        ShortestPath(path=[0, 1, 2, 3], distance=100, num_settled=4, arcs=[0, 2, 3])
+        >>> graph.shortest_path(0, 3, bidirectional=True).path
+        [0, 1, 2, 3]
+        >>> travel_to(graph, 3, 100)[0]
+        0.1
+        >>> graph.shortest_path(0, 4, bidirectional=True)
+        ShortestPath(path=[], distance=-1, num_settled=3, arcs=[])
+        >>> graph.shortest_path(0, 3, astar=True).distance
+        100
+        >>> workspace = graph.create_workspace()
+        >>> graph.shortest_path(4, 1, workspace=workspace).path
+        [4, 3, 1]
+        >>> travel_to(graph, 1, 100, workspace)[0], travel_to(graph, 3, 100)[0]
+        (0.06, 0.1)
+        >>> graph.shortest_path(0, 3, cost_profile='travel_time_100').distance
+        12
+        """
+
+        workspace = self._get_workspace(workspace)
+        if bidirectional and astar:
+            raise Exception('A* search is not available bidirectionally')
+        if astar:
+            num_settled = self._astar(source_node_id, target_node_id,
+                                      queue_engine, lower_bound, workspace,
+                                      cost_profile)
+        elif not bidirectional or source_node_id == target_node_id:
+            num_settled = self._dijkstra(source_node_id, (target_node_id,),
+                                         queue_engine, workspace=workspace,
+                                         cost_profile=cost_profile)
+        else:
+            num_settled = self._bidirectional_dijkstra(
+                source_node_id, target_node_id, queue_engine, workspace,
+                cost_profile)
+
+        distance = workspace.get_distance(target_node_id)
+        if distance < 0:
+            return ShortestPath([], -1, num_settled, [])
+        # Follow the traceback arcs from target to source.
+        path = [target_node_id]
+        arcs = []
+        arc_idx, node_id = workspace.get_traceback(target_node_id)
+        while arc_idx >= 0:
+            arcs.append(arc_idx)
+            path.append(node_id)
+            arc_idx, node_id = workspace.get_traceback(node_id)
+        path.reverse()
+        arcs.reverse()
+
+        return ShortestPath(path, distance, num_settled, arcs)
+
+    def set_search_path(self, source_node_id, arcs, workspace=None,
+                        cost_profile=None):
+        """
+        Write a path computed outside of the graph (e.g. by a contraction
+        hierarchy) into the search state, so travel_to() and
+        get_node_distance() can be used for the nodes of the path.
+
+        :param source_node_id: first node of the path.
+        :param arcs: arc indices of the path.
+        :param workspace: SearchWorkspace for the search state, by default
+            the workspace of the graph.
+        :param cost_profile: name of the arc costs of the path (see
+            get_costs()), by default the current arc costs.
+        :return: list of node ids of the path.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.set_search_path(0, [0, 2, 3])
+        [0, 1, 2, 3]
+        >>> graph.get_node_distance(3), graph.get_traceback_arc(3)
+        (100, 2->3(50))
+        """
+
+        workspace = self._get_workspace(workspace)
+        workspace.reset()
+        workspace.set_start(source_node_id)
+        costs = self.get_costs(cost_profile)
+        distance = 0
+        path = [source_node_id]
+        for arc_idx in arcs:
+            head_node_id = self._heads[arc_idx]
+            if head_node_id == path[-1] and not self._directed:
+                # Arc traversed from head to tail.
+                head_node_id = self.get_arc_tail(arc_idx)
+            distance += costs[arc_idx]
+            workspace.set_node(head_node_id, distance, arc_idx, path[-1])
+            path.append(head_node_id)
+
+        return path
+
+    def _astar(self, source_node_id, target_node_id, queue_engine,
+               lower_bound=None, workspace=None, cost_profile=None):
+        """
+        A* search on the arrays of a search workspace. The great-circle
+        heuristic is rounded down to whole cost units, so it stays
+        consistent and the keys are integers that are popped in
+        non-decreasing order.
+
+        :param lower_bound: see shortest_path().
+        :param workspace: see shortest_path().
+        :param cost_profile: see shortest_path().
+        :return: number of settled nodes.
+        """
+
+        workspace = self._get_workspace(workspace)
+        workspace.reset()
+        adjacency = self._get_adjacency()
+        costs = self.get_costs(cost_profile)
+        latitudes = self._latitudes
+        longitudes = self._longitudes
+        version = workspace.version
+        stamps = workspace.stamps
+        settled = workspace.settled_stamps
+        node_distances = workspace.distances
+        traceback_arcs = workspace.traceback_arcs
+        traceback_nodes = workspace.traceback_nodes
+        if lower_bound is None:
+            factor = self.get_heuristic_factor(cost_profile)
+            target_latitude = latitudes[target_node_id]
+            target_longitude = longitudes[target_node_id]
+
+            def lower_bound(node_id):
+                return int(factor * great_circle_distance(
+                    latitudes[node_id], longitudes[node_id],
+                    target_latitude, target_longitude))
+        # Lower bound of each touched node, computed once per node.
+        lower_bounds = {}
+
+        active_nodes = make_priority_queue(queue_engine, self, cost_profile)
+        push = active_nodes.push
+        pop = active_nodes.pop
+        workspace.set_start(source_node_id)
+        source_lower_bound = lower_bound(source_node_id)
+        if source_lower_bound >= 0:
+            push(source_lower_bound, source_node_id)
+        num_settled = 0
+
+        while len(active_nodes):
+            node_id = pop()[1]
+            if settled[node_id] == version:
+                continue
+            settled[node_id] = version
+            num_settled += 1
+            if node_id == target_node_id:
+                break
+            distance = node_distances[node_id]
+
+            for offsets, arcs, heads in adjacency:
+                for idx in range(offsets[node_id], offsets[node_id + 1]):
+                    head_node_id = heads[idx]
+                    if settled[head_node_id] == version:
+                        continue
+                    arc_idx = arcs[idx]
+                    new_distance = distance + costs[arc_idx]
+                    if stamps[head_node_id] != version:
+                        stamps[head_node_id] = version
+                    elif not (new_distance < node_distances[head_node_id] or
+                              (new_distance == node_distances[head_node_id]
+                               and node_id < traceback_nodes[head_node_id])):
+                        continue
+                    node_distances[head_node_id] = new_distance
+                    traceback_arcs[head_node_id] = arc_idx
+                    traceback_nodes[head_node_id] = node_id
+                    head_lower_bound = lower_bounds.get(head_node_id)
+                    if head_lower_bound is None:
+                        head_lower_bound = lower_bound(head_node_id)
+                        lower_bounds[head_node_id] = head_lower_bound
+                    if head_lower_bound >= 0:
+                        push(new_distance + head_lower_bound, head_node_id)
+
+        return num_settled
+
+    def get_heuristic_factor(self, cost_profile=None):
+        """
+        Factor that turns the great-circle distance [m] between two nodes
+        into a lower bound of the costs of any path between them.
+
+        The factor is the smallest ratio of arc costs to great-circle
+        length over all arcs. Hence the bound never overestimates, also
+        if distances in the file are shorter than the great-circle
+        distance. For travel times this is about 3.6 / max. speed [km/h];
+        arcs whose travel time was rounded down lower the factor further.
+
+        :param cost_profile: see get_costs().
+        :return: factor [cost units per m].
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.get_heuristic_factor() > 0
+        True
+        """
+
+        if cost_profile is None:
+            cost_profile = self._cost_profile
+        heuristic_factor = self._heuristic_factors.get(cost_profile)
+        if heuristic_factor is None:
+            if self._arc_lengths is None:
+                # Great-circle length of each arc, independent of costs.
+                latitudes = self._latitudes
+                longitudes = self._longitudes
+                heads = self._heads
+                arc_lengths = array('d', bytes(8 * len(heads)))
+                for node_id in range(self._num_nodes):
+                    for arc_idx in range(self._offsets[node_id],
+                                         self._offsets[node_id + 1]):
+                        arc_lengths[arc_idx] = great_circle_distance(
+                            latitudes[node_id], longitudes[node_id],
+                            latitudes[heads[arc_idx]],
+                            longitudes[heads[arc_idx]])
+                self._arc_lengths = arc_lengths
+            heuristic_factor = min(
+                (cost / length for cost, length
+                 in zip(self.get_costs(cost_profile), self._arc_lengths)
+                 if length > 0),
+                default=0.0)
+            self._heuristic_factors[cost_profile] = heuristic_factor
+        return heuristic_factor
+
+    def compare_search_effort(self, source_node_id, target_node_id):
+        """
+        Run a point-to-point query with each search method.
+
+        :return: dict with the number of settled nodes per method.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compare_search_effort(0, 3)
+        {'dijkstra': 4, 'bidirectional': 5, 'astar': 4}
+        """
+
+        return {
+            'dijkstra': self.shortest_path(source_node_id,
+                                           target_node_id).num_settled,
+            'bidirectional': self.shortest_path(
+                source_node_id, target_node_id,
+                bidirectional=True).num_settled,
+            'astar': self.shortest_path(source_node_id, target_node_id,
+                                        astar=True).num_settled,
+        }
+
+    def _bidirectional_dijkstra(self, source_node_id, target_node_id,
+                                queue_engine, workspace=None,
+                                cost_profile=None):
+        """
+        Bidirectional Dijkstra's algorithm. The forward search uses the
+        given workspace, the backward search its backward workspace. At the
+        end, the backward part of the shortest path is copied into the
+        forward search state.
+
+        :param workspace: see shortest_path().
+        :param cost_profile: see shortest_path().
+        :return: number of settled nodes.
+        """
+
+        workspace = self._get_workspace(workspace)
+        backward_workspace = workspace.get_backward_workspace()
+        workspace.reset()
+        backward_workspace.reset()
+        costs = self.get_costs(cost_profile)
+        # Search state of the forward (0) and backward (1) search.
+        workspaces = (workspace, backward_workspace)
+        versions = (workspace.version, backward_workspace.version)
+        stamps = (workspace.stamps, backward_workspace.stamps)
+        settled = (workspace.settled_stamps,
+                   backward_workspace.settled_stamps)
+        node_distances = (workspace.distances, backward_workspace.distances)
+        traceback_arcs = (workspace.traceback_arcs,
+                          backward_workspace.traceback_arcs)
+        traceback_nodes = (workspace.traceback_nodes,
+                           backward_workspace.traceback_nodes)
+        # Arcs of the forward and the backward search, see _get_adjacency().
+        adjacency = (self._get_adjacency(), self._get_adjacency(True))
+        active_nodes = (make_priority_queue(queue_engine, self, cost_profile),
+                        make_priority_queue(queue_engine, self, cost_profile))
+        # Last popped key of each search, a lower bound of its queue.
+        last_keys = [0, 0]
+
+        workspace.set_start(source_node_id)
+        backward_workspace.set_start(target_node_id)
+        active_nodes[0].push(0, source_node_id)
+        active_nodes[1].push(0, target_node_id)
+        # Length of the shortest path found so far and its meeting node.
+        best_distance = -1
+        meeting_node_id = -1
+        num_settled = 0
+
+        while len(active_nodes[0]) and len(active_nodes[1]):
+            # Continue the search with the smaller radius.
+            direction = 0 if last_keys[0] <= last_keys[1] else 1
+            distance, node_id = active_nodes[direction].pop()
+            version = versions[direction]
+            node_settled = settled[direction]
+            if node_settled[node_id] == version:
+                continue
+            last_keys[direction] = distance
+            # No shorter path through unsettled nodes.
+            if (best_distance >= 0 and
+                    distance + last_keys[1 - direction] >= best_distance):
+                break
+            node_settled[node_id] = version
+            num_settled += 1
+
+            node_stamps = stamps[direction]
+            distances = node_distances[direction]
+            node_traceback_nodes = traceback_nodes[direction]
+            other_version = versions[1 - direction]
+            other_stamps = stamps[1 - direction]
+            other_distances = node_distances[1 - direction]
+            push = active_nodes[direction].push
+            for node_offsets, node_arcs, node_heads in adjacency[direction]:
+                for idx in range(node_offsets[node_id],
+                                 node_offsets[node_id + 1]):
+                    arc_idx = node_arcs[idx]
+                    head_node_id = node_heads[idx]
+                    if node_settled[head_node_id] == version:
+                        continue
+                    new_distance = distance + costs[arc_idx]
+                    if node_stamps[head_node_id] != version:
+                        node_stamps[head_node_id] = version
+                        update = True
+                    else:
+                        old_distance = distances[head_node_id]
+                        update = (new_distance < old_distance or
+                                  (new_distance == old_distance and
+                                   node_id <
+                                   node_traceback_nodes[head_node_id]))
+                    if update:
+                        distances[head_node_id] = new_distance
+                        traceback_arcs[direction][head_node_id] = arc_idx
+                        node_traceback_nodes[head_node_id] = node_id
+                        push(new_distance, head_node_id)
+                    # Path via head node reached by the other search.
+                    if other_stamps[head_node_id] == other_version:
+                        path_distance = (distances[head_node_id] +
+                                         other_distances[head_node_id])
+                        if best_distance < 0 or path_distance < best_distance:
+                            best_distance = path_distance
+                            meeting_node_id = head_node_id
+
+        # Copy the backward path from the meeting node to the target into
+        # the forward search state.
+        node_id = meeting_node_id
+        while node_id >= 0 and node_id != target_node_id:
+            arc_idx, next_node_id = backward_workspace.get_traceback(node_id)
+            workspace.set_node(next_node_id,
+                               workspace.get_distance(node_id) +
+                               costs[arc_idx], arc_idx, node_id)
+            node_id = next_node_id
+
+        return num_settled
+
+    def _get_adjacency(self, backward=False):
+        """
+        Arc arrays a search traverses: the arcs (forward) and/or the
+        reverse arcs (backward and undirected) of each node. An arc of an
+        undirected graph is stored once and found at both end nodes.
+
+        :param backward: traverse the arcs from head to tail.
+        :return: tuple of (offsets, arc indices, neighbour node ids)
+            tuples; the entries of node v are at the positions offsets[v]
+            .. offsets[v + 1] - 1 of the arc indices and neighbours.
+        """
+
+        adjacency = ()
+        if not backward or not self._directed:
+            adjacency += ((self._offsets, range(len(self._heads)),
+                           self._heads),)
+        if backward or not self._directed:
+            self._build_reverse_index()
+            adjacency += ((self._reverse_offsets, self._reverse_arcs,
+                           self._reverse_tails),)
+
+        return adjacency
+
+    def _build_reverse_index(self):
+        """
+        Build the reverse arcs of all nodes (once): for node v the arcs
+        with head v are stored as arc index and tail node at the positions
+        _reverse_offsets[v] to _reverse_offsets[v + 1] - 1. The arc data
+        itself is not copied.
+
+        :return: None
+        """
+
+        if self._reverse_offsets is not None:
+            return None
+
+        num_nodes = self._num_nodes
+        offsets = self._offsets
+        heads = self._heads
+        # Count reverse arcs per head node.
+        counts = collections.Counter(heads)
+        reverse_offsets = array('q', itertools.accumulate(
+            map(counts.get, range(num_nodes), itertools.repeat(0)),
+            initial=0))
+        positions = array('q', reverse_offsets[:-1])
+        reverse_arcs = array('i', bytes(4 * len(heads)))
+        reverse_tails = array('i', bytes(4 * len(heads)))
+        for tail_node_id in range(num_nodes):
+            for arc_idx in range(offsets[tail_node_id],
+                                 offsets[tail_node_id + 1]):
+                head_node_id = heads[arc_idx]
+                pos = positions[head_node_id]
+                positions[head_node_id] = pos + 1
+                reverse_arcs[pos] = arc_idx
+                reverse_tails[pos] = tail_node_id
+
+        self._reverse_arcs = reverse_arcs
+        self._reverse_tails = reverse_tails
+        self._reverse_offsets = reverse_offsets
+
+        return None
+
+    def get_max_arc_cost(self, cost_profile=None):
+        """
+        :param cost_profile: see get_costs().
+        :return: largest arc cost, needed by bucket based priority queues.
+        """
+        if cost_profile is None:
+            cost_profile = self._cost_profile
+        max_arc_cost = self._max_arc_costs.get(cost_profile)
+        if max_arc_cost is None:
+            max_arc_cost = max(self.get_costs(cost_profile), default=0)
+            self._max_arc_costs[cost_profile] = max_arc_cost
+        return max_arc_cost
+
+    def get_node_distance(self, node_id, workspace=None):
+        """
+        :return: distance of a node computed by the last search, -1 if
+            the node was not reached.
+        """
+        return self._get_workspace(workspace).get_distance(node_id)
+
+    def get_node_distances(self, workspace=None):
+        """
+        :return: array (copy) with the distance of each node computed by
+            the last search, -1 for unreached nodes.
+        """
+        return self._get_workspace(workspace).get_distances()
+
+    def get_traceback_arc(self, node_id, workspace=None):
+        """
+        :return: arc on which a node was reached by the last search, None
+            for the start node and for unreached nodes. Arcs traversed
+            from head to tail (backward searches and undirected graphs)
+            are returned as stored.
+
+        >>> graph = CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> graph.compute_shortest_paths(0)
+        >>> graph.get_traceback_arc(2), graph.get_traceback_arc(0)
+        (1->2(20), None)
+        >>> graph.compute_shortest_paths(3, backward=True)
+        >>> graph.get_traceback_arc(0), graph.get_traceback_arc(2)
+        (0->1(30), 2->3(50))
+        """
+        arc_idx = self._get_workspace(workspace).get_traceback(node_id)[0]
+        if arc_idx < 0:
+            return None
+        arc = Arc(self.get_arc_tail(arc_idx), self._heads[arc_idx],
+                  self._distances[arc_idx], self._max_speeds[arc_idx])
+        arc.costs = self._costs[arc_idx]
+
+        return arc
+
+    def create_workspace(self):
+        """
+        :return: new SearchWorkspace for queries on this graph.
+        """
+        return SearchWorkspace(self._num_nodes)
+
+    def _get_workspace(self, workspace=None):
+        """
+        :return: the given workspace, or the workspace of the graph if it
+            is None.
+        """
+        if workspace is not None:
+            return workspace
+        if (self._workspace is None or
+                self._workspace.get_num_nodes() != self._num_nodes):
+            self._workspace = self.create_workspace()
+        return self._workspace
+
+    def reset_search_state(self):
+        """ Reset the search state of the graph's workspace. """
+        self._get_workspace().reset()
+
+    def __repr__(self):
+        """
+        Define object's string representation.
+
+        :return: object represented as string.
+        """
+
+        arc_strs = []
+        for node_id in range(self._num_nodes):
+            for arc_idx in range(self._offsets[node_id],
+                                 self._offsets[node_id + 1]):
+                arc_strs.append('{0}->{1}({2})'.format(
+                    node_id, self._heads[arc_idx], self._costs[arc_idx]))
+
+        return '[' + ', '.join(arc_strs) + ']'
+
+
+# Result of a point-to-point query: node ids of the path, its distance,
+# number of settled nodes and arc indices of the path.
+ShortestPath = collections.namedtuple(
+    'ShortestPath', ['path', 'distance', 'num_settled', 'arcs'])
+
+# Result of an isochrone query: cost budget, ids of the nodes reachable
+# within it and their costs, in order of increasing cost.
+Isochrone = collections.namedtuple('Isochrone', ['budget', 'node_ids', 'costs'])
+
+# Result of a nearest facility query: node id of the nearest facility of
+# each node and the distance to it, -1 for unreached nodes.
+NearestFacilities = collections.namedtuple(
+    'NearestFacilities', ['facility_node_ids', 'distances'])
+
+
+class MemoryStatsSink:
+    """
+    Stats sink (see set_stats_sink()) that keeps all records in a list.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, stats):
+        self.records.append(stats)
+
+
+class JsonLinesStatsSink:
+    """
+    Stats sink (see set_stats_sink()) that writes each record as one line
+    of JSON.
+
+    >>> import io
+    >>> stream = io.StringIO()
+    >>> sink = JsonLinesStatsSink(stream)
+    >>> sink.record({'operation': 'load', 'phases': {'map': 0.5}})
+    >>> stream.getvalue()
+    '{"operation": "load", "phases": {"map": 0.5}}\\n'
+    """
+
+    def __init__(self, file):
+        """
+        :param file: path of a file the records are appended to, or a text
+            file object.
+        """
+        if isinstance(file, str):
+            self._file = open(file, 'a')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+
+    def record(self, stats):
+        self._file.write(json.dumps(stats) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """ Close the file if it was opened by this sink. """
+        if self._owns_file:
+            self._file.close()
+
+
+class SearchWorkspace:
+    """
+    Search state of the queries on a graph: tentative distance, traceback
+    arc and predecessor of each node.
+
+    The entries of a node are only valid while its stamp equals the
+    version of the workspace, so reset() just increments the version
+    instead of clearing the arrays: a query costs time proportional to the
+    nodes it touches, not to the size of the graph. The searches only read
+    the graph, so any number of workspaces can share one graph, e.g. one
+    workspace per thread.
+
+    The arc indices are positions in the arc arrays of a CSRGraph resp.
+    positions in the adjacency list of the predecessor of a Graph.
+
+    >>> workspace = SearchWorkspace(3)
+    >>> workspace.set_start(2)
+    >>> workspace.set_node(0, 15, 4, 2)
+    >>> workspace.get_distances(), workspace.get_traceback(0)
+    (array('q', [15, -1, 0]), (4, 2))
+    >>> workspace.reset()
+    >>> workspace.get_distance(0), workspace.get_traceback(0)
+    (-1, (-1, -1))
+    """
+
+    # Largest version before the stamps are cleared.
+    MAX_VERSION = 2 ** 32 - 1
+
+    def __init__(self, num_nodes):
+        self._num_nodes = num_nodes
+        # Current version; a node is touched by the current search if its
+        # stamp equals the version, and settled if its settled stamp does.
+        self.version = 1
+        self.stamps = array('I', bytes(4 * num_nodes))
+        self.settled_stamps = array('I', bytes(4 * num_nodes))
+        # Entries of the touched nodes.
+        self.distances = array('q', bytes(8 * num_nodes))
+        self.traceback_arcs = array('q', bytes(8 * num_nodes))
+        self.traceback_nodes = array('i', bytes(4 * num_nodes))
+        # Workspace of the backward search of a bidirectional search,
+        # created on demand by get_backward_workspace().
+        self._backward_workspace = None
+
+    def reset(self):
+        """ Invalidate the search state of all nodes. """
+        if self.version == self.MAX_VERSION:
+            # Clear the stamps, which happens once every 2^32 searches.
+            self.stamps = array('I', bytes(4 * self._num_nodes))
+            self.settled_stamps = array('I', bytes(4 * self._num_nodes))
+            self.version = 0
+        self.version += 1
+
+    def set_start(self, node_id):
+        """ Touch the start node of a search with distance 0. """
+        self.set_node(node_id, 0, -1, -1)
+
+    def set_node(self, node_id, distance, arc_idx, tail_node_id):
+        """ Set the distance and traceback arc of a node. """
+        self.stamps[node_id] = self.version
+        self.distances[node_id] = distance
+        self.traceback_arcs[node_id] = arc_idx
+        self.traceback_nodes[node_id] = tail_node_id
+
+    def get_num_nodes(self):
+        """
+        :return: number of nodes of the graph of the workspace.
+        """
+        return self._num_nodes
+
+    def get_distance(self, node_id):
+        """
+        :return: distance of a node computed by the last search, -1 if
+            the node was not reached.
+        """
+        if self.stamps[node_id] != self.version:
+            return -1
+        return self.distances[node_id]
+
+    def get_distances(self):
+        """
+        :return: array with the distance of each node, -1 for unreached
+            nodes.
+        """
+        version = self.version
+        return array('q', [distance if stamp == version else -1
+                           for distance, stamp
+                           in zip(self.distances, self.stamps)])
+
+    def get_traceback(self, node_id):
+        """
+        :return: (arc index, predecessor) tuple of the arc on which a node
+            was reached, (-1, -1) for the start node and unreached nodes.
+        """
+        if self.stamps[node_id] != self.version:
+            return (-1, -1)
+        return (self.traceback_arcs[node_id], self.traceback_nodes[node_id])
+
+    def get_traceback_nodes(self):
+        """
+        :return: array with the predecessor of each node, -1 for the start
+            node and unreached nodes.
+        """
+        version = self.version
+        return array('i', [tail_node_id if stamp == version else -1
+                           for tail_node_id, stamp
+                           in zip(self.traceback_nodes, self.stamps)])
+
+    def is_settled(self, node_id):
+        """
+        :return: True if the last search has settled a node.
+        """
+        return self.settled_stamps[node_id] == self.version
+
+    def get_backward_workspace(self):
+        """
+        :return: second workspace of the same size for the backward search
+            of a bidirectional search.
+        """
+        if self._backward_workspace is None:
+            self._backward_workspace = SearchWorkspace(self._num_nodes)
+        return self._backward_workspace
+
+
+class ShortestPathTree:
+    """
+    Completed shortest path tree of a search from all nodes of a graph,
+    stored as compact arrays: distance, traceback arc and predecessor of
+    each node (-1 for unreached nodes).
+
+    A tree can be passed wherever a search workspace is only read, e.g. as
+    workspace of get_node_distance(), get_traceback_arc() and travel_to(),
+    which then follow the tree in time proportional to the path length.
+    """
+
+    def __init__(self, source_node_id, cost_profile, backward, distances,
+                 traceback_arcs, traceback_nodes, cost_version=0):
+        self.source_node_id = source_node_id
+        self.cost_profile = cost_profile
+        self.backward = backward
+        # CSRGraph.get_cost_version() of the costs of the tree.
+        self.cost_version = cost_version
+        self._distances = distances
+        self._traceback_arcs = traceback_arcs
+        self._traceback_nodes = traceback_nodes
+
+    @classmethod
+    def from_workspace(cls, workspace, source_node_id, cost_profile,
+                       backward=False, cost_version=0):
+        """
+        Copy the search state of a completed search out of a workspace.
+
+        :param workspace: SearchWorkspace of the search.
+        :param source_node_id: start node of the search.
+        :param cost_profile: name of the arc costs of the search.
+        :param backward: True for a search on the reverse arcs.
+        :param cost_version: see CSRGraph.get_cost_version().
+        :return: ShortestPathTree.
+        """
+
+        version = workspace.version
+        stamps = workspace.stamps
+        traceback_arcs = array('q', [arc_idx if stamp == version else -1
+                                     for arc_idx, stamp
+                                     in zip(workspace.traceback_arcs,
+                                            stamps)])
+
+        return cls(source_node_id, cost_profile, backward,
+                   workspace.get_distances(), traceback_arcs,
+                   workspace.get_traceback_nodes(), cost_version)
+
+    def get_num_bytes(self):
+        """
+        :return: size of the arrays of the tree [bytes].
+        """
+        return sum(values.itemsize * len(values)
+                   for values in (self._distances, self._traceback_arcs,
+                                  self._traceback_nodes))
+
+    def get_num_nodes(self):
+        """
+        :return: number of nodes of the graph of the tree.
+        """
+        return len(self._distances)
+
+    def get_distance(self, node_id):
+        """
+        :return: distance between the source node and a node, -1 if the
+            node is not reachable.
+        """
+        return self._distances[node_id]
+
+    def get_distances(self):
+        """
+        :return: array (copy) with the distance of each node, -1 for
+            unreachable nodes.
+        """
+        return array('q', self._distances)
+
+    def get_traceback(self, node_id):
+        """
+        :return: (arc index, predecessor) tuple of the arc on which a node
+            was reached, (-1, -1) for the source node and unreachable
+            nodes.
+        """
+        arc_idx = self._traceback_arcs[node_id]
+        if arc_idx < 0:
+            return (-1, -1)
+        return (arc_idx, self._traceback_nodes[node_id])
+
+    def get_traceback_nodes(self):
+        """
+        :return: array (copy) with the predecessor of each node, -1 for the
+            source node and unreachable nodes.
+        """
+        return array('i', self._traceback_nodes)
+
+    def is_settled(self, node_id):
+        """
+        :return: True if a node is reachable.
+        """
+        return self._distances[node_id] >= 0
+
+    def get_path(self, node_id):
+        """
+        Extract the shortest path between the source node and a node, in
+        time proportional to its length.
+
+        :param node_id: target node (the start node for backward trees).
+        :return: ShortestPath from the source node to the node (from the
+            node to the source node for backward trees); no node is settled.
+        """
+
+        distance = self._distances[node_id]
+        if distance < 0:
+            return ShortestPath([], -1, 0, [])
+        path = [node_id]
+        arcs = []
+        arc_idx, node_id = self.get_traceback(node_id)
+        while arc_idx >= 0:
+            arcs.append(arc_idx)
+            path.append(node_id)
+            arc_idx, node_id = self.get_traceback(node_id)
+        if not self.backward:
+            path.reverse()
+            arcs.reverse()
+
+        return ShortestPath(path, distance, 0, arcs)
+
+    def is_unchanged_by(self, arc_indices, tails, heads, old_costs,
+                        new_costs):
+        """
+        Check whether a search on the changed arc costs computes the same
+        tree: no tree arc changes its cost, and no other arc gives a
+        shorter path (or an equally short one that the search prefers).
+
+        :param arc_indices: positions of the changed arcs.
+        :param tails: tail node id of each arc.
+        :param heads: head node id of each arc.
+        :param old_costs: costs of the arcs in the tree.
+        :param new_costs: changed costs of the arcs.
+        :return: True if the tree is still the shortest path tree.
+        """
+
+        distances = self._distances
+        traceback_arcs = self._traceback_arcs
+        traceback_nodes = self._traceback_nodes
+        for arc_idx, tail_node_id, head_node_id, old_cost, new_cost in zip(
+                arc_indices, tails, heads, old_costs, new_costs):
+            if new_cost == old_cost:
+                continue
+            if self.backward:
+                # Backward searches traverse the arc from head to tail.
+                tail_node_id, head_node_id = head_node_id, tail_node_id
+            if traceback_arcs[head_node_id] == arc_idx:
+                return False
+            tail_distance = distances[tail_node_id]
+            if tail_distance < 0:
+                continue
+            new_distance = tail_distance + new_cost
+            head_distance = distances[head_node_id]
+            if (head_distance < 0 or new_distance < head_distance or
+                    (new_distance == head_distance and
+                     (tail_node_id, arc_idx) <
+                     (traceback_nodes[head_node_id],
+                      traceback_arcs[head_node_id]))):
+                return False
+
+        return True
+
+
+class ShortestPathTreeCache:
+    """
+    Cache of the shortest path trees of a graph, keyed by source node,
+    cost profile and search direction. Skewed traffic, where a few sources
+    (e.g. depots) account for most queries, computes the tree of a source
+    once and extracts all later paths from it. The least recently used
+    trees are evicted when the trees exceed a memory budget.
+
+    Like a SearchWorkspace, a cache must not be shared between threads.
+    Arc cost changes made by update_arc_costs() keep the trees they do not
+    affect; trees of a cost profile changed directly on the graph are
+    recomputed.
+
+    >>> graph = CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> cache = ShortestPathTreeCache(graph, max_bytes=200)
+    >>> cache.shortest_path(0, 3)
+    ShortestPath(path=[0, 1, 2, 3], distance=100, num_settled=0, arcs=[0, 2, 3])
+    >>> travel_to(graph, 2, 100, cache.get_tree(0))[0]
+    0.05
+    >>> cache.shortest_path(0, 3, backward=True).path
+    [0, 1, 2, 3]
+    >>> travel_to(graph, 0, 100, cache.get_tree(3, backward=True))[0]
+    0.1
+    >>> cache.shortest_path(0, 3, 'travel_time_100').distance
+    12
+    >>> len(cache), cache.get_num_bytes(), cache.hits, cache.misses
+    (2, 200, 2, 3)
+    >>> cache.evictions
+    1
+    >>> cache.update_arc_costs(iter([graph.find_arc(3, 1)]), iter([10]))
+    >>> len(cache), cache.invalidations
+    (2, 0)
+    >>> cache.update_arc_costs([graph.find_arc(1, 2)], [200])
+    >>> len(cache), cache.invalidations
+    (1, 1)
+    >>> cache.shortest_path(0, 3)
+    ShortestPath(path=[0, 2, 3], distance=120, num_settled=0, arcs=[1, 3])
+    >>> cache.update_arc_costs([graph.find_arc(0, 3)], [1])
+    Traceback (most recent call last):
+        ...
+    Exception: Arc index out of range
+    >>> len(cache), cache.invalidations
+    (2, 1)
+    """
+
+    def __init__(self, graph, max_bytes=SHORTEST_PATH_TREE_CACHE_BYTES,
+                 queue_engine='heap'):
+        """
+        :param graph: CSRGraph.
+        :param max_bytes: memory budget of the cached trees [bytes], see
+            ShortestPathTree.get_num_bytes().
+        :param queue_engine: see CSRGraph.compute_shortest_paths().
+        """
+        self._graph = graph
+        self._max_bytes = max_bytes
+        self._queue_engine = queue_engine
+        self._workspace = graph.create_workspace()
+        # Trees by (source node id, cost profile, backward), least
+        # recently used first.
+        self._trees = collections.OrderedDict()
+        self._num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Number of trees dropped because the arc costs changed.
+        self.invalidations = 0
+
+    def get_tree(self, source_node_id, cost_profile=None, backward=False):
+        """
+        Shortest path tree of a source node, computed on a cache miss.
+
+        :param source_node_id: identifier of source node
+        :param cost_profile: see CSRGraph.compute_shortest_paths().
+        :param backward: tree of the shortest paths to the source node.
+        :return: ShortestPathTree.
+        """
+
+        if cost_profile is None:
+            cost_profile = self._graph.get_cost_profile()
+        cost_version = self._graph.get_cost_version(cost_profile)
+        key = (source_node_id, cost_profile, backward)
+        tree = self._trees.get(key)
+        if tree is not None and tree.cost_version != cost_version:
+            # The costs were changed directly on the graph.
+            self._remove(key)
+            self.invalidations += 1
+            tree = None
+        if tree is not None:
+            self._trees.move_to_end(key)
+            self.hits += 1
+            return tree
+
+        self.misses += 1
+        self._graph.compute_shortest_paths(
+            source_node_id, self._queue_engine, backward, self._workspace,
+            cost_profile)
+        tree = ShortestPathTree.from_workspace(
+            self._workspace, source_node_id, cost_profile, backward,
+            cost_version)
+        num_bytes = tree.get_num_bytes()
+        if num_bytes > self._max_bytes:
+            # The tree alone exceeds the memory budget.
+            return tree
+        while self._num_bytes + num_bytes > self._max_bytes:
+            self._remove(next(iter(self._trees)))
+            self.evictions += 1
+        self._trees[key] = tree
+        self._num_bytes += num_bytes
+
+        return tree
+
+    def shortest_path(self, source_node_id, target_node_id,
+                      cost_profile=None, backward=False):
+        """
+        Shortest path between two nodes from the tree of the source node.
+
+        :param source_node_id: identifier of source node
+        :param target_node_id: identifier of target node
+        :param cost_profile: see CSRGraph.compute_shortest_paths().
+        :param backward: use the backward tree of the target node instead,
+            e.g. for many queries to the same target.
+        :return: ShortestPath, see ShortestPathTree.get_path().
+        """
+        if backward:
+            return self.get_tree(target_node_id, cost_profile,
+                                 True).get_path(source_node_id)
+        return self.get_tree(source_node_id, cost_profile).get_path(
+            target_node_id)
+
+    def update_arc_costs(self, arc_indices, costs):
+        """
+        Change arc costs of the current cost profile of the graph (see
+        CSRGraph.update_arc_costs()) and repair the cache: the trees of
+        the cost profile that the changes do not affect are kept, the
+        others are dropped.
+
+        :param arc_indices: positions of the arcs in the arc arrays.
+        :param costs: new cost of each arc.
+        :return: None
+        """
+
+        arc_indices = list(arc_indices)
+        costs = list(costs)
+        graph = self._graph
+        cost_profile = graph.get_cost_profile()
+        old_version = graph.get_cost_version()
+        current_costs = graph.get_costs()
+        old_costs = [current_costs[arc_idx] for arc_idx in arc_indices]
+        graph.update_arc_costs(arc_indices, costs)
+        new_version = graph.get_cost_version()
+        tails = [graph.get_arc_tail(arc_idx) for arc_idx in arc_indices]
+        heads = [graph.get_arc_head(arc_idx) for arc_idx in arc_indices]
+        # An arc of an undirected graph is traversed in both directions.
+        directions = [(tails, heads)]
+        if not graph.is_directed():
+            directions.append((heads, tails))
+
+        for key, tree in list(self._trees.items()):
+            if tree.cost_profile != cost_profile:
+                continue
+            if (tree.cost_version == old_version and
+                    all(tree.is_unchanged_by(arc_indices, arc_tails,
+                                             arc_heads, old_costs, costs)
+                        for arc_tails, arc_heads in directions)):
+                tree.cost_version = new_version
+                continue
+            self._remove(key)
+            self.invalidations += 1
+
+        return None
+
+    def _remove(self, key):
+        """ Remove a tree from the cache. """
+        self._num_bytes -= self._trees.pop(key).get_num_bytes()
+
+    def get_num_bytes(self):
+        """
+        :return: size of the cached trees [bytes].
+        """
+        return self._num_bytes
+
+    def clear(self):
+        """ Evict all trees. """
+        self._trees.clear()
+        self._num_bytes = 0
+
+    def __len__(self):
+        return len(self._trees)
+
+
+class HeapQueue:
+    """
+    Priority queue of (key, node_id) tuples based on heapq.
+
+    There is no decrease-key operation: a node is pushed again whenever its
+    key decreases and the outdated entries are skipped by the caller
+    (lazy deletion).
+    """
+
+    def __init__(self, max_arc_cost=None):
+        self._heap = []
+        # Number of push and pop operations.
+        self.num_pushes = 0
+        self.num_pops = 0
+
+    def push(self, key, node_id):
+        self.num_pushes += 1
+        heapq.heappush(self._heap, (key, node_id))
+
+    def pop(self):
+        """ :return: (key, node_id) tuple with the smallest key. """
+        self.num_pops += 1
+        return heapq.heappop(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class LockingHeapQueue(HeapQueue):
+    """
+    Priority queue based on queue.PriorityQueue, i.e. with a lock on every
+    operation. Only kept for comparison with the other engines.
+    """
+
+    def __init__(self, max_arc_cost=None):
+        HeapQueue.__init__(self, max_arc_cost)
+        self._queue = queue.PriorityQueue()
+
+    def push(self, key, node_id):
+        self.num_pushes += 1
+        self._queue.put((key, node_id))
+
+    def pop(self):
+        """ :return: (key, node_id) tuple with the smallest key. """
+        self.num_pops += 1
+        return self._queue.get()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+class IndexedHeapQueue:
+    """
+    Binary heap with decrease-key. The heap position of each node is
+    stored, so each node is in the heap at most once and no outdated
+    entries are popped.
+    """
+
+    def __init__(self, max_arc_cost=None):
+        self._keys = []
+        self._node_ids = []
+        # Heap position of each node in the heap.
+        self._positions = {}
+        # Number of push (incl. decrease-key) and pop operations.
+        self.num_pushes = 0
+        self.num_pops = 0
+
+    def push(self, key, node_id):
+        """ Insert a node or decrease its key if it is already queued. """
+        self.num_pushes += 1
+        pos = self._positions.get(node_id)
+        if pos is None:
+            pos = len(self._keys)
+            self._keys.append(key)
+            self._node_ids.append(node_id)
+        elif key < self._keys[pos]:
+            self._keys[pos] = key
+        else:
+            return
+        self._sift_up(pos, key, node_id)
+
+    def pop(self):
+        """ :return: (key, node_id) tuple with the smallest key. """
+        self.num_pops += 1
+        keys = self._keys
+        node_ids = self._node_ids
+        min_key = keys[0]
+        min_node_id = node_ids[0]
+        del self._positions[min_node_id]
+        # Move the last entry to the root and repair the heap.
+        key = keys.pop()
+        node_id = node_ids.pop()
+        if keys:
+            self._sift_down(0, key, node_id)
+
+        return (min_key, min_node_id)
+
+    def _sift_up(self, pos, key, node_id):
+        keys = self._keys
+        node_ids = self._node_ids
+        positions = self._positions
+        while pos > 0:
+            parent_pos = (pos - 1) >> 1
+            parent_key = keys[parent_pos]
+            if parent_key <= key:
+                break
+            keys[pos] = parent_key
+            node_ids[pos] = node_ids[parent_pos]
+            positions[node_ids[pos]] = pos
+            pos = parent_pos
+        keys[pos] = key
+        node_ids[pos] = node_id
+        positions[node_id] = pos
+
+    def _sift_down(self, pos, key, node_id):
+        keys = self._keys
+        node_ids = self._node_ids
+        positions = self._positions
+        size = len(keys)
+        while True:
+            child_pos = 2 * pos + 1
+            if child_pos >= size:
+                break
+            # Select the smaller child.
+            if child_pos + 1 < size and keys[child_pos + 1] < keys[child_pos]:
+                child_pos += 1
+            if key <= keys[child_pos]:
+                break
+            keys[pos] = keys[child_pos]
+            node_ids[pos] = node_ids[child_pos]
+            positions[node_ids[pos]] = pos
+            pos = child_pos
+        keys[pos] = key
+        node_ids[pos] = node_id
+        positions[node_id] = pos
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class RadixHeapQueue:
+    """
+    Radix heap for integer keys that are popped in non-decreasing order
+    (monotone priority queue, as needed by Dijkstra's algorithm).
+    Bucket i holds the entries whose key differs from the last popped key
+    in bit i - 1 as highest bit, so each entry is moved at most 64 times.
+    Outdated entries are skipped by the caller like for HeapQueue.
+    """
+
+    def __init__(self, max_arc_cost=None):
+        self._buckets = [[] for _ in range(65)]
+        self._last_key = 0
+        self._size = 0
+        # Number of push and pop operations.
+        self.num_pushes = 0
+        self.num_pops = 0
+
+    def push(self, key, node_id):
+        if key < self._last_key:
+            raise Exception('Key is smaller than the last popped key')
+        self.num_pushes += 1
+        self._size += 1
+        self._buckets[(key ^ self._last_key).bit_length()].append(
+            (key, node_id))
+
+    def pop(self):
+        """ :return: (key, node_id) tuple with the smallest key. """
+        self.num_pops += 1
+        buckets = self._buckets
+        if not buckets[0]:
+            # Redistribute the first non-empty bucket around its min. key.
+            idx = 1
+            while not buckets[idx]:
+                idx += 1
+            entries = buckets[idx]
+            buckets[idx] = []
+            last_key = min(entries)[0]
+            self._last_key = last_key
+            for entry in entries:
+                buckets[(entry[0] ^ last_key).bit_length()].append(entry)
+        self._size -= 1
+
+        return buckets[0].pop()
+
+    def __len__(self):
+        return self._size
+
+
+class BucketQueue:
+    """
+    Dial's bucket queue for integer keys. All queued keys lie within
+    max_arc_cost of the last popped key, so max_arc_cost + 1 buckets used
+    as a ring buffer suffice. For larger key ranges (e.g. A* keys) the
+    ring buffer grows. Outdated entries are skipped by the caller like for
+    HeapQueue.
+    """
+
+    # Number of buckets depends on the arc costs of the graph.
+    needs_max_arc_cost = True
+
+    def __init__(self, max_arc_cost):
+        self._num_buckets = max_arc_cost + 1
+        self._buckets = [[] for _ in range(self._num_buckets)]
+        self._current_key = 0
+        self._size = 0
+        # Number of push and pop operations.
+        self.num_pushes = 0
+        self.num_pops = 0
+
+    def push(self, key, node_id):
+        if not self.num_pops and not self._size:
+            # First key, the keys need not start at 0.
+            self._current_key = key
+        if key < self._current_key:
+            raise Exception('Key is smaller than the last popped key')
+        if key >= self._current_key + self._num_buckets:
+            self._grow(key - self._current_key + 1)
+        self.num_pushes += 1
+        self._size += 1
+        self._buckets[key % self._num_buckets].append(node_id)
+
+    def pop(self):
+        """ :return: (key, node_id) tuple with the smallest key. """
+        self.num_pops += 1
+        num_buckets = self._num_buckets
+        key = self._current_key
+        # Skip empty buckets.
+        while not self._buckets[key % num_buckets]:
+            key += 1
+        self._current_key = key
+        self._size -= 1
+
+        return (key, self._buckets[key % num_buckets].pop())
+
+    def _grow(self, min_num_buckets):
+        """ Enlarge the ring buffer to at least min_num_buckets buckets. """
+        old_num_buckets = self._num_buckets
+        num_buckets = max(2 * old_num_buckets, min_num_buckets)
+        buckets = [[] for _ in range(num_buckets)]
+        # The keys of the ring buffer are current_key .. current_key +
+        # old_num_buckets - 1.
+        for key in range(self._current_key,
+                         self._current_key + old_num_buckets):
+            buckets[key % num_buckets] = self._buckets[key % old_num_buckets]
+        self._buckets = buckets
+        self._num_buckets = num_buckets
+
+    def __len__(self):
+        return self._size
+
+
+# Priority queue engines selectable by name for the shortest path searches.
+QUEUE_ENGINES = {
+    'heap': HeapQueue,
+    'priority_queue': LockingHeapQueue,
+    'indexed_heap': IndexedHeapQueue,
+    'radix_heap': RadixHeapQueue,
+    'dial': BucketQueue,
+}
+
+def make_priority_queue(queue_engine, graph, cost_profile=None):
+    """
+    Create a priority queue for a search on a graph.
+
+    :param queue_engine: name in QUEUE_ENGINES or an (empty) priority
+        queue object, which is returned unchanged.
+    :param graph: graph to be searched, provides the max. arc cost.
+    :param cost_profile: cost profile of the search (CSRGraph only), None
+        for the current arc costs.
+    :return: priority queue object.
+
+    >>> graph = CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> make_priority_queue('dial', graph)._num_buckets
+    71
+    """
+    if not isinstance(queue_engine, str):
+        return queue_engine
+    if queue_engine not in QUEUE_ENGINES:
+        raise Exception('Unknown priority queue engine: ' + queue_engine)
+    engine = QUEUE_ENGINES[queue_engine]
+    if getattr(engine, 'needs_max_arc_cost', False):
+        if cost_profile is None:
+            return engine(graph.get_max_arc_cost())
+        return engine(graph.get_max_arc_cost(cost_profile))
+
+    return engine()
+
+def set_stats_sink(sink):
+    """
+    Enable the instrumentation of CSRGraph.compute_shortest_paths(),
+    CSRGraph.compute_reachable_nodes() and the loaders. Each call passes a
+    dict record to sink.record(): the operation, its counters (settled
+    nodes, relaxed arcs, priority queue pushes and pops, stale pops of
+    outdated entries) and the wall time [s] of its phases. Without a sink
+    the instrumentation costs one check per call.
+
+    :param sink: object with a record(stats) method, e.g. MemoryStatsSink
+        or JsonLinesStatsSink, None to disable the instrumentation.
+    :return: previous sink.
+
+    >>> sink = MemoryStatsSink()
+    >>> previous_sink = set_stats_sink(sink)
+    >>> graph = CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> graph.compute_shortest_paths(0)
+    >>> graph.compute_reachable_nodes(4)[0]
+    4
+    >>> [stats['operation'] for stats in sink.records]
+    ['read_graph_from_file', 'compute_shortest_paths', 'compute_reachable_nodes']
+    >>> stats = sink.records[1]
+    >>> [stats[key] for key in ('settled_nodes', 'relaxed_arcs', 'pushes',
+    ...                         'pops', 'stale_pops')]
+    [4, 5, 5, 5, 1]
+    >>> sorted(stats['phases'])
+    ['costs', 'reset', 'search']
+    >>> set_stats_sink(previous_sink) is sink
+    True
+    """
+    global _stats_sink
+    previous_sink = _stats_sink
+    _stats_sink = sink
+
+    return previous_sink
+
+def get_stats_sink():
+    """ Returns the current stats sink, see set_stats_sink(). """
+    return _stats_sink
+
+def record_stats(stats):
+    """
+    Pass a record to the current stats sink, see set_stats_sink().
+
+    :param stats: dict with at least the key 'operation'.
+    :return: None
+    """
+    if _stats_sink is not None:
+        _stats_sink.record(stats)
+
+def get_largest_component(num_components, labels):
+    """
+    :param num_components: number of components.
+    :param labels: component label of each node.
+    :return: ascending list of the node ids of the largest component,
+        ties broken by the smaller label.
+
+    >>> get_largest_component(3, array('i', [2, 0, 1, 2, 0]))
+    [1, 4]
+    """
+
+    sizes = collections.Counter(labels)
+    largest_label = max(range(num_components),
+                        key=lambda label: (sizes[label], -label),
+                        default=-1)
+
+    return [node_id for node_id, label in enumerate(labels)
+            if label == largest_label]
+
+def great_circle_distance(latitude1, longitude1, latitude2, longitude2):
+    """
+    Great-circle distance [m] between two points (haversine formula).
+
+    >>> round(great_circle_distance(48.0, 9.0, 49.0, 9.0))
+    111195
+    """
+    phi1 = math.radians(latitude1)
+    phi2 = math.radians(latitude2)
+    delta_phi = phi2 - phi1
+    delta_lambda = math.radians(longitude2 - longitude1)
+    a = (math.sin(delta_phi / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2)
+
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+def split_columns(lines, num_columns):
+    """
+    Split lines with space separated columns into one list of tokens.
+
+    :param lines: list of lines.
+    :param num_columns: number of columns every line must have.
+    :return: list of tokens, None if a line has another number of columns.
+
+    >>> split_columns(['0 1 2', '3 4 5'], 3)
+    ['0', '1', '2', '3', '4', '5']
+    >>> split_columns(['0 1', '3 4 5 6'], 3)
+    """
+    # Fast check: lines without surrounding whitespace and with exactly
+    # num_columns - 1 spaces.
+    if set(map(str.count, lines, itertools.repeat(' '))) == {num_columns - 1}:
+        tokens = ' '.join(lines).split(' ')
+        if len(tokens) == num_columns * len(lines) and '' not in tokens:
+            return tokens
+    # Slow check line by line, e.g. for lines with trailing whitespace.
+    rows = [line.strip().split(' ') for line in lines]
+    if set(map(len, rows)) != {num_columns}:
+        return None
+
+    return list(itertools.chain.from_iterable(rows))
+
+def write_aligned(binary_file, arrays):
+    """
+    Write data blocks into a binary file, each one padded to a multiple of
+    8 bytes, so all blocks of the file start at an 8-byte boundary.
+
+    :param binary_file: file opened for binary writing.
+    :param arrays: list of (values, type code) tuples, values is an array,
+        a memoryview or any sequence (e.g. bytes for 'B').
+    :return: None
+    """
+    for values, type_code in arrays:
+        if isinstance(values, (bytes, array)) and (
+                not isinstance(values, array) or values.typecode == type_code):
+            data = bytes(values) if isinstance(values, bytes) else values.tobytes()
+        else:
+            data = array(type_code, values).tobytes()
+        binary_file.write(data)
+        binary_file.write(bytes(-len(data) % 8))
+
+def map_aligned(buffer, header_size, arrays):
+    """
+    Create typed views of the data blocks written by write_aligned().
+
+    :param buffer: file content (e.g. mmap object).
+    :param header_size: size of the first block (the header).
+    :param arrays: list of (length, type code) tuples of the following
+        blocks.
+    :return: (list of memoryviews, end position) tuple.
+
+    >>> import io
+    >>> with io.BytesIO() as binary_file:
+    ...     write_aligned(binary_file, [(b'head', 'B'), ([1, 2], 'i'), ([3], 'q')])
+    ...     views, end = map_aligned(binary_file.getvalue(), 4,
+    ...                              [(2, 'i'), (1, 'q')])
+    >>> [view.tolist() for view in views], end
+    ([[1, 2], [3]], 24)
+    """
+    buffer = memoryview(buffer)
+    pos = header_size + (-header_size % 8)
+    views = []
+    for length, type_code in arrays:
+        size = length * array(type_code).itemsize
+        views.append(buffer[pos:pos + size].cast(type_code))
+        pos += size + (-size % 8)
+
+    return (views, pos)
+
+def hilbert_index(x, y, order):
+    """
+    Position of a point on the Hilbert curve through a square grid.
+
+    :param x: column of the point, 0 <= x < 2 ** order.
+    :param y: row of the point, 0 <= y < 2 ** order.
+    :param order: number of bits per coordinate.
+    :return: position on the curve, 0 <= position < 4 ** order.
+
+    >>> [hilbert_index(x, y, 1) for x, y in [(0, 0), (0, 1), (1, 1), (1, 0)]]
+    [0, 1, 2, 3]
+    >>> sorted(hilbert_index(x, y, 2) for x in range(4) for y in range(4))[-1]
+    15
+    """
+    max_coordinate = (1 << order) - 1
+    index = 0
+    size = 1 << (order - 1)
+    while size:
+        rx = 1 if x & size else 0
+        ry = 1 if y & size else 0
+        index += size * size * ((3 * rx) ^ ry)
+        # Rotate the quadrant, so the curve continues in the sub-square.
+        if not ry:
+            if rx:
+                x = max_coordinate - x
+                y = max_coordinate - y
+            x, y = y, x
+        size >>= 1
+
+    return index
+
+def get_binary_file_name(file_name, directed=True, node_order=None):
+    """ Returns the path of the binary cache file for a *.graph file. """
+    suffix = '.csr' if node_order is None else '.{0}.csr'.format(node_order)
+    if directed:
+        return file_name + suffix
+    return file_name + '.undirected' + suffix
+
+def read_binary_file_header(binary_file):
+    """
+    Read the header of a binary graph file.
+
+    :param binary_file: buffer with the file content (e.g. mmap object).
+    :return: tuple of header fields without the magic number, None if
+        the header does not match this version and byte order.
+    """
+    header_size = struct.calcsize(GRAPH_FILE_HEADER)
+    if len(binary_file) < header_size:
+        return None
+    header = struct.unpack_from(GRAPH_FILE_HEADER, binary_file)
+    if (header[0] != GRAPH_FILE_MAGIC or header[1] != GRAPH_FILE_VERSION or
+            header[2] != (sys.byteorder == 'little')):
+        return None
+
+    return header[1:]
+
+def is_binary_file_valid(binary_file_name, source_file_name):
+    """
+    Check if a binary graph file was compiled from the current version of
+    its *.graph file (same size and modification time).
+    """
+    try:
+        with open(binary_file_name, 'rb') as binary_file:
+            header = read_binary_file_header(
+                binary_file.read(struct.calcsize(GRAPH_FILE_HEADER)))
+        source_stat = os.stat(source_file_name)
+    except OSError:
+        return False
+    if header is None:
+        return False
+
+    return (header[3] == source_stat.st_size and
+            header[4] == source_stat.st_mtime_ns)
+
+def compile_graph_file(file_name, binary_file_name=None, directed=True,
+                       node_order=None):
+    """
+    Convert a *.graph file into a binary file for CSRGraph.load().
+
+    :param file_name: path of the *.graph file.
+    :param binary_file_name: path of the binary file, by default
+        get_binary_file_name(file_name, directed, node_order).
+    :param directed: see CSRGraph.read_graph_from_file().
+    :param node_order: renumber the nodes, see CSRGraph.reorder_nodes().
+    :return: path of the binary file.
+
+    >>> binary_file_name = compile_graph_file('graph_13/test.graph')
+    >>> is_binary_file_valid(binary_file_name, 'graph_13/test.graph')
+    True
+    >>> CSRGraph.load('graph_13/test.graph')
+    [0->1(30), 0->2(70), 1->2(20), 2->3(50), 3->1(40), 4->3(20)]
+    >>> os.remove(binary_file_name)
+    """
+    if binary_file_name is None:
+        binary_file_name = get_binary_file_name(file_name, directed,
+                                                node_order)
+    # Take the file status before parsing, so a change of the *.graph
+    # file during parsing invalidates the binary file.
+    source_stat = os.stat(file_name)
+    graph = CSRGraph()
+    graph.read_graph_from_file_bulk(file_name, directed)
+    if node_order is not None:
+        graph = graph.reorder_nodes(node_order)
+    graph.write_binary_file(binary_file_name, source_stat, directed)
+
+    return binary_file_name
+
+def benchmark_node_orders(file_name, num_queries=100, directed=True,
+                          node_orders=(None,) + NODE_ORDERS, seed=0):
+    """
+    Compare the query latency of the node orders of a *.graph file. Every
+    node order answers the same random shortest path queries, whose node
+    ids of the *.graph file are translated by CSRGraph.get_node_id().
+
+    :param file_name: path of the *.graph file.
+    :param num_queries: number of shortest path queries.
+    :param directed: see CSRGraph.load().
+    :param node_orders: node orders to compare, None for the node order
+        of the *.graph file.
+    :param seed: seed of the random queries.
+    :return: dict node order -> mean query time [s].
+    """
+
+    num_nodes = CSRGraph.load(file_name, directed).get_num_nodes()
+    rng = random.Random(seed)
+    queries = [(rng.randrange(num_nodes), rng.randrange(num_nodes))
+               for _ in range(num_queries)]
+    results = {}
+    for node_order in node_orders:
+        graph = CSRGraph.load(file_name, directed, node_order)
+        workspace = graph.create_workspace()
+        node_queries = [(graph.get_node_id(source), graph.get_node_id(target))
+                        for source, target in queries]
+        start = time.perf_counter()
+        for source, target in node_queries:
+            graph.shortest_path(source, target, workspace=workspace)
+        results[node_order] = (time.perf_counter() - start) / num_queries
+
+    return results
+
+def travel_to(graph, end_node, max_speed, workspace=None):
+    """ Compute distance and travel time of the selected path. """
+    node_id = end_node
+    # Time in hours [h].
+    time = 0
+    # Distance in kilometers [km]
+    distance = 0
+
+    while True:
+        arc = graph.get_traceback_arc(node_id, workspace)
+        if not arc:
+            break
+
+        distance += arc.distance / 1000.0
+
+        # v = s / t => t = s / v
+        time += arc.distance / 1000.0 / min(arc.max_speed, max_speed)
+
+        # Follow to previous node, the other end of the arc (the arc may
+        # have been traversed from head to tail).
+        node_id = (arc.tail_node_id if arc.head_node_id == node_id
+                   else arc.head_node_id)
+
+    return (distance, time_to_string(time))
+
+def time_to_string(time):
+    """ Convert time [h] to string format. """
+    hh = int(time)
+    mm = int((time - hh) * 60)
+
+    return '{0} hour(s) and {1} minute(s)'.format(hh, mm)
+
+def reset_graph(graph):
+    """ Resets the graph and it's fields. """
+    graph.reset_search_state()
+
+def get_furthest_node(graph):
+    """
+    Returns the id fo the furthest node of the last search by a scan over
+    all nodes. CSRGraph.compute_eccentricity() finds it during the search.
+    """
     max_dist = (-1, None)
 
-    for node in graph._nodes:
-        if node._distance > max_dist[0]:
-            max_dist = (node._distance, node._id)
+    for node_id in range(graph.get_num_nodes()):
+        node_distance = graph.get_node_distance(node_id)
+        if node_distance > max_dist[0]:
+            max_dist = (node_distance, node_id)
 
     return max_dist[1]
 
@@ -405,42 +4168,43 @@ def main():
     Main function.
     """
     print("Read in file *.graph: START!")
-    graph = Graph()
-    graph.read_graph_from_file('bawue_bayern_13/bawue_bayern.graph')
-    graph.set_arc_costs_to_distance()
+    # Parses the *.graph file only if its binary cache file is missing
+    # or stale. The nodes are renumbered along a Hilbert curve, node ids
+    # of the *.graph file are translated by get_node_id().
+    graph = CSRGraph.load('bawue_bayern_13/bawue_bayern.graph',
+                          node_order='hilbert')
     print("Read in file *.graph: END!")
+    start_node_id = graph.get_node_id(5508637)
+    end_node_id = graph.get_node_id(4435496)
 
     # Shortest and longest distance.
     print("\nShortest path:")
-    graph.compute_shortest_paths(5508637)
-    result1 = travel_to(graph, 4435496, sys.maxsize)
+    # The search tracks the furthest node, no scan over all nodes.
+    max_dist_id1 = graph.compute_eccentricity(start_node_id)[1]
+    result1 = travel_to(graph, end_node_id, sys.maxsize)
     print("Distance: {0:.3f} km\tTime: {1}".format(result1[0], result1[1]))
     print("\nLongest path:")
-    max_dist_id1 = get_furthest_node(graph)
     result1 = travel_to(graph, max_dist_id1, sys.maxsize)
     print("Distance: {0:.3f} km\tTime: {1}".format(result1[0], result1[1]))
 
     # Shortest and longest time of travel with up to 130 km/h.
     print("\nShortest time of travel with max. speed up to 130 km/h:")
-    reset_graph(graph)
-    graph.set_arc_costs_to_travel_time(max_vehicle_speed=130)
-    graph.compute_shortest_paths(5508637)
-    result2 = travel_to(graph, 4435496, 130)
+    # The cost profile is selected per query, the graph is not changed.
+    max_dist_id2 = graph.compute_eccentricity(
+        start_node_id, cost_profile='travel_time_130')[1]
+    result2 = travel_to(graph, end_node_id, 130)
     print("Distance: {0:.3f} km\tTime: {1}".format(result2[0], result2[1]))
     print("\nLongest time of travel with max. speed up to 130 km/h:")
-    max_dist_id2 = get_furthest_node(graph)
     result2 = travel_to(graph, max_dist_id2, 130)
     print("Distance: {0:.3f} km\tTime: {1}".format(result2[0], result2[1]))
 
     # Shortest and longest time of travel with up to 100 km/h.
     print("\nShortest time of travel with max. speed up to 100 km/h:")
-    reset_graph(graph)
-    graph.set_arc_costs_to_travel_time(max_vehicle_speed=100)
-    graph.compute_shortest_paths(5508637)
-    result3 = travel_to(graph, 4435496, 100)
+    max_dist_id3 = graph.compute_eccentricity(
+        start_node_id, cost_profile='travel_time_100')[1]
+    result3 = travel_to(graph, end_node_id, 100)
     print("Distance: {0:.3f} km\tTime: {1}".format(result3[0], result3[1]))
     print("\nLongest time of travel with max. speed up to 100 km/h")
-    max_dist_id3 = get_furthest_node(graph)
     result3 = travel_to(graph, max_dist_id3, 100)
     print("Distance: {0:.3f} km\tTime: {1}".format(result3[0], result3[1]))
 
@@ -0,0 +1,380 @@
+#! /usr/bin/env python3
+
+"""
+Local routing service for the graphs of route_planner.
+
+The binary file of a graph (see route_planner.CSRGraph.load()) is copied
+once into a multiprocessing.shared_memory block. Every worker process
+attaches to the block and maps the arrays without copying them (see
+route_planner.CSRGraph.read_binary_buffer()), so N workers hold the graph
+in memory once and start without parsing it.
+
+An asyncio server accepts requests as lines of JSON on a Unix socket (or
+TCP port) and answers each with a line of JSON. Requests that arrive
+within BATCH_WINDOW seconds are sent to a worker as one batch. Requests
+that are not answered within their timeout get an error response, and
+workers skip requests whose deadline has passed.
+
+Requests (node ids of the *.graph file, cost_profile and timeout [s] are
+optional):
+    {"id": 1, "type": "shortest_path", "source": 0, "target": 3,
+     "cost_profile": "travel_time_130", "timeout": 1.0}
+    {"id": 2, "type": "one_to_many", "source": 0, "targets": [2, 3]}
+    {"id": 3, "type": "isochrone", "source": 0, "budgets": [300, 600]}
+Responses:
+    {"id": 1, "distance": 100, "path": [0, 1, 2, 3]}
+    {"id": 2, "distances": [50, 100]}
+    {"id": 3, "isochrones": [{"budget": 300, "node_ids": [...],
+                              "costs": [...]}, ...]}
+    {"id": 1, "error": "timeout"}
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import multiprocessing
+import concurrent.futures
+from multiprocessing import shared_memory
+
+import route_planner
+
+# Max. time [s] a request waits for further requests of its batch.
+BATCH_WINDOW = 0.002
+# Max. number of requests of a batch.
+MAX_BATCH_SIZE = 64
+# Timeout [s] of requests without a timeout.
+DEFAULT_TIMEOUT = 10.0
+
+# Shared memory block, graph and search workspace of a worker process, see
+# _init_worker().
+_worker_memory = None
+_worker_graph = None
+_worker_workspace = None
+
+
+def answer_request(graph, request, workspace=None):
+    """
+    Answer one request of the routing service.
+
+    :param graph: CSRGraph.
+    :param request: dict, see the module docstring. The key 'deadline'
+        (time.time() value) is set by the service from the timeout.
+    :param workspace: route_planner.SearchWorkspace of the searches.
+    :return: response dict.
+
+    >>> graph = route_planner.CSRGraph()
+    >>> graph.read_graph_from_file('graph_13/test.graph')
+    >>> answer_request(graph, {'id': 1, 'type': 'shortest_path',
+    ...                        'source': 0, 'target': 3})
+    {'id': 1, 'distance': 100, 'path': [0, 1, 2, 3]}
+    >>> answer_request(graph, {'id': 2, 'type': 'one_to_many', 'source': 0,
+    ...                        'targets': [2, 4],
+    ...                        'cost_profile': 'travel_time_100'})
+    {'id': 2, 'distances': [6, -1]}
+    >>> answer_request(graph, {'type': 'isochrone', 'source': 0,
+    ...                        'budgets': [30]})
+    {'id': None, 'isochrones': [{'budget': 30, 'node_ids': [0, 1], 'costs': [0, 30]}]}
+    >>> answer_request(graph, {'type': 'shortest_path', 'source': 0,
+    ...                        'target': 9})
+    {'id': None, 'error': 'unknown node id: 9'}
+    >>> answer_request(graph, {'type': 'isochrone', 'source': 0,
+    ...                        'budgets': [30], 'deadline': 0.0})
+    {'id': None, 'error': 'timeout'}
+    """
+
+    response = {'id': request.get('id')}
+    if time.time() > request.get('deadline', float('inf')):
+        response['error'] = 'timeout'
+        return response
+
+    def get_node_id(original_node_id):
+        node_id = graph.get_node_id(original_node_id)
+        if node_id < 0:
+            raise ValueError('unknown node id: {0}'.format(original_node_id))
+        return node_id
+
+    try:
+        request_type = request.get('type')
+        cost_profile = request.get('cost_profile')
+        source_node_id = get_node_id(request['source'])
+        if request_type == 'shortest_path':
+            result = graph.shortest_path(
+                source_node_id, get_node_id(request['target']),
+                request.get('bidirectional', False), workspace=workspace,
+                cost_profile=cost_profile)
+            response['distance'] = result.distance
+            response['path'] = [graph.get_original_node_id(node_id)
+                                for node_id in result.path]
+        elif request_type == 'one_to_many':
+            response['distances'] = graph.compute_one_to_many(
+                source_node_id, [get_node_id(node_id)
+                                 for node_id in request['targets']],
+                workspace=workspace, cost_profile=cost_profile).tolist()
+        elif request_type == 'isochrone':
+            response['isochrones'] = [
+                {'budget': isochrone.budget,
+                 'node_ids': [graph.get_original_node_id(node_id)
+                              for node_id in isochrone.node_ids],
+                 'costs': isochrone.costs.tolist()}
+                for isochrone in graph.compute_isochrones(
+                    source_node_id, request['budgets'], workspace=workspace,
+                    cost_profile=cost_profile)]
+        else:
+            raise ValueError('unknown request type: {0}'.format(request_type))
+    except (KeyError, TypeError, ValueError) as error:
+        response['error'] = (str(error) if not isinstance(error, KeyError)
+                             else 'missing key: {0}'.format(error))
+    except Exception as error:
+        response['error'] = str(error)
+
+    return response
+
+def _init_worker(memory_name):
+    """ Attach a worker process to the shared memory of the graph. """
+    global _worker_memory, _worker_graph, _worker_workspace
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_graph = route_planner.CSRGraph()
+    _worker_graph.read_binary_buffer(_worker_memory.buf)
+    _worker_workspace = _worker_graph.create_workspace()
+
+def _answer_batch(requests):
+    """ Task of a worker process: answer a batch of requests. """
+    return [answer_request(_worker_graph, request, _worker_workspace)
+            for request in requests]
+
+
+class RoutingService:
+    """
+    Routing service with a graph in shared memory and a pool of worker
+    processes.
+
+    >>> service = RoutingService('graph_13/test.graph', num_workers=1)
+    >>> service.start()
+    >>> async def query():
+    ...     return await asyncio.gather(
+    ...         service.submit({'id': 1, 'type': 'shortest_path',
+    ...                         'source': 0, 'target': 3}),
+    ...         service.submit({'id': 2, 'type': 'one_to_many',
+    ...                         'source': 4, 'targets': [1, 0]}))
+    >>> asyncio.run(query())
+    [{'id': 1, 'distance': 100, 'path': [0, 1, 2, 3]}, {'id': 2, 'distances': [60, -1]}]
+    >>> asyncio.run(service.submit({'id': 3, 'type': 'shortest_path',
+    ...                             'source': 0, 'target': 3,
+    ...                             'timeout': '1'}))
+    {'id': 3, 'error': "invalid timeout: '1'"}
+    >>> service.close()
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test.graph'))
+    """
+
+    def __init__(self, file_name, num_workers=None, directed=True,
+                 node_order=None, batch_window=BATCH_WINDOW,
+                 max_batch_size=MAX_BATCH_SIZE):
+        """
+        :param file_name: path of the *.graph file.
+        :param num_workers: number of worker processes, None for the
+            number of CPUs.
+        :param directed: see route_planner.CSRGraph.load().
+        :param node_order: see route_planner.CSRGraph.load().
+        :param batch_window: see BATCH_WINDOW.
+        :param max_batch_size: see MAX_BATCH_SIZE.
+        """
+        self._file_name = file_name
+        self._num_workers = num_workers or os.cpu_count() or 1
+        self._directed = directed
+        self._node_order = node_order
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+        self._memory = None
+        self._executor = None
+        # Requests of the next batch as (request, future) tuples, and the
+        # timer that sends the batch.
+        self._batch = []
+        self._batch_timer = None
+
+    def start(self):
+        """
+        Copy the graph into shared memory and start the worker processes.
+        The binary file of the graph is compiled if needed.
+
+        :return: None
+        """
+
+        binary_file_name = route_planner.get_binary_file_name(
+            self._file_name, self._directed, self._node_order)
+        # Compiles the binary file if it is missing or stale.
+        route_planner.CSRGraph.load(self._file_name, self._directed,
+                                    self._node_order)
+        with open(binary_file_name, 'rb') as binary_file:
+            content = binary_file.read()
+        self._memory = shared_memory.SharedMemory(create=True,
+                                                  size=max(1, len(content)))
+        self._memory.buf[:len(content)] = content
+        # Forked workers, started on demand, would inherit the sockets of
+        # open client connections and keep them open.
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            self._num_workers, multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self._memory.name,))
+        # Start a worker before the first request.
+        self._executor.submit(int).result()
+
+        return None
+
+    def close(self):
+        """
+        Stop the worker processes and free the shared memory.
+
+        :return: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+        return None
+
+    async def submit(self, request):
+        """
+        Answer a request in a worker process.
+
+        :param request: dict, see the module docstring.
+        :return: response dict, with the key 'error' if the request failed
+            or timed out.
+        """
+
+        timeout = request.get('timeout', DEFAULT_TIMEOUT)
+        if (isinstance(timeout, bool) or
+                not isinstance(timeout, (int, float)) or
+                not 0 < timeout < float('inf')):
+            return {'id': request.get('id'),
+                    'error': 'invalid timeout: {0!r}'.format(timeout)}
+        request = dict(request, deadline=time.time() + timeout)
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((request, future))
+        if len(self._batch) >= self._max_batch_size:
+            self._send_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.get_running_loop().call_later(
+                self._batch_window, self._send_batch)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return {'id': request.get('id'), 'error': 'timeout'}
+
+    def _send_batch(self):
+        """ Send the requests of the current batch to a worker. """
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch = self._batch
+        self._batch = []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().run_in_executor(
+            self._executor, _answer_batch,
+            [request for request, _ in batch])
+        task.add_done_callback(
+            lambda task: self._resolve_batch(task, batch))
+
+    @staticmethod
+    def _resolve_batch(task, batch):
+        """ Pass the responses of a batch to the waiting requests. """
+        for idx, (request, future) in enumerate(batch):
+            if future.done():
+                continue
+            if task.cancelled() or task.exception() is not None:
+                error = 'cancelled' if task.cancelled() else str(
+                    task.exception())
+                future.set_result({'id': request.get('id'), 'error': error})
+            else:
+                future.set_result(task.result()[idx])
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve a client connection: answer every line of JSON with a line
+        of JSON, in the order in which the answers are ready.
+        """
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('request is not an object')
+            except ValueError as error:
+                response = {'id': None, 'error': str(error)}
+            else:
+                response = await self.submit(request)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, host='127.0.0.1', port=None):
+        """
+        Run the server until it is cancelled.
+
+        :param path: path of the Unix socket, None for a TCP server.
+        :param host: host of the TCP server.
+        :param port: port of the TCP server.
+        :return: None
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection,
+                                                     path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host,
+                                                port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """
+    Main function: serve a *.graph file on a Unix socket.
+    Usage: routing_service.py [*.graph file] [socket path] [workers]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    path = sys.argv[2] if len(sys.argv) > 2 else 'route_planner.sock'
+    num_workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    service = RoutingService(file_name, num_workers)
+    service.start()
+    print('Serving {0} on {1}'.format(file_name, path))
+    try:
+        asyncio.run(service.serve(path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
@@ -0,0 +1,322 @@
+#! /usr/bin/env python3
+
+"""
+Spatial index for the graphs of route_planner: snapping of coordinates to
+the nearest nodes.
+
+The nodes are bucketed into a uniform grid over latitude and longitude with
+about NODES_PER_CELL nodes per cell. Like the arcs of a CSRGraph, the
+buckets are packed into flat arrays: the nodes of cell c are at the
+positions cell_offsets[c] .. cell_offsets[c + 1] - 1, cells ordered row by
+row, with their coordinates stored next to them. A query scans rings of
+cells around the cell of the query point until no cell outside the rings
+can hold a closer node.
+"""
+
+import sys
+import math
+import time
+import heapq
+import random
+from array import array
+
+import route_planner
+
+# Average number of nodes per grid cell.
+NODES_PER_CELL = 2
+
+
+class SpatialIndex:
+    """
+    Uniform grid of the nodes of a CSRGraph. Distances are great-circle
+    distances [m]; the grid does not wrap around at longitude +-180.
+    """
+
+    def __init__(self, graph, largest_component=False, strong=True):
+        """
+        :param graph: CSRGraph.
+        :param largest_component: index only the nodes of the largest
+            component, so every snapped node can be routed to every other.
+        :param strong: see CSRGraph.get_largest_component_node_ids().
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> SpatialIndex(graph).get_num_nodes()
+        5
+        >>> SpatialIndex(graph, largest_component=True).get_num_nodes()
+        3
+        """
+
+        if largest_component:
+            node_ids = graph.get_largest_component_node_ids(strong)
+        else:
+            node_ids = range(graph.get_num_nodes())
+        (latitudes, longitudes) = graph.get_coordinates()
+        latitudes = [latitudes[node_id] for node_id in node_ids]
+        longitudes = [longitudes[node_id] for node_id in node_ids]
+        num_nodes = len(node_ids)
+
+        self._min_latitude = min(latitudes, default=0.0)
+        self._min_longitude = min(longitudes, default=0.0)
+        height = max(latitudes, default=0.0) - self._min_latitude
+        max_abs_latitude = max(map(abs, latitudes), default=0.0)
+        # Smallest cosine of the latitude of the nodes, see
+        # _get_distance_bound().
+        self._min_cos_latitude = math.cos(math.radians(max_abs_latitude))
+        # Cells of equal height and width in meters at the mean latitude.
+        cos_latitude = max(
+            math.cos(math.radians(self._min_latitude + height / 2)), 1e-6)
+        width = (max(longitudes, default=0.0) - self._min_longitude) * \
+            cos_latitude
+        num_cells = max(1, num_nodes // NODES_PER_CELL)
+        cell_size = max(math.sqrt(height * width / num_cells),
+                        max(height, width) / num_cells)
+        if cell_size <= 0.0:
+            cell_size = 1.0
+        self._cell_height = cell_size
+        self._cell_width = cell_size / cos_latitude
+        self._num_rows = int(height / cell_size) + 1
+        self._num_columns = int(width / cell_size) + 1
+
+        # Bucket the nodes by a counting sort over their cells.
+        cells = [self._get_cell(*self._get_row_column(latitude, longitude))
+                 for latitude, longitude in zip(latitudes, longitudes)]
+        cell_offsets = array('q', bytes(8 * (self._num_rows *
+                                             self._num_columns + 1)))
+        for cell in cells:
+            cell_offsets[cell + 1] += 1
+        for cell in range(1, len(cell_offsets)):
+            cell_offsets[cell] += cell_offsets[cell - 1]
+        positions = array('q', cell_offsets)
+        self._node_ids = array('i', bytes(4 * num_nodes))
+        self._latitudes = array('d', bytes(8 * num_nodes))
+        self._longitudes = array('d', bytes(8 * num_nodes))
+        for idx, cell in enumerate(cells):
+            pos = positions[cell]
+            positions[cell] += 1
+            self._node_ids[pos] = node_ids[idx]
+            self._latitudes[pos] = latitudes[idx]
+            self._longitudes[pos] = longitudes[idx]
+        self._cell_offsets = cell_offsets
+
+    def get_num_nodes(self):
+        """
+        :return: number of indexed nodes.
+        """
+        return len(self._node_ids)
+
+    def nearest(self, latitude, longitude, max_distance=None):
+        """
+        Snap a coordinate to the nearest node.
+
+        :param latitude: latitude of the point.
+        :param longitude: longitude of the point.
+        :param max_distance: maximum distance [m] of the node, None for no
+            limit.
+        :return: id of the nearest node (the smaller id on ties), -1 if
+            there is no node within max_distance.
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> index = SpatialIndex(graph)
+        >>> index.nearest(48.21, 9.19), index.nearest(50.0, 7.0)
+        (2, 6)
+        >>> index.nearest(48.21, 9.19, max_distance=100.0)
+        -1
+        """
+
+        result = self._search(latitude, longitude, 1, max_distance)
+        return result[0][0] if result else -1
+
+    def k_nearest(self, latitude, longitude, k, max_distance=None):
+        """
+        Find the k nearest nodes of a coordinate.
+
+        :param latitude: latitude of the point.
+        :param longitude: longitude of the point.
+        :param k: number of nodes.
+        :param max_distance: maximum distance [m] of the nodes, None for no
+            limit.
+        :return: list of up to k tuples (node id, distance [m]), ordered by
+            distance and node id.
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test2.graph')
+        >>> index = SpatialIndex(graph)
+        >>> [(node_id, round(distance))
+        ...  for node_id, distance in index.k_nearest(48.32, 9.32, 3)]
+        [(3, 2671), (4, 10680), (2, 16030)]
+        >>> index.k_nearest(48.32, 9.32, 3, 10000.0)  # doctest: +ELLIPSIS
+        [(3, 2670.8...)]
+        """
+
+        return self._search(latitude, longitude, k, max_distance)
+
+    def snap(self, latitudes, longitudes, max_distance=None):
+        """
+        Snap many coordinates to their nearest nodes, see nearest().
+
+        :param latitudes: sequence of latitudes.
+        :param longitudes: sequence of longitudes.
+        :param max_distance: see nearest().
+        :return: array of the nearest node ids, -1 if there is no node
+            within max_distance.
+
+        >>> graph = route_planner.CSRGraph()
+        >>> graph.read_graph_from_file('graph_13/test.graph')
+        >>> SpatialIndex(graph).snap([48.0, 48.0006], [9.0, 9.0005])
+        array('i', [0, 3])
+        >>> SpatialIndex(graph, True).snap([48.0, 48.0006], [9.0, 9.0005])
+        array('i', [1, 3])
+        """
+
+        return array('i', (self.nearest(latitude, longitude, max_distance)
+                           for latitude, longitude
+                           in zip(latitudes, longitudes)))
+
+    def _search(self, latitude, longitude, k, max_distance):
+        """
+        :return: list of up to k tuples (node id, distance [m]) of the
+            nearest nodes within max_distance, see k_nearest().
+        """
+
+        if k <= 0 or not self._node_ids:
+            return []
+        (row, column) = self._get_row_column(latitude, longitude)
+        cos_latitude = min(self._min_cos_latitude,
+                           math.cos(math.radians(latitude)))
+        # Rings of cells around (row, column) that overlap the grid.
+        first_ring = max(0, -row, row - self._num_rows + 1,
+                         -column, column - self._num_columns + 1)
+        last_ring = max(row, self._num_rows - 1 - row,
+                        column, self._num_columns - 1 - column)
+
+        cell_offsets = self._cell_offsets
+        node_ids = self._node_ids
+        latitudes = self._latitudes
+        longitudes = self._longitudes
+        distance = route_planner.great_circle_distance
+        # Max-heap of the k nearest nodes found so far, as tuples
+        # (-distance, -node id), so ties keep the smaller node id.
+        nearest = []
+        for ring in range(first_ring, last_ring + 1):
+            for first_cell, last_cell in self._get_ring_cells(row, column,
+                                                              ring):
+                for pos in range(cell_offsets[first_cell],
+                                 cell_offsets[last_cell + 1]):
+                    entry = (-distance(latitude, longitude,
+                                       latitudes[pos], longitudes[pos]),
+                             -node_ids[pos])
+                    if len(nearest) < k:
+                        heapq.heappush(nearest, entry)
+                    elif entry > nearest[0]:
+                        heapq.heapreplace(nearest, entry)
+            # Nodes of the cells outside the rings are at least this far.
+            bound = self._get_distance_bound(ring, cos_latitude)
+            if len(nearest) == k and -nearest[0][0] <= bound:
+                break
+            if max_distance is not None and bound > max_distance:
+                break
+
+        return [(-node_id, -negative_distance)
+                for negative_distance, node_id in sorted(nearest, reverse=True)
+                if max_distance is None or -negative_distance <= max_distance]
+
+    def _get_row_column(self, latitude, longitude):
+        """
+        :return: tuple (row, column) of the cell of a point, outside the
+            grid for points outside the bounding box of the nodes.
+        """
+        return (math.floor((latitude - self._min_latitude) /
+                           self._cell_height),
+                math.floor((longitude - self._min_longitude) /
+                           self._cell_width))
+
+    def _get_cell(self, row, column):
+        """
+        :return: index of a cell of the grid.
+        """
+        return row * self._num_columns + column
+
+    def _get_ring_cells(self, row, column, ring):
+        """
+        Cells of the grid whose row or column differs by exactly ring from
+        (row, column).
+
+        :return: list of tuples (first cell, last cell) of consecutive
+            cells of a row.
+        """
+
+        ranges = []
+        first_column = max(0, column - ring)
+        last_column = min(self._num_columns - 1, column + ring)
+        for ring_row in range(max(0, row - ring),
+                              min(self._num_rows - 1, row + ring) + 1):
+            if abs(ring_row - row) == ring:
+                if first_column <= last_column:
+                    ranges.append((self._get_cell(ring_row, first_column),
+                                   self._get_cell(ring_row, last_column)))
+                continue
+            for ring_column in (column - ring, column + ring):
+                if 0 <= ring_column < self._num_columns:
+                    cell = self._get_cell(ring_row, ring_column)
+                    ranges.append((cell, cell))
+
+        return ranges
+
+    def _get_distance_bound(self, ring, cos_latitude):
+        """
+        Lower bound of the distance between a query point and the nodes of
+        the cells outside the first ring + 1 rings around its cell. These
+        nodes are at least ring cells away in latitude or in longitude.
+
+        :param ring: ring of cells.
+        :param cos_latitude: smallest cosine of the latitude of the query
+            point and the nodes.
+        :return: distance [m].
+        """
+
+        delta_phi = math.radians(ring * self._cell_height)
+        delta_lambda = min(math.pi, math.radians(ring * self._cell_width))
+        # Haversine formula: sin(d / 2R) >= cos(latitude) sin(delta / 2).
+        return route_planner.EARTH_RADIUS * min(
+            delta_phi, 2 * cos_latitude * math.sin(delta_lambda / 2))
+
+
+def main():
+    """
+    Main function: snap random coordinates to the nodes of a *.graph file.
+    Usage: spatial_index.py [*.graph file] [number of queries]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    graph = route_planner.CSRGraph.load(file_name)
+    start = time.perf_counter()
+    index = SpatialIndex(graph, largest_component=True)
+    print('Index of {0} nodes built in {1:.2f} s'.format(
+        index.get_num_nodes(), time.perf_counter() - start))
+
+    (latitudes, longitudes) = graph.get_coordinates()
+    rng = random.Random(0)
+    query_latitudes = [rng.uniform(min(latitudes), max(latitudes))
+                       for _ in range(num_queries)]
+    query_longitudes = [rng.uniform(min(longitudes), max(longitudes))
+                        for _ in range(num_queries)]
+    start = time.perf_counter()
+    index.snap(query_latitudes, query_longitudes)
+    seconds = time.perf_counter() - start
+    print('{0} coordinates snapped, {1:.1f} us per coordinate'.format(
+        num_queries, seconds / num_queries * 1e6))
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()
@@ -0,0 +1,618 @@
+#! /usr/bin/env python3
+
+"""
+Geographic tiles of the graphs of route_planner for workers that cannot
+hold a whole graph in memory.
+
+partition_graph() splits a *.graph file offline into square tiles of
+tile_size degrees of latitude and longitude. The nodes are renumbered tile
+by tile, so the nodes of a tile have consecutive node ids and the tile of
+a node is found by a binary search over the first node id of each tile.
+Each tile is a binary graph file (see
+route_planner.CSRGraph.write_binary_file()) with the nodes of the tile and
+their outgoing arcs, whose heads may lie in other tiles; the arcs of an
+undirected graph are stored in both directions (see
+route_planner.CSRGraph.to_directed()). The index file of
+the tiles holds the tile table, the node id translation and the boundary
+nodes of each tile, i.e. the nodes with arcs to or from other tiles:
+searches enter and leave a tile only through them.
+
+A TiledGraph reads the tiles on demand during a search and evicts the
+least recently used tiles beyond a memory budget. Its search state is kept
+in dicts instead of a SearchWorkspace, so the memory of a query grows with
+the area it touches instead of the whole map.
+"""
+
+import os
+import sys
+import math
+import mmap
+import time
+import heapq
+import bisect
+import random
+import struct
+import itertools
+import collections
+from array import array
+
+import route_planner
+
+# Tile index file format, see partition_graph().
+TILE_INDEX_MAGIC = b'GRAPHTIL'
+TILE_INDEX_VERSION = 1
+# magic, version, little endian, directed, source size, source mtime [ns],
+# tile size [degrees], number of nodes, number of arcs, number of tiles,
+# number of boundary nodes.
+TILE_INDEX_HEADER = '<8sI??qqdqqqq'
+# Edge length of the tiles [degrees].
+TILE_SIZE = 0.25
+# Memory budget [bytes] of the tiles read in by a TiledGraph.
+TILE_CACHE_BYTES = 64 << 20
+
+
+class TiledGraph:
+    """
+    Graph split into tiles by partition_graph(), whose tiles are read in
+    on demand. Node ids are the ones of the tiles, get_node_id() translates
+    the node ids of the *.graph file.
+
+    >>> directory = partition_graph('graph_13/test2.graph')
+    >>> graph = TiledGraph(directory, max_bytes=400)
+    >>> graph.get_num_tiles(), graph.get_num_nodes(), graph.get_num_arcs()
+    (3, 7, 8)
+    >>> graph.shortest_path(graph.get_node_id(0), graph.get_node_id(3))
+    ShortestPath(path=[0, 1, 2, 3], distance=30, num_settled=4, arcs=[0, 1, 2])
+    >>> graph.misses, graph.evictions
+    (1, 0)
+    >>> graph.shortest_path(graph.get_node_id(4), graph.get_node_id(2)).path
+    [4, 5, 1, 2]
+    >>> graph.misses, graph.evictions, graph.get_num_bytes()
+    (4, 2, 360)
+    >>> graph.get_original_node_id(6), graph.compute_shortest_paths(3)
+    (6, {3: 0, 1: 10, 2: 20})
+    >>> for tile_idx in range(graph.get_num_tiles()):
+    ...     print(graph.get_tile_key(tile_idx),
+    ...           graph.get_boundary_node_ids(tile_idx))
+    (192, 36) [1, 2]
+    (193, 37) [3, 4]
+    (194, 38) [5, 6]
+    >>> remove_tiles(directory)
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test2.graph'))
+    """
+
+    def __init__(self, directory, cost_profile='distance',
+                 max_bytes=TILE_CACHE_BYTES):
+        """
+        :param directory: directory of the tiles, see partition_graph().
+        :param cost_profile: arc costs of the searches, see
+            route_planner.CSRGraph.set_cost_profile().
+        :param max_bytes: memory budget of the tiles read in [bytes]. A
+            tile takes the size of its file and 8 bytes per arc for arc
+            costs other than 'distance'.
+        """
+
+        with open(get_tile_index_file_name(directory), 'rb') as index_file:
+            mapped_file = mmap.mmap(index_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        header = read_tile_index_header(mapped_file)
+        if header is None:
+            raise Exception('Tile index file has an invalid header')
+        (num_nodes, num_arcs, num_tiles, num_boundary_nodes) = header[4:8]
+        views = route_planner.map_aligned(
+            mapped_file, struct.calcsize(TILE_INDEX_HEADER),
+            [(num_tiles, 'i'), (num_tiles, 'i'), (num_tiles + 1, 'q'),
+             (num_tiles + 1, 'q'), (num_nodes, 'i'), (num_tiles + 1, 'q'),
+             (num_boundary_nodes, 'i')])[0]
+
+        self._mapped_file = mapped_file
+        self._directory = directory
+        self._directed = header[0]
+        self._tile_size = header[3]
+        self._num_nodes = num_nodes
+        self._num_arcs = num_arcs
+        # Tile table: row and column of each tile and the first node id
+        # and arc index of each tile.
+        (self._rows, self._columns, self._node_offsets,
+         self._arc_offsets) = views[:4]
+        self._node_ids_by_original = views[4]
+        # Boundary nodes of tile i are at the positions
+        # boundary_offsets[i] .. boundary_offsets[i + 1] - 1.
+        (self._boundary_offsets, self._boundary_node_ids) = views[5:7]
+        self._cost_profile = cost_profile
+        self._max_bytes = max_bytes
+        # Tiles read in by tile index, least recently used first, and
+        # their sizes, see __init__().
+        self._tiles = collections.OrderedDict()
+        self._tile_bytes = {}
+        self._num_bytes = 0
+        # Largest size of the tiles read in at the same time [bytes].
+        self.peak_num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_num_nodes(self):
+        """
+        :return: number of nodes.
+        """
+        return self._num_nodes
+
+    def get_num_arcs(self):
+        """
+        :return: number of stored arcs (twice the number of arcs of the
+            *.graph file for an undirected graph).
+        """
+        return self._num_arcs
+
+    def get_num_tiles(self):
+        """
+        :return: number of (non-empty) tiles.
+        """
+        return len(self._rows)
+
+    def is_directed(self):
+        """
+        :return: False if every arc was added in both directions.
+        """
+        return self._directed
+
+    def get_cost_profile(self):
+        """
+        :return: name of the arc costs, see __init__().
+        """
+        return self._cost_profile
+
+    def get_tile_idx(self, node_id):
+        """
+        :return: index of the tile of a node.
+        """
+        return bisect.bisect_right(self._node_offsets, node_id) - 1
+
+    def get_tile_key(self, tile_idx):
+        """
+        :return: tuple (row, column) of a tile: its south-west corner is
+            at latitude row * tile size and longitude column * tile size.
+        """
+        return (self._rows[tile_idx], self._columns[tile_idx])
+
+    def get_boundary_node_ids(self, tile_idx):
+        """
+        :return: list of the node ids of a tile with arcs to or from other
+            tiles.
+        """
+        return self._boundary_node_ids[
+            self._boundary_offsets[tile_idx]:
+            self._boundary_offsets[tile_idx + 1]].tolist()
+
+    def get_node_id(self, original_node_id):
+        """
+        :return: node id of the node with the given node id in the *.graph
+            file, -1 if there is no such node.
+        """
+        if 0 <= original_node_id < self._num_nodes:
+            return self._node_ids_by_original[original_node_id]
+        return -1
+
+    def get_original_node_id(self, node_id):
+        """
+        :return: node id in the *.graph file of a node (reads in its tile).
+        """
+        tile_idx = self.get_tile_idx(node_id)
+        return self.get_tile(tile_idx).get_original_node_id(
+            node_id - self._node_offsets[tile_idx])
+
+    def get_tile(self, tile_idx):
+        """
+        Tile of the graph, read in on a cache miss. The least recently
+        used tiles are evicted while the tiles exceed the memory budget;
+        a search keeps its current tile even if it is evicted.
+
+        :param tile_idx: index of the tile.
+        :return: CSRGraph of the nodes of the tile, whose node i is node
+            first node id of the tile + i; the head node ids of its arcs
+            are node ids of the whole graph.
+        """
+
+        tile = self._tiles.get(tile_idx)
+        if tile is not None:
+            self._tiles.move_to_end(tile_idx)
+            self.hits += 1
+            return tile
+
+        self.misses += 1
+        with open(get_tile_file_name(self._directory, tile_idx),
+                  'rb') as tile_file:
+            content = tile_file.read()
+        tile = route_planner.CSRGraph()
+        tile.read_binary_buffer(content)
+        num_bytes = len(content)
+        if self._cost_profile != 'distance':
+            tile.set_cost_profile(self._cost_profile)
+            num_bytes += 8 * len(tile.get_costs())
+        while self._tiles and self._num_bytes + num_bytes > self._max_bytes:
+            self._num_bytes -= self._tile_bytes.pop(
+                self._tiles.popitem(last=False)[0])
+            self.evictions += 1
+        self._tiles[tile_idx] = tile
+        self._tile_bytes[tile_idx] = num_bytes
+        self._num_bytes += num_bytes
+        self.peak_num_bytes = max(self.peak_num_bytes, self._num_bytes)
+
+        return tile
+
+    def get_num_bytes(self):
+        """
+        :return: size of the tiles read in [bytes].
+        """
+        return self._num_bytes
+
+    def clear(self):
+        """ Evict all tiles. """
+        self._tiles.clear()
+        self._tile_bytes.clear()
+        self._num_bytes = 0
+
+    def compute_shortest_paths(self, start_node_id, max_distance=None):
+        """
+        Compute the shortest paths from a start node by Dijkstra's
+        algorithm.
+
+        :param start_node_id: identifier of start node
+        :param max_distance: nodes with a larger distance are not reached,
+            None for no limit.
+        :return: dict of the distance of each reached node.
+        """
+        (distances, settled_node_ids, _) = self._dijkstra(
+            start_node_id, -1, max_distance)
+        return {node_id: distances[node_id] for node_id in settled_node_ids}
+
+    def shortest_path(self, source_node_id, target_node_id):
+        """
+        Compute the shortest path between two nodes by Dijkstra's
+        algorithm, which stops when the target node is settled.
+
+        :param source_node_id: identifier of source node
+        :param target_node_id: identifier of target node
+        :return: ShortestPath, see route_planner.CSRGraph.shortest_path().
+            The arc indices count the arcs of the tiles in tile order.
+        """
+
+        (distances, settled_node_ids, tracebacks) = self._dijkstra(
+            source_node_id, target_node_id)
+        num_settled = len(settled_node_ids)
+        if target_node_id not in settled_node_ids:
+            return route_planner.ShortestPath([], -1, num_settled, [])
+
+        path = [target_node_id]
+        arcs = []
+        while path[-1] != source_node_id:
+            (tail_node_id, arc_idx) = tracebacks[path[-1]]
+            path.append(tail_node_id)
+            arcs.append(arc_idx)
+        path.reverse()
+        arcs.reverse()
+
+        return route_planner.ShortestPath(path, distances[target_node_id],
+                                          num_settled, arcs)
+
+    def _dijkstra(self, start_node_id, target_node_id, max_distance=None):
+        """
+        Dijkstra's algorithm on the tiles, which are read in when the
+        search settles their first node. Ties are broken like in
+        route_planner.CSRGraph._dijkstra().
+
+        :param start_node_id: identifier of start node
+        :param target_node_id: the search stops when this node is settled,
+            -1 to settle all reachable nodes.
+        :param max_distance: see compute_shortest_paths().
+        :return: tuple (dict of the tentative distances, dict of the
+            settled nodes in the order of settling, dict of the tuple
+            (tail node id, arc index) of the traceback arc of each reached
+            node).
+        """
+
+        node_offsets = self._node_offsets
+        if max_distance is None:
+            max_distance = sys.maxsize
+        distances = {start_node_id: 0}
+        tracebacks = {}
+        settled = {}
+        # Node ids first .. last - 1 of the current tile.
+        first_node_id = last_node_id = 0
+        active_nodes = [(0, start_node_id)]
+
+        while active_nodes:
+            distance, node_id = heapq.heappop(active_nodes)
+            if node_id in settled:
+                # Node has already been settled.
+                continue
+            settled[node_id] = None
+            if node_id == target_node_id:
+                break
+
+            if not first_node_id <= node_id < last_node_id:
+                tile_idx = bisect.bisect_right(node_offsets, node_id) - 1
+                (offsets, heads, costs) = \
+                    self.get_tile(tile_idx).get_arc_arrays()
+                first_node_id = node_offsets[tile_idx]
+                last_node_id = node_offsets[tile_idx + 1]
+                first_arc_idx = self._arc_offsets[tile_idx]
+            # Update all connected nodes.
+            local_node_id = node_id - first_node_id
+            for idx in range(offsets[local_node_id],
+                             offsets[local_node_id + 1]):
+                head_node_id = heads[idx]
+                if head_node_id in settled:
+                    continue
+                new_distance = distance + costs[idx]
+                if new_distance > max_distance:
+                    continue
+                old_distance = distances.get(head_node_id)
+                if old_distance is not None and not (
+                        new_distance < old_distance or
+                        (new_distance == old_distance and
+                         node_id < tracebacks[head_node_id][0])):
+                    continue
+                distances[head_node_id] = new_distance
+                tracebacks[head_node_id] = (node_id, first_arc_idx + idx)
+                heapq.heappush(active_nodes, (new_distance, head_node_id))
+
+        return (distances, settled, tracebacks)
+
+
+def partition_graph(file_name, tile_size=TILE_SIZE, directed=True,
+                    directory=None):
+    """
+    Split a *.graph file into tiles, see the module docstring. The nodes
+    are ordered by tile row, tile column and node id of the *.graph file.
+
+    :param file_name: path of the *.graph file.
+    :param tile_size: edge length of the tiles [degrees].
+    :param directed: see route_planner.CSRGraph.read_graph_from_file().
+    :param directory: directory of the tile files, by default
+        get_tile_directory(file_name, tile_size, directed).
+    :return: path of the directory.
+
+    >>> directory = partition_graph('graph_13/test.graph', 0.0003)
+    >>> sorted(os.listdir(directory))
+    ['0.csr', '1.csr', '2.csr', '3.csr', 'index']
+    >>> TiledGraph(directory).compute_shortest_paths(0)
+    {0: 0, 1: 30, 2: 50, 3: 100}
+    >>> remove_tiles(directory)
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test.graph'))
+    """
+
+    if directory is None:
+        directory = get_tile_directory(file_name, tile_size, directed)
+    source_stat = os.stat(file_name)
+    graph = route_planner.CSRGraph.load(file_name, directed)
+    num_nodes = graph.get_num_nodes()
+    tile_keys = [(math.floor(latitude / tile_size),
+                  math.floor(longitude / tile_size))
+                 for latitude, longitude in zip(*graph.get_coordinates())]
+    order = sorted(range(num_nodes), key=tile_keys.__getitem__)
+    # A tile holds the outgoing arcs of its nodes only.
+    tiled_graph = graph.extract_subgraph(order).to_directed()
+
+    # Tile table and the tile of each node.
+    rows = array('i')
+    columns = array('i')
+    node_offsets = array('q')
+    node_tiles = array('i', bytes(4 * num_nodes))
+    for node_id, original_node_id in enumerate(order):
+        (row, column) = tile_keys[original_node_id]
+        if not rows or row != rows[-1] or column != columns[-1]:
+            rows.append(row)
+            columns.append(column)
+            node_offsets.append(node_id)
+        node_tiles[node_id] = len(rows) - 1
+    node_offsets.append(num_nodes)
+    (offsets, heads, _) = tiled_graph.get_arc_arrays()
+    arc_offsets = array('q', map(offsets.__getitem__, node_offsets))
+
+    # Both end nodes of an arc between two tiles are boundary nodes.
+    boundary_nodes = bytearray(num_nodes)
+    for node_id in range(num_nodes):
+        tile_idx = node_tiles[node_id]
+        for arc_idx in range(offsets[node_id], offsets[node_id + 1]):
+            head_node_id = heads[arc_idx]
+            if node_tiles[head_node_id] != tile_idx:
+                boundary_nodes[node_id] = boundary_nodes[head_node_id] = 1
+    boundary_node_ids = array('i', itertools.compress(range(num_nodes),
+                                                      boundary_nodes))
+    boundary_offsets = array('q', (
+        bisect.bisect_left(boundary_node_ids, node_id)
+        for node_id in node_offsets))
+    node_ids_by_original = array('i', bytes(4 * num_nodes))
+    for node_id, original_node_id in enumerate(order):
+        node_ids_by_original[original_node_id] = node_id
+
+    os.makedirs(directory, exist_ok=True)
+    for tile_idx in range(len(rows)):
+        tiled_graph.write_binary_file(
+            get_tile_file_name(directory, tile_idx), source_stat, True,
+            node_offsets[tile_idx], node_offsets[tile_idx + 1])
+    # The index is written last, so an interrupted partition leaves no
+    # valid index behind.
+    header = struct.pack(TILE_INDEX_HEADER, TILE_INDEX_MAGIC,
+                         TILE_INDEX_VERSION, sys.byteorder == 'little',
+                         directed, source_stat.st_size,
+                         source_stat.st_mtime_ns, tile_size, num_nodes,
+                         len(heads), len(rows), len(boundary_node_ids))
+    index_file_name = get_tile_index_file_name(directory)
+    tmp_file_name = '{0}.{1}.tmp'.format(index_file_name, os.getpid())
+    with open(tmp_file_name, 'wb') as index_file:
+        route_planner.write_aligned(
+            index_file, [(header, 'B'), (rows, 'i'), (columns, 'i'),
+                         (node_offsets, 'q'), (arc_offsets, 'q'),
+                         (node_ids_by_original, 'i'),
+                         (boundary_offsets, 'q'),
+                         (boundary_node_ids, 'i')])
+    os.replace(tmp_file_name, index_file_name)
+
+    return directory
+
+def get_tile_directory(file_name, tile_size=TILE_SIZE, directed=True):
+    """
+    Returns the path of the tile directory of a *.graph file.
+
+    >>> get_tile_directory('test.graph')
+    'test.graph.0.25.tiles'
+    >>> get_tile_directory('test.graph', 0.1, False)
+    'test.graph.undirected.0.1.tiles'
+    """
+    if not directed:
+        file_name += '.undirected'
+    return '{0}.{1:g}.tiles'.format(file_name, tile_size)
+
+def get_tile_index_file_name(directory):
+    """ Returns the path of the index file of a tile directory. """
+    return os.path.join(directory, 'index')
+
+def get_tile_file_name(directory, tile_idx):
+    """ Returns the path of the binary graph file of a tile. """
+    return os.path.join(directory, '{0}.csr'.format(tile_idx))
+
+def read_tile_index_header(index_file):
+    """
+    Read the header of a tile index file.
+
+    :param index_file: buffer with the file content (e.g. mmap object).
+    :return: tuple (directed, source size, source mtime, tile size,
+        number of nodes, number of arcs, number of tiles, number of
+        boundary nodes), None if the header does not match this version
+        and byte order.
+    """
+    header_size = struct.calcsize(TILE_INDEX_HEADER)
+    if len(index_file) < header_size:
+        return None
+    header = struct.unpack_from(TILE_INDEX_HEADER, index_file)
+    if (header[0] != TILE_INDEX_MAGIC or header[1] != TILE_INDEX_VERSION or
+            header[2] != (sys.byteorder == 'little')):
+        return None
+
+    return header[3:]
+
+def remove_tiles(directory):
+    """
+    Remove a tile directory written by partition_graph().
+
+    :param directory: path of the directory.
+    :return: None
+    """
+    for name in os.listdir(directory):
+        if name == 'index' or name.endswith('.csr'):
+            os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+def load_tiled_graph(file_name, tile_size=TILE_SIZE, directed=True,
+                     cost_profile='distance', max_bytes=TILE_CACHE_BYTES):
+    """
+    Open the tiles of a *.graph file, which are (re)partitioned if they do
+    not exist or if the size or the modification time of the *.graph file
+    have changed.
+
+    :param file_name: path of the *.graph file.
+    :param tile_size: see partition_graph().
+    :param directed: see partition_graph().
+    :param cost_profile: see TiledGraph.__init__().
+    :param max_bytes: see TiledGraph.__init__().
+    :return: TiledGraph.
+
+    >>> graph = load_tiled_graph('graph_13/test2.graph', directed=False)
+    >>> graph.shortest_path(graph.get_node_id(3), graph.get_node_id(0)).path
+    [3, 1, 0]
+    >>> remove_tiles(get_tile_directory('graph_13/test2.graph', directed=False))
+    >>> os.remove(route_planner.get_binary_file_name('graph_13/test2.graph',
+    ...                                              False))
+    """
+
+    directory = get_tile_directory(file_name, tile_size, directed)
+    source_stat = os.stat(file_name)
+    try:
+        with open(get_tile_index_file_name(directory), 'rb') as index_file:
+            header = read_tile_index_header(index_file.read(
+                struct.calcsize(TILE_INDEX_HEADER)))
+    except OSError:
+        header = None
+    if (header is None or header[1] != source_stat.st_size or
+            header[2] != source_stat.st_mtime_ns):
+        partition_graph(file_name, tile_size, directed, directory)
+
+    return TiledGraph(directory, cost_profile, max_bytes)
+
+
+def main():
+    """
+    Main function: split a *.graph file into tiles and compare queries on
+    the tiles with queries on the whole graph, for random node pairs and
+    for local pairs at most one tile size apart.
+    Usage: tiles.py [*.graph file] [tile size] [memory budget [MB]]
+        [number of queries]
+    """
+    file_name = (sys.argv[1] if len(sys.argv) > 1
+                 else 'bawue_bayern_13/bawue_bayern.graph')
+    tile_size = float(sys.argv[2]) if len(sys.argv) > 2 else TILE_SIZE
+    max_bytes = (int(float(sys.argv[3]) * 2 ** 20) if len(sys.argv) > 3
+                 else TILE_CACHE_BYTES)
+    num_queries = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+
+    start = time.perf_counter()
+    tiled_graph = load_tiled_graph(file_name, tile_size, max_bytes=max_bytes)
+    print('{0} tiles opened in {1:.2f} s'.format(
+        tiled_graph.get_num_tiles(), time.perf_counter() - start))
+    graph = route_planner.CSRGraph.load(file_name)
+    graph_bytes = os.path.getsize(route_planner.get_binary_file_name(
+        file_name))
+
+    rng = random.Random(0)
+    num_nodes = graph.get_num_nodes()
+    (latitudes, longitudes) = graph.get_coordinates()
+    random_queries = [(rng.randrange(num_nodes), rng.randrange(num_nodes))
+                      for _ in range(num_queries)]
+    local_queries = []
+    while len(local_queries) < num_queries:
+        (source_node_id, target_node_id) = (rng.randrange(num_nodes),
+                                            rng.randrange(num_nodes))
+        if (abs(latitudes[source_node_id] - latitudes[target_node_id])
+                <= tile_size and
+                abs(longitudes[source_node_id] - longitudes[target_node_id])
+                <= tile_size):
+            local_queries.append((source_node_id, target_node_id))
+
+    for name, queries in (('random', random_queries),
+                          ('local', local_queries)):
+        start = time.perf_counter()
+        expected_distances = [graph.shortest_path(*query).distance
+                              for query in queries]
+        graph_time = time.perf_counter() - start
+        tiled_graph.clear()
+        tiled_graph.peak_num_bytes = 0
+        misses = tiled_graph.misses
+        start = time.perf_counter()
+        distances = [tiled_graph.shortest_path(
+            tiled_graph.get_node_id(source_node_id),
+            tiled_graph.get_node_id(target_node_id)).distance
+            for source_node_id, target_node_id in queries]
+        tiles_time = time.perf_counter() - start
+        if distances != expected_distances:
+            raise Exception('Distances on the tiles differ')
+        print('{0} queries: {1:.1f} ms per query on the whole graph, '
+              '{2:.1f} ms on the tiles, {3} tiles read in, peak {4:.1f} MB '
+              'of {5:.1f} MB'.format(
+                  name, graph_time / num_queries * 1000,
+                  tiles_time / num_queries * 1000,
+                  tiled_graph.misses - misses,
+                  tiled_graph.peak_num_bytes / 2 ** 20, graph_bytes / 2 ** 20))
+
+
+if __name__ == '__main__':
+    """
+    Executes only if it is run as a script.
+    """
+    import doctest
+
+    doctest.testmod()
+
+    main()